@@ -0,0 +1,113 @@
+"""Partition flag_submissions by month on submitted_at
+
+Revision ID: 0b9e4d7a6c21
+Revises: f27c6b18e0a3
+Create Date: 2026-10-18 20:03:44.180527
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b9e4d7a6c21'
+down_revision: Union[str, None] = 'f27c6b18e0a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitions created ahead of the current month; `python -m backend.archive maintain` keeps this up
+MONTHS_AHEAD = 2
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # SQLite can't partition: the archival job deletes archived months by range instead
+        op.create_index('ix_flag_submissions_submitted_at', 'flag_submissions', ['submitted_at'])
+        return
+
+    # A partitioned table needs the partition key in its primary key and every unique index,
+    # so the table is rebuilt: new partitioned parent, monthly partitions, copy, swap.
+    op.drop_index('ix_flag_submissions_challenge_id', table_name='flag_submissions')
+    op.drop_index('ix_flag_submissions_user_id_challenge_id', table_name='flag_submissions')
+    op.drop_index('ix_flag_submissions_id', table_name='flag_submissions')
+    op.execute("ALTER TABLE flag_submissions RENAME TO flag_submissions_unpartitioned")
+    op.execute("ALTER TABLE flag_submissions_unpartitioned RENAME CONSTRAINT flag_submissions_pkey "
+               "TO flag_submissions_unpartitioned_pkey")
+    op.execute("UPDATE flag_submissions_unpartitioned SET submitted_at = timezone('utc', now()) "
+               "WHERE submitted_at IS NULL")
+    op.execute(
+        "CREATE TABLE flag_submissions ("
+        "id INTEGER NOT NULL DEFAULT nextval('flag_submissions_id_seq'), "
+        "user_id INTEGER NOT NULL REFERENCES users (id), "
+        "challenge_id INTEGER NOT NULL REFERENCES challenges (id), "
+        "flag VARCHAR NOT NULL, "
+        "correct BOOLEAN, "
+        "submitted_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, "
+        "PRIMARY KEY (id, submitted_at)"
+        ") PARTITION BY RANGE (submitted_at)"
+    )
+    op.execute("CREATE TABLE flag_submissions_default PARTITION OF flag_submissions DEFAULT")
+
+    first = bind.execute(sa.text("SELECT min(submitted_at) FROM flag_submissions_unpartitioned")).scalar()
+    now = datetime.utcnow()
+    month = datetime((first or now).year, (first or now).month, 1)
+    last = _add_months(datetime(now.year, now.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        following = _add_months(month, 1)
+        op.execute(f"CREATE TABLE flag_submissions_{month:%Y%m} PARTITION OF flag_submissions "
+                   f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{following:%Y-%m-%d}')")
+        month = following
+
+    # Indexes on the parent are created on every partition, present and future
+    op.create_index('ix_flag_submissions_id', 'flag_submissions', ['id'])
+    op.create_index('ix_flag_submissions_user_id_challenge_id', 'flag_submissions', ['user_id', 'challenge_id'])
+    op.create_index('ix_flag_submissions_challenge_id', 'flag_submissions', ['challenge_id'])
+    op.create_index('ix_flag_submissions_submitted_at', 'flag_submissions', ['submitted_at'])
+
+    op.execute("INSERT INTO flag_submissions (id, user_id, challenge_id, flag, correct, submitted_at) "
+               "SELECT id, user_id, challenge_id, flag, correct, submitted_at FROM flag_submissions_unpartitioned")
+    # The sequence belongs to the old table's column and would be dropped with it
+    op.execute("ALTER SEQUENCE flag_submissions_id_seq OWNED BY flag_submissions.id")
+    op.execute("DROP TABLE flag_submissions_unpartitioned")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        op.drop_index('ix_flag_submissions_submitted_at', table_name='flag_submissions')
+        return
+
+    # Archived months stay in their files; only the rows still in the database come back
+    op.execute("ALTER TABLE flag_submissions RENAME TO flag_submissions_partitioned")
+    op.execute("ALTER TABLE flag_submissions_partitioned RENAME CONSTRAINT flag_submissions_pkey "
+               "TO flag_submissions_partitioned_pkey")
+    op.drop_index('ix_flag_submissions_submitted_at', table_name='flag_submissions_partitioned')
+    op.drop_index('ix_flag_submissions_challenge_id', table_name='flag_submissions_partitioned')
+    op.drop_index('ix_flag_submissions_user_id_challenge_id', table_name='flag_submissions_partitioned')
+    op.drop_index('ix_flag_submissions_id', table_name='flag_submissions_partitioned')
+    op.execute(
+        "CREATE TABLE flag_submissions ("
+        "id INTEGER NOT NULL DEFAULT nextval('flag_submissions_id_seq') PRIMARY KEY, "
+        "user_id INTEGER NOT NULL REFERENCES users (id), "
+        "challenge_id INTEGER NOT NULL REFERENCES challenges (id), "
+        "flag VARCHAR NOT NULL, "
+        "correct BOOLEAN, "
+        "submitted_at TIMESTAMP WITHOUT TIME ZONE"
+        ")"
+    )
+    op.execute("INSERT INTO flag_submissions (id, user_id, challenge_id, flag, correct, submitted_at) "
+               "SELECT id, user_id, challenge_id, flag, correct, submitted_at FROM flag_submissions_partitioned")
+    op.execute("ALTER SEQUENCE flag_submissions_id_seq OWNED BY flag_submissions.id")
+    op.execute("DROP TABLE flag_submissions_partitioned")
+    op.create_index('ix_flag_submissions_id', 'flag_submissions', ['id'])
+    op.create_index('ix_flag_submissions_user_id_challenge_id', 'flag_submissions', ['user_id', 'challenge_id'])
+    op.create_index('ix_flag_submissions_challenge_id', 'flag_submissions', ['challenge_id'])
@@ -0,0 +1,53 @@
+"""Make (user_id, challenge_id) unique on user_challenges
+
+Revision ID: 3c9d2e7a41b5
+Revises: 6f08f452b14f
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9d2e7a41b5'
+down_revision: Union[str, None] = '6f08f452b14f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# The earliest completion row of each (user_id, challenge_id) pair, the one that is kept
+KEPT = "SELECT MIN(id) FROM user_challenges GROUP BY user_id, challenge_id"
+
+
+def upgrade() -> None:
+    # Every duplicate row came from a double submission that awarded xp_reward again: take that XP back
+    op.execute(
+        f"""
+        UPDATE users SET xp = xp - (
+            SELECT COALESCE(SUM(challenges.xp_reward), 0)
+            FROM user_challenges JOIN challenges ON challenges.id = user_challenges.challenge_id
+            WHERE user_challenges.user_id = users.id AND user_challenges.id NOT IN ({KEPT})
+        )
+        WHERE id IN (SELECT user_id FROM user_challenges WHERE id NOT IN ({KEPT}))
+        """
+    )
+    # Then keep only the earliest completion row
+    op.execute(
+        f"""
+        DELETE FROM user_challenges
+        WHERE id NOT IN ({KEPT})
+        """
+    )
+    with op.batch_alter_table('user_challenges') as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_user_challenges_user_id_challenge_id', ['user_id', 'challenge_id']
+        )
+
+
+def downgrade() -> None:
+    # The removed duplicates and the XP they awarded are not restored
+    with op.batch_alter_table('user_challenges') as batch_op:
+        batch_op.drop_constraint('uq_user_challenges_user_id_challenge_id', type_='unique')
@@ -0,0 +1,39 @@
+"""Add indexes for the hot query shapes in crud.py
+
+Revision ID: 8a1f4c6d2e90
+Revises: 3c9d2e7a41b5
+Create Date: 2026-10-18 11:40:05.527310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a1f4c6d2e90'
+down_revision: Union[str, None] = '3c9d2e7a41b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # get_challenges_by_level, get_completed_challenge_ids_for_level
+    op.create_index('ix_challenges_level_id', 'challenges', ['level_id'])
+    # get_top_users / leaderboard: ORDER BY xp DESC with id as the tie-break
+    op.create_index('ix_users_xp_desc_id', 'users', [sa.text('xp DESC'), 'id'])
+    # has_user_completed_challenge, submit_flag and the progress index use the (user_id, challenge_id)
+    # index of uq_user_challenges_user_id_challenge_id (3c9d2e7a41b5); a second one would only slow solves
+    op.create_index('ix_user_challenges_challenge_id', 'user_challenges', ['challenge_id'])
+    # flag_submissions is append-heavy and was only indexed by its primary key
+    op.create_index('ix_flag_submissions_user_id_challenge_id', 'flag_submissions', ['user_id', 'challenge_id'])
+    op.create_index('ix_flag_submissions_challenge_id', 'flag_submissions', ['challenge_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_flag_submissions_challenge_id', table_name='flag_submissions')
+    op.drop_index('ix_flag_submissions_user_id_challenge_id', table_name='flag_submissions')
+    op.drop_index('ix_user_challenges_challenge_id', table_name='user_challenges')
+    op.drop_index('ix_users_xp_desc_id', table_name='users')
+    op.drop_index('ix_challenges_level_id', table_name='challenges')
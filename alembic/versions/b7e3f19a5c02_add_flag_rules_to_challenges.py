@@ -0,0 +1,27 @@
+"""Add per-challenge flag normalisation rules
+
+Revision ID: b7e3f19a5c02
+Revises: 8a1f4c6d2e90
+Create Date: 2026-10-18 12:20:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3f19a5c02'
+down_revision: Union[str, None] = '8a1f4c6d2e90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # NULL keeps the old behaviour: exact match after stripping surrounding whitespace
+    op.add_column('challenges', sa.Column('flag_rules', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('challenges', 'flag_rules')
@@ -0,0 +1,55 @@
+"""Add user_stats and user_category_stats aggregates
+
+Revision ID: d41c8a97e2f3
+Revises: b7e3f19a5c02
+Create Date: 2026-10-18 14:05:12.407318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41c8a97e2f3'
+down_revision: Union[str, None] = 'b7e3f19a5c02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('solves', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('hints_used', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('wrong_attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_solve_at', sa.DateTime(), nullable=True),
+    )
+    op.create_table(
+        'user_category_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('category', sa.String(), primary_key=True),
+        sa.Column('solves', sa.Integer(), nullable=False, server_default='0'),
+    )
+    # Backfill from existing history (the same result as `python -m backend.stats rebuild`)
+    op.execute(
+        "INSERT INTO user_category_stats (user_id, category, solves) "
+        "SELECT uc.user_id, c.category, COUNT(*) FROM user_challenges uc "
+        "JOIN challenges c ON c.id = uc.challenge_id WHERE uc.success "
+        "GROUP BY uc.user_id, c.category"
+    )
+    op.execute(
+        "INSERT INTO user_stats (user_id, solves, hints_used, wrong_attempts, last_solve_at) "
+        "SELECT u.id, "
+        "(SELECT COUNT(*) FROM user_challenges uc WHERE uc.user_id = u.id AND uc.success), 0, "
+        "(SELECT COUNT(*) FROM flag_submissions fs WHERE fs.user_id = u.id AND NOT fs.correct), "
+        "(SELECT MAX(uc.completed_at) FROM user_challenges uc WHERE uc.user_id = u.id AND uc.success) "
+        "FROM users u"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_category_stats')
+    op.drop_table('user_stats')
@@ -0,0 +1,48 @@
+"""Add tiered hints and the hint_purchases ledger
+
+Revision ID: e5a0b37c9d14
+Revises: d41c8a97e2f3
+Create Date: 2026-10-18 16:42:37.915204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a0b37c9d14'
+down_revision: Union[str, None] = 'd41c8a97e2f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'hints',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('challenge_id', sa.Integer(), sa.ForeignKey('challenges.id'), nullable=False),
+        sa.Column('tier', sa.Integer(), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('cost', sa.Integer(), nullable=False, server_default='5'),
+        sa.UniqueConstraint('challenge_id', 'tier', name='uq_hints_challenge_id_tier'),
+    )
+    op.create_index(op.f('ix_hints_id'), 'hints', ['id'], unique=False)
+    op.create_table(
+        'hint_purchases',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('hint_id', sa.Integer(), sa.ForeignKey('hints.id'), nullable=False),
+        sa.Column('cost', sa.Integer(), nullable=False),
+        sa.Column('purchased_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('user_id', 'hint_id', name='uq_hint_purchases_user_id_hint_id'),
+    )
+    op.create_index(op.f('ix_hint_purchases_id'), 'hint_purchases', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_hint_purchases_id'), table_name='hint_purchases')
+    op.drop_table('hint_purchases')
+    op.drop_index(op.f('ix_hints_id'), table_name='hints')
+    op.drop_table('hints')
@@ -0,0 +1,46 @@
+"""Add challenge_scores and user_stats.points for dynamic scoring
+
+Revision ID: f27c6b18e0a3
+Revises: e5a0b37c9d14
+Create Date: 2026-10-18 18:20:51.336940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f27c6b18e0a3'
+down_revision: Union[str, None] = 'e5a0b37c9d14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'challenge_scores',
+        sa.Column('challenge_id', sa.Integer(), sa.ForeignKey('challenges.id'), primary_key=True),
+        sa.Column('solves', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('value', sa.Integer(), nullable=False),
+    )
+    op.add_column('user_stats', sa.Column('points', sa.Integer(), nullable=False, server_default='0'))
+    # Existing solves were awarded statically; with SCORING_MODE=dynamic, run
+    # `python -m backend.scoring recompute` afterwards to re-value them
+    op.execute(
+        "INSERT INTO challenge_scores (challenge_id, solves, value) "
+        "SELECT c.id, COUNT(*), c.xp_reward FROM challenges c "
+        "JOIN user_challenges uc ON uc.challenge_id = c.id WHERE uc.success "
+        "GROUP BY c.id, c.xp_reward"
+    )
+    op.execute(
+        "UPDATE user_stats SET points = COALESCE((SELECT SUM(cs.value) FROM user_challenges uc "
+        "JOIN challenge_scores cs ON cs.challenge_id = uc.challenge_id "
+        "WHERE uc.user_id = user_stats.user_id AND uc.success), 0)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('user_stats', 'points')
+    op.drop_table('challenge_scores')
@@ -0,0 +1,345 @@
+# backend/archive.py
+"""
+Monthly partitions and archival for flag_submissions.
+
+On Postgres flag_submissions is range-partitioned by month on submitted_at
+(flag_submissions_YYYYMM, plus flag_submissions_default for rows no partition
+covers). `maintain` keeps FLAG_SUBMISSIONS_PARTITIONS_AHEAD months of
+partitions ready, then moves every month older than FLAG_SUBMISSIONS_HOT_MONTHS
+to FLAG_ARCHIVE_DIR and detaches and drops its partition. On other databases
+(SQLite in development) the same months are archived and deleted by range.
+
+A month's archive is a directory with one gzip-compressed JSON array per
+column and a meta.json (row count, id and time range):
+
+    archive/flag_submissions/2026-07/meta.json, id.json.gz, user_id.json.gz, ...
+
+ArchiveReader queries archives in place: months outside the requested time
+range are skipped from meta.json alone, and only the columns used by the
+filters are decompressed before the matching rows' other columns.
+
+Run `maintain` from cron (e.g. daily); it is safe to repeat:
+
+    python -m backend.archive maintain [--dry-run]
+    python -m backend.archive query --user-id 7 --since 2026-01-01
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sys
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy import delete, func, select, text
+from backend.config import FLAG_ARCHIVE_DIR, FLAG_SUBMISSIONS_HOT_MONTHS, FLAG_SUBMISSIONS_PARTITIONS_AHEAD
+from backend.models import FlagSubmission
+from backend.serialization import dumps, orjson
+
+flag_submissions = FlagSubmission.__table__
+
+COLUMNS = ("id", "user_id", "challenge_id", "flag", "correct", "submitted_at")
+ARCHIVE_FORMAT = 1
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"flag_submissions_{month:%Y%m}"
+
+
+def _in_month(month: datetime):
+    return (flag_submissions.c.submitted_at >= month) & (flag_submissions.c.submitted_at < add_months(month, 1))
+
+
+# ----------------- Partitions (Postgres) -----------------
+
+def is_partitioned(connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return connection.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('flag_submissions')")).first() is not None
+
+
+def partitions(connection):
+    """{month: partition name} for the attached monthly partitions."""
+    names = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('flag_submissions')")).scalars()
+    found = {}
+    for name in names:
+        suffix = name.rsplit("_", 1)[-1]
+        if suffix.isdigit() and len(suffix) == 6:
+            found[datetime(int(suffix[:4]), int(suffix[4:]), 1)] = name
+    return found
+
+
+def ensure_partitions(connection, now: datetime = None, ahead: int = FLAG_SUBMISSIONS_PARTITIONS_AHEAD):
+    """
+    Create the partitions from the current month to `ahead` months on; returns
+    their names. Rows the default partition caught for a month are moved into
+    its new partition, which is attached afterwards.
+    """
+    existing = partitions(connection)
+    created = []
+    for offset in range(ahead + 1):
+        month = add_months(month_start(now or datetime.utcnow()), offset)
+        if month in existing:
+            continue
+        name, start, end = partition_name(month), f"{month:%Y-%m-%d}", f"{add_months(month, 1):%Y-%m-%d}"
+        connection.execute(text(f"CREATE TABLE {name} (LIKE flag_submissions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        connection.execute(text(
+            f"WITH moved AS (DELETE FROM flag_submissions_default WHERE submitted_at >= '{start}' "
+            f"AND submitted_at < '{end}' RETURNING *) INSERT INTO {name} SELECT * FROM moved"))
+        connection.execute(text(
+            f"ALTER TABLE flag_submissions ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"))
+        created.append(name)
+    return created
+
+
+# ----------------- Archival -----------------
+
+class _ColumnWriter:
+    """Streams one column into a gzip-compressed JSON array."""
+
+    def __init__(self, path: Path):
+        self._raw = open(path, "wb")
+        self._file = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=6, mtime=0)
+        self._file.write(b"[")
+        self._empty = True
+
+    def extend(self, values):
+        if not values:
+            return
+        if not self._empty:
+            self._file.write(b",")
+        self._file.write(dumps(list(values))[1:-1])
+        self._empty = False
+
+    def close(self):
+        self._file.write(b"]")
+        self._file.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+
+
+def months_to_archive(connection, now: datetime = None, hot_months: int = FLAG_SUBMISSIONS_HOT_MONTHS):
+    """Months older than the hot window that still have a partition or rows in the database."""
+    cutoff = add_months(month_start(now or datetime.utcnow()), -hot_months)
+    months = {month for month in partitions(connection) if month < cutoff} if is_partitioned(connection) else set()
+    first = connection.execute(
+        select(func.min(flag_submissions.c.submitted_at)).where(flag_submissions.c.submitted_at < cutoff)).scalar()
+    if first is not None:
+        month = month_start(first)
+        while month < cutoff:
+            months.add(month)
+            month = add_months(month, 1)
+    return sorted(months)
+
+
+def archive_month(connection, month: datetime, directory=FLAG_ARCHIVE_DIR, batch_size: int = 10000):
+    """
+    Write one month of flag_submissions to `directory` and remove it from the
+    database, in the caller's transaction. Rows already archived for the month
+    by an earlier run are kept, so repeating an interrupted run is safe. Returns
+    the archive's meta.json contents, or None if the month had no rows left.
+    """
+    directory = Path(directory)
+    key = f"{month:%Y-%m}"
+    partition = partitions(connection).get(month) if is_partitioned(connection) else None
+    if partition is not None:
+        # No new rows for this month may arrive between reading it and dropping the partition
+        connection.execute(text(f"LOCK TABLE {partition} IN SHARE MODE"))
+    if connection.execute(select(flag_submissions.c.id).where(_in_month(month)).limit(1)).first() is None:
+        if partition is not None:
+            connection.execute(text(f"ALTER TABLE flag_submissions DETACH PARTITION {partition}"))
+            connection.execute(text(f"DROP TABLE {partition}"))
+        return None
+
+    directory.mkdir(parents=True, exist_ok=True)
+    staging = directory / f".{key}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+    writers = {column: _ColumnWriter(staging / f"{column}.json.gz") for column in COLUMNS}
+    count, min_id, max_id = 0, None, None
+
+    def add(rows):
+        nonlocal count, min_id, max_id
+        if not rows:
+            return
+        for column, values in zip(COLUMNS, zip(*rows)):
+            writers[column].extend(values)
+        count += len(rows)
+        ids = [row[0] for row in rows]
+        min_id = min(ids) if min_id is None else min(min_id, min(ids))
+        max_id = max(ids) if max_id is None else max(max_id, max(ids))
+
+    previous = directory / key
+    archived_ids = set()
+    if previous.exists():
+        old = [tuple(row[column] for column in COLUMNS) for row in ArchiveReader(directory).rows(months=[key])]
+        archived_ids = {row[0] for row in old}
+        add(old)
+    result = connection.execution_options(yield_per=batch_size).execute(
+        select(*(flag_submissions.c[column] for column in COLUMNS)).where(_in_month(month))
+        .order_by(flag_submissions.c.id))
+    for rows in result.partitions(batch_size):
+        add([tuple(row) for row in rows if row[0] not in archived_ids])
+    for writer in writers.values():
+        writer.close()
+
+    meta = {"format": ARCHIVE_FORMAT, "table": "flag_submissions", "month": key,
+            "start": month.isoformat(), "end": add_months(month, 1).isoformat(),
+            "rows": count, "min_id": min_id, "max_id": max_id, "columns": list(COLUMNS),
+            "archived_at": datetime.utcnow().isoformat()}
+    (staging / "meta.json").write_text(json.dumps(meta, indent=2))
+    if previous.exists():
+        retired = directory / f".{key}.old"
+        shutil.rmtree(retired, ignore_errors=True)
+        os.replace(previous, retired)
+        os.replace(staging, previous)
+        shutil.rmtree(retired)
+    else:
+        os.replace(staging, previous)
+
+    # The files are complete; only now do the rows leave the database
+    if partition is not None:
+        connection.execute(text(f"ALTER TABLE flag_submissions DETACH PARTITION {partition}"))
+        connection.execute(text(f"DROP TABLE {partition}"))
+    if max_id is not None:
+        # Rows for the month outside its partition (the default one, or an unpartitioned table)
+        connection.execute(delete(flag_submissions).where(_in_month(month), flag_submissions.c.id <= max_id))
+    return meta
+
+
+def maintain(engine, now: datetime = None, directory=FLAG_ARCHIVE_DIR, dry_run: bool = False):
+    """Create upcoming partitions, then archive closed months one transaction each; returns what was done."""
+    done = {"created": [], "archived": []}
+    with engine.begin() as connection:
+        months = months_to_archive(connection, now)
+        if is_partitioned(connection) and not dry_run:
+            done["created"] = ensure_partitions(connection, now)
+    if dry_run:
+        done["archived"] = [{"month": f"{month:%Y-%m}"} for month in months]
+        return done
+    for month in months:
+        with engine.begin() as connection:
+            meta = archive_month(connection, month, directory)
+        if meta is not None:
+            done["archived"].append(meta)
+    return done
+
+
+# ----------------- Reading archives -----------------
+
+class ArchiveReader:
+    """Query archived flag_submissions without loading them back into the database."""
+
+    def __init__(self, directory=FLAG_ARCHIVE_DIR):
+        self.directory = Path(directory)
+
+    def months(self):
+        """meta.json of every archived month, oldest first."""
+        if not self.directory.is_dir():
+            return []
+        metas = []
+        for meta_path in sorted(self.directory.glob("*/meta.json")):
+            if not meta_path.parent.name.startswith("."):
+                metas.append(json.loads(meta_path.read_text()))
+        return metas
+
+    def column(self, month: str, name: str):
+        with gzip.open(self.directory / month / f"{name}.json.gz", "rb") as file:
+            values = _loads(file.read())
+        if name == "submitted_at":
+            return [datetime.fromisoformat(value) if value is not None else None for value in values]
+        return values
+
+    def rows(self, since: datetime = None, until: datetime = None, user_id: int = None, challenge_id: int = None,
+             correct: bool = None, columns=COLUMNS, months=None):
+        """Yield archived rows as dicts of `columns`, filtered like a WHERE clause, in id order per month."""
+        filters = [(name, value) for name, value in (("user_id", user_id), ("challenge_id", challenge_id),
+                                                     ("correct", correct)) if value is not None]
+        for meta in self.months():
+            key = meta["month"]
+            if months is not None and key not in months:
+                continue
+            start, end = datetime.fromisoformat(meta["start"]), datetime.fromisoformat(meta["end"])
+            if (since is not None and end <= since) or (until is not None and start >= until) or not meta["rows"]:
+                continue
+            selected = range(meta["rows"])
+            for name, wanted in filters:
+                values = self.column(key, name)
+                selected = [index for index in selected if values[index] == wanted]
+            if (since is not None and since > start) or (until is not None and until < end):
+                times = self.column(key, "submitted_at")
+                selected = [index for index in selected
+                            if (since is None or times[index] >= since) and (until is None or times[index] < until)]
+            if not selected:
+                continue
+            loaded = {name: self.column(key, name) for name in columns}
+            for index in selected:
+                yield {name: loaded[name][index] for name in columns}
+
+    def wrong_attempts_by_user(self) -> Counter:
+        """Incorrect archived attempts per user (stats.rebuild adds these to the live counts)."""
+        counts = Counter()
+        for meta in self.months():
+            if meta["rows"]:
+                user_ids, correct = self.column(meta["month"], "user_id"), self.column(meta["month"], "correct")
+                counts.update(user for user, ok in zip(user_ids, correct) if ok is False)
+        return counts
+
+
+def _moment(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition maintenance and archival for flag_submissions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("maintain", help="Create upcoming partitions and archive closed months")
+    run.add_argument("--dry-run", action="store_true", help="Only list the months that would be archived")
+    query = commands.add_parser("query", help="Print archived attempts as NDJSON")
+    query.add_argument("--user-id", type=int)
+    query.add_argument("--challenge-id", type=int)
+    query.add_argument("--correct", dest="correct", action="store_true", default=None)
+    query.add_argument("--wrong", dest="correct", action="store_false")
+    query.add_argument("--since", type=_moment, help="ISO date or datetime, inclusive")
+    query.add_argument("--until", type=_moment, help="ISO date or datetime, exclusive")
+    query.add_argument("--limit", type=int)
+    for command in (run, query):
+        command.add_argument("--directory", default=FLAG_ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    if args.command == "maintain":
+        from backend.database import engine
+        done = maintain(engine, directory=args.directory, dry_run=args.dry_run)
+        for name in done["created"]:
+            print(f"created partition {name}")
+        for meta in done["archived"]:
+            print(f"{'would archive' if args.dry_run else 'archived'} {meta['month']}"
+                  + ("" if args.dry_run else f": {meta['rows']} rows"))
+        return
+
+    rows = ArchiveReader(args.directory).rows(since=args.since, until=args.until, user_id=args.user_id,
+                                              challenge_id=args.challenge_id, correct=args.correct)
+    for count, row in enumerate(rows):
+        if args.limit is not None and count >= args.limit:
+            break
+        sys.stdout.buffer.write(dumps(row) + b"\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# backend/audit.py
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import insert
+from backend.config import (
+    AUDIT_QUEUE_MAX_SIZE, AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL_SECONDS,
+    AUDIT_BACKPRESSURE, AUDIT_BLOCK_TIMEOUT_SECONDS
+)
+from backend.models import FlagSubmission
+from backend.stats import wrong_attempt_params, wrong_attempts_statement
+
+logger = logging.getLogger("backend.audit")
+
+BACKPRESSURE_POLICIES = ("block", "drop", "inline")
+
+_STOP = object()
+
+
+class AuditWriter:
+    """
+    Write-behind buffer for flag_submissions audit rows.
+
+    Rows go onto a bounded queue and a background thread writes them with one
+    multi-row INSERT per batch, flushing when `batch_size` rows are waiting or
+    `flush_interval` seconds after the first one arrived. The same transaction
+    adds each batch's wrong attempts to user_stats. When the queue is full,
+    `backpressure` decides what happens to the caller:
+
+    - "block": wait up to `block_timeout` seconds for room, then write inline
+    - "drop": discard the row and count it in `dropped`
+    - "inline": write the row immediately in the caller's thread
+
+    `shutdown` drains everything still queued before returning.
+    """
+
+    def __init__(self, max_size: int = AUDIT_QUEUE_MAX_SIZE, batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_interval: float = AUDIT_FLUSH_INTERVAL_SECONDS, backpressure: str = AUDIT_BACKPRESSURE,
+                 block_timeout: float = AUDIT_BLOCK_TIMEOUT_SECONDS):
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"AUDIT_BACKPRESSURE must be one of {', '.join(BACKPRESSURE_POLICIES)}")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.backpressure = backpressure
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def _ensure_started(self):
+        # Started on first use so each worker process gets its own thread after forking
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.shutdown)
+
+    # Producers -------------------------------------------------------------
+
+    def record(self, user_id: int, challenge_id: int, flag: str, correct: bool = False):
+        """Queue an audit row; never waits on a database commit unless the queue is full."""
+        row = {"user_id": user_id, "challenge_id": challenge_id, "flag": flag,
+               "correct": correct, "submitted_at": datetime.utcnow()}
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+            return
+        except queue.Full:
+            pass
+        if self.backpressure == "drop":
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning("Audit queue full; %d flag submission rows dropped so far", self.dropped)
+            return
+        if self.backpressure == "block":
+            try:
+                self._queue.put(row, timeout=self.block_timeout)
+                return
+            except queue.Full:
+                pass
+        self._write([row])
+
+    async def record_async(self, user_id: int, challenge_id: int, flag: str, correct: bool = False):
+        """Event-loop friendly `record`: only leaves the loop when the queue is full."""
+        if not self._queue.full() or self.backpressure == "drop":
+            self.record(user_id, challenge_id, flag, correct)
+        else:
+            await asyncio.to_thread(self.record, user_id, challenge_id, flag, correct)
+
+    # Consumer --------------------------------------------------------------
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            if isinstance(first, threading.Event):
+                first.set()
+                continue
+            batch = [first]
+            flushed = None
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    row = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                if isinstance(row, threading.Event):
+                    flushed = row
+                    break
+                batch.append(row)
+            self._write(batch)
+            if flushed is not None:
+                flushed.set()
+        # Drain whatever was queued behind the stop marker
+        rest = []
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(row, threading.Event):
+                row.set()
+            elif row is not _STOP:
+                rest.append(row)
+        for start in range(0, len(rest), self.batch_size):
+            self._write(rest[start:start + self.batch_size])
+
+    def _write(self, rows):
+        from backend.database import engine
+        try:
+            with engine.begin() as connection:
+                connection.execute(insert(FlagSubmission.__table__), rows)
+                # Wrong-attempt counts in user_stats move with the rows they count
+                stats = wrong_attempt_params(rows)
+                if stats:
+                    connection.execute(wrong_attempts_statement(connection.dialect.name), stats)
+            self.written += len(rows)
+            self.batches += 1
+        except Exception:
+            if len(rows) == 1:
+                self.failed += 1
+                logger.exception("Could not write flag submission audit row %r", rows[0])
+                return
+            # One bad row (e.g. a user deleted meanwhile) must not lose the whole batch
+            for row in rows:
+                self._write([row])
+
+    # Lifecycle -------------------------------------------------------------
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until every row queued before the call has been written; False on timeout."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done, timeout=timeout)
+        return done.wait(timeout)
+
+    def shutdown(self, timeout: float = 30.0):
+        """Write out everything still queued and stop the background thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning("Audit writer did not drain within %.0fs; %d rows pending", timeout, self.pending())
+
+
+# Shared writer used by crud.submit_flag and crud_async.submit_flag
+audit_writer = AuditWriter()
@@ -0,0 +1,347 @@
+# backend/bus.py
+"""
+Cross-worker change events.
+
+Every worker keeps hot in-process state (leaderboard, flag index, catalogue
+payloads, progress bitsets, principals). The CRUD post-commit hooks update the
+local copy and publish the change here; every other worker receives it and
+applies the same update, so no cache has to guess a TTL or re-read the
+database to stay current.
+
+Events are small JSON objects: {"type", "origin", "seq", ...fields}. `origin`
+identifies the publishing worker and `seq` counts its events from 1, so a
+receiver that sees a gap (a dropped datagram, a listener reconnect, a full
+send queue) knows it missed something and calls the resync handler, which
+reloads everything from the database once.
+
+Backends (EVENT_BUS_BACKEND):
+
+- "none": single worker, nothing is sent
+- "postgres": NOTIFY on EVENT_BUS_CHANNEL, one LISTEN connection per worker
+- "socket": Unix datagram sockets in EVENT_BUS_SOCKET_DIR, for several workers
+  on one host without Postgres (development and tests)
+
+Publishing never blocks the caller: events go onto a bounded queue drained by
+a sender thread. Received events are handled on the listener thread, except
+between `hold` and `release`: a worker reloading its state from the database
+holds them, so none is applied to the state about to be replaced, and handles
+them in order once the new state is in place.
+"""
+import glob
+import json
+import logging
+import os
+import queue
+import select
+import socket
+import threading
+import uuid
+from backend.config import EVENT_BUS_BACKEND, EVENT_BUS_CHANNEL, EVENT_BUS_SOCKET_DIR
+
+logger = logging.getLogger("backend.bus")
+
+_STOP = object()
+
+
+class EventBus:
+    """Base bus: versioned publish/receive; subclasses provide `_send` and `_listen`."""
+
+    def __init__(self, queue_size: int = 10000):
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._seq = 0
+        self._seq_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._handlers = {}
+        self._resync = None
+        self._last_seen = {}  # origin -> last seq received
+        self._hold_lock = threading.Lock()
+        self._holds = 0
+        self._held = []  # (type, fields) received while held, oldest first
+        self._draining = False
+        self._threads = []
+        self._stopping = threading.Event()
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+        self.resyncs = 0
+
+    # Wiring ----------------------------------------------------------------
+
+    def on(self, event_type: str, handler):
+        """Call `handler(**fields)` for events of this type published by other workers."""
+        self._handlers[event_type] = handler
+
+    def on_resync(self, handler):
+        """Call `handler()` when events may have been missed and local state must be reloaded."""
+        self._resync = handler
+
+    # Publishing --------------------------------------------------------------
+
+    def publish(self, event_type: str, **fields):
+        """Queue an event for the other workers (call after the change is committed)."""
+        with self._seq_lock:
+            self._seq += 1
+            event = {"type": event_type, "origin": self.origin, "seq": self._seq, **fields}
+        try:
+            self._queue.put_nowait(json.dumps(event, separators=(",", ":")))
+        except queue.Full:
+            # The sequence number is spent, so receivers will see the gap and resync
+            self.dropped += 1
+
+    def _send(self, payload: str):
+        raise NotImplementedError
+
+    def _run_sender(self):
+        while True:
+            payload = self._queue.get()
+            if payload is _STOP:
+                return
+            try:
+                self._send(payload)
+                self.published += 1
+            except Exception:
+                self.dropped += 1
+                logger.exception("Could not publish event")
+
+    # Receiving ---------------------------------------------------------------
+
+    def _listen(self):
+        raise NotImplementedError
+
+    def deliver(self, payload):
+        """Apply one received event, resyncing first if this origin's sequence skipped."""
+        try:
+            event = json.loads(payload)
+            origin, seq, event_type = event.pop("origin"), event.pop("seq"), event.pop("type")
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed event %r", payload)
+            return
+        if origin == self.origin:
+            return
+        self.received += 1
+        last = self._last_seen.get(origin)
+        self._last_seen[origin] = seq if last is None else max(last, seq)
+        if last is not None and seq <= last:
+            return
+        # A worker's first event sets the baseline: what it published before we started is in the database
+        if last is not None and seq != last + 1:
+            # Missed events; the reload already includes this one
+            self.resync()
+            return
+        with self._hold_lock:
+            if self._holds or self._draining:
+                self._held.append((event_type, event))
+                return
+        self._handle(event_type, event)
+
+    def _handle(self, event_type: str, event: dict):
+        handler = self._handlers.get(event_type)
+        if handler is not None:
+            try:
+                handler(**event)
+            except Exception:
+                logger.exception("Event handler for %r failed", event_type)
+                self.resync()
+
+    def hold(self):
+        """Keep received events instead of handling them until the matching `release`."""
+        with self._hold_lock:
+            self._holds += 1
+
+    def release(self):
+        """Handle the events kept since `hold` in the order they arrived, then handle events as they arrive."""
+        with self._hold_lock:
+            self._holds -= 1
+            if self._holds or self._draining:
+                return
+            self._draining = True
+        while True:
+            with self._hold_lock:
+                if self._holds or not self._held:
+                    self._draining = False
+                    return
+                held, self._held = self._held, []
+            for event_type, event in held:
+                self._handle(event_type, event)
+
+    def resync(self):
+        self.resyncs += 1
+        with self._hold_lock:
+            # The reload reads everything those events changed
+            self._held = []
+        if self._resync is not None:
+            try:
+                self._resync()
+            except Exception:
+                logger.exception("Resync failed")
+
+    # Lifecycle ---------------------------------------------------------------
+
+    def start(self):
+        """Start the sender and listener threads (once per worker, at startup)."""
+        if self._threads:
+            return
+        self._stopping.clear()
+        for target, name in ((self._run_sender, "event-bus-sender"), (self._listen, "event-bus-listener")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def close(self, timeout: float = 5.0):
+        """Send what is queued, then stop both threads."""
+        if not self._threads:
+            return
+        self._stopping.set()
+        self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def render_metrics(self) -> str:
+        """Counters in Prometheus text format, appended to /metrics."""
+        return "".join(
+            f"# TYPE event_bus_{name}_total counter\nevent_bus_{name}_total {value}\n"
+            for name, value in (("published", self.published), ("received", self.received),
+                                ("dropped", self.dropped), ("resyncs", self.resyncs))
+        )
+
+
+class NullBus(EventBus):
+    """Single-worker deployments: events are dropped without being queued."""
+
+    def publish(self, event_type: str, **fields):
+        pass
+
+    def start(self):
+        pass
+
+
+class PostgresBus(EventBus):
+    """NOTIFY/LISTEN on one channel, each on a dedicated autocommit connection outside the pool."""
+
+    def __init__(self, channel: str = EVENT_BUS_CHANNEL, **kwargs):
+        super().__init__(**kwargs)
+        self.channel = channel
+        self._sender = None
+
+    @staticmethod
+    def _connect():
+        from backend.database import engine
+        cargs, cparams = engine.dialect.create_connect_args(engine.url)
+        connection = engine.dialect.dbapi.connect(*cargs, **cparams)
+        connection.autocommit = True
+        return connection
+
+    def _send(self, payload: str):
+        for attempt in (1, 2):
+            try:
+                if self._sender is None:
+                    self._sender = self._connect()
+                with self._sender.cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+                return
+            except Exception:
+                self._sender = None
+                if attempt == 2:
+                    raise
+
+    def _listen(self):
+        backoff = 0.5
+        while not self._stopping.is_set():
+            try:
+                connection = self._connect()
+            except Exception:
+                logger.exception("Event bus listener could not connect; retrying in %.1fs", backoff)
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                # Anything published while we weren't listening is lost: start from the database
+                self.resync()
+                backoff = 0.5
+                while not self._stopping.is_set():
+                    if select.select([connection], [], [], 1.0)[0]:
+                        connection.poll()
+                        while connection.notifies:
+                            self.deliver(connection.notifies.pop(0).payload)
+            except Exception:
+                logger.exception("Event bus listener lost its connection")
+            finally:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+
+class SocketBus(EventBus):
+    """
+    One Unix datagram socket per worker in a shared directory; publishing sends
+    the event to every other socket there. Sockets left by dead workers are removed.
+    """
+
+    def __init__(self, directory: str = EVENT_BUS_SOCKET_DIR, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+        self.path = os.path.join(directory, f"{self.origin}.sock")
+        self._socket = None
+
+    def start(self):
+        if self._socket is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._socket.bind(self.path)
+            self._socket.settimeout(1.0)
+        super().start()
+
+    def _send(self, payload: str):
+        data = payload.encode()
+        for path in glob.glob(os.path.join(self.directory, "*.sock")):
+            if path == self.path:
+                continue
+            try:
+                self._socket.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Nobody is bound there any more
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except (BlockingIOError, socket.timeout):
+                # The receiver's buffer is full; it will see the sequence gap and resync
+                pass
+
+    def _listen(self):
+        while not self._stopping.is_set():
+            try:
+                data = self._socket.recv(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            self.deliver(data.decode())
+
+    def close(self, timeout: float = 5.0):
+        super().close(timeout)
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+def create_bus(backend: str = EVENT_BUS_BACKEND) -> EventBus:
+    if backend == "postgres":
+        return PostgresBus()
+    if backend == "socket":
+        return SocketBus()
+    if backend == "none":
+        return NullBus()
+    raise RuntimeError(f"Unknown EVENT_BUS_BACKEND {backend!r}; use none, postgres or socket")
+
+
+# Shared bus: the CRUD hooks publish to it, main.py starts and stops it
+event_bus = create_bus()
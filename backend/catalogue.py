@@ -0,0 +1,118 @@
+# backend/catalogue.py
+import hashlib
+import threading
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from backend.pagination import Page
+from backend.serialization import dumps
+
+
+class CachedPayload:
+    """A response body serialised once, plus the ETag derived from it and any extra headers."""
+
+    __slots__ = ("body", "etag", "headers")
+
+    def __init__(self, body: bytes, headers=None):
+        self.body = body
+        # Content-derived so every worker hands out the same ETag for the same catalogue
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.headers = headers or {}
+
+
+class CatalogueCache:
+    """
+    Read-through cache of serialised level and challenge payloads.
+
+    The catalogue only changes when a challenge is created, so entries live
+    until `invalidate` bumps the version (crud.create_challenge does this).
+    A payload loaded while the version changed underneath it is returned but
+    not stored, so a slow reader can never re-cache data that is already stale.
+
+    Callers pass key None for requests that must not be stored (anything past
+    the first page, or with an explicit ?limit): those keys come from the
+    client, and caching them would let anyone grow the cache without bound.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._payloads = {}
+        self.version = 0
+
+    def get(self, key):
+        return None if key is None else self._payloads.get(key)
+
+    def put(self, key, data, version: int, serializer=None):
+        """
+        Serialise `data` (a list, object or Page of them) and store it if the catalogue
+        is still at `version`. With a Serializer the rows are encoded straight from the
+        ORM objects or row tuples; without one `data` must already be JSON-able.
+        """
+        headers = None
+        if isinstance(data, Page):
+            data, headers = data.items, data.headers()
+        entry = CachedPayload(encode(data, serializer), headers)
+        with self._lock:
+            if key is not None and version == self.version:
+                self._payloads[key] = entry
+        return entry
+
+    def get_or_load(self, key, loader, serializer=None):
+        """
+        Return the cached payload for `key`, calling `loader()` on a miss (always
+        when key is None, and the result is then not stored); None if the loader returns None.
+        """
+        entry = self.get(key)
+        if entry is None:
+            version = self.version
+            data = loader()
+            if data is None:
+                return None
+            entry = self.put(key, data, version, serializer)
+        return entry
+
+    async def get_or_load_async(self, key, loader, serializer=None):
+        """Async version of get_or_load for loaders that are coroutine functions."""
+        entry = self.get(key)
+        if entry is None:
+            version = self.version
+            data = await loader()
+            if data is None:
+                return None
+            entry = self.put(key, data, version, serializer)
+        return entry
+
+    def invalidate(self):
+        """Drop every cached payload and bump the catalogue version."""
+        with self._lock:
+            self.version += 1
+            self._payloads = {}
+
+
+def encode(data, serializer=None) -> bytes:
+    """JSON bytes for a payload, through the schema's Serializer when there is one."""
+    if serializer is None:
+        return dumps(jsonable_encoder(data))
+    if isinstance(data, list):
+        return serializer.encode_many(data)
+    return serializer.encode(data)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header already names this ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates or "W/" + etag in candidates
+
+
+def catalogue_response(request: Request, entry: CachedPayload):
+    """Send a cached payload, or an empty 304 if the client already has it."""
+    headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+# Shared cache used by the level and challenge routes
+catalogue_cache = CatalogueCache()
@@ -1,21 +1,117 @@
-from sqlalchemy.orm import Session
-from backend.models import User, Challenge, UserChallenge, FlagSubmission, Level
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.orm import Session, undefer
+from backend.models import (
+    User, Challenge, UserChallenge, FlagSubmission, Level, UserStats, UserCategoryStats, Hint, HintPurchase
+)
 from backend.schemas import UserCreate, ChallengeCreate, FlagSubmissionCreate
-from passlib.context import CryptContext
+from backend.leaderboard import leaderboard
+from backend.principals import principal_cache
+from backend.catalogue import catalogue_cache
+from backend.progress import progress_index
+from backend.stats import hint_statement, solve_statements
+from backend.scoring import after_solve, counts_solves, revalue_statements, scores_query, solve_statement
+from backend.audit import audit_writer
+from backend.flags import flag_index, parse_rules
+from backend.events import scoreboard_hub
+from backend.bus import event_bus
+from backend.database import is_retryable, recent_writes
+from backend.config import SOLVE_ATTEMPTS
+from backend.security import hash_password
 from fastapi import HTTPException
 import random
 import string
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated=["auto"])
+# Post-commit hooks shared with crud_async: keep in-process state in step with the database.
+# Each applies the change to this worker's state and publishes it on the event bus; the
+# _on_remote_* handlers below apply the same change in every other worker.
+def _apply_xp_change(user_id: int, username: str, xp: int):
+    recent_writes.user_wrote(user_id)
+    leaderboard.update(user_id, username, xp)
+    principal_cache.invalidate(user_id)
+    scoreboard_hub.xp_changed(user_id)
+
+def _after_xp_change(user_id: int, username: str, xp: int, delta: int):
+    """Propagate a committed XP change (`delta` is the amount added) to the leaderboard, live scoreboard and principal cache."""
+    _apply_xp_change(user_id, username, xp)
+    event_bus.publish("xp", user_id=user_id, username=username, delta=delta)
+
+def _apply_profile_change(user_id: int):
+    recent_writes.user_wrote(user_id)
+    principal_cache.invalidate(user_id)
+
+def _after_profile_change(user_id: int):
+    """Drop the cached principal after a committed profile change."""
+    _apply_profile_change(user_id)
+    event_bus.publish("profile", user_id=user_id)
+
+def _apply_solve(user_id: int, challenge_id: int):
+    leaderboard.record_solve(user_id)
+    progress_index.mark_solved(user_id, challenge_id)
+    scoreboard_hub.solved(user_id, challenge_id)
+
+def _after_solve(user_id: int, challenge_id: int):
+    """Record a committed solve in the leaderboard counts, the progress index and the live scoreboard."""
+    _apply_solve(user_id, challenge_id)
+    event_bus.publish("solve", user_id=user_id, challenge_id=challenge_id)
+
+def _after_catalogue_change():
+    """Invalidate the cached level/challenge payloads after a committed catalogue change."""
+    # Reads go to the primary until the replicas have the change, so the caches don't reload it stale
+    recent_writes.shared_wrote()
+    catalogue_cache.invalidate()
+    progress_index.reset_levels()
+
+def _after_challenge_saved(challenge: Challenge):
+    """Refresh the flag index entry for a committed challenge and invalidate the catalogue."""
+    flag_index.put(challenge)
+    _after_catalogue_change()
+    event_bus.publish("challenge", challenge_id=challenge.id)
+
+def _after_catalogue_import(challenge_ids, levels_changed: bool):
+    """Invalidate the catalogue after a committed bulk import (see import_catalogue.py), here and on every worker."""
+    _after_catalogue_change()
+    for challenge_id in challenge_ids:
+        flag_index.forget(challenge_id)
+        event_bus.publish("challenge", challenge_id=challenge_id)
+    if levels_changed and not challenge_ids:
+        event_bus.publish("catalogue")
+
+def _on_remote_xp_change(user_id: int, username: str, delta: int):
+    # Deltas commute, so events from different workers may arrive in any order
+    _apply_xp_change(user_id, username, leaderboard.add_xp(user_id, username, delta))
+
+def _on_remote_challenge_saved(challenge_id: int):
+    # Flags never travel on the bus: the entry is re-read on its next lookup
+    flag_index.forget(challenge_id)
+    _after_catalogue_change()
+
+event_bus.on("xp", _on_remote_xp_change)
+event_bus.on("profile", _apply_profile_change)
+event_bus.on("solve", _apply_solve)
+event_bus.on("challenge", _on_remote_challenge_saved)
+event_bus.on("catalogue", _after_catalogue_change)
+
+def _check_flag_rules(flag_rules):
+    """Reject unknown flag normalisation rules before anything is written."""
+    try:
+        parse_rules(flag_rules)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 # User-related CRUD operations
 def get_user_by_email(db: Session, email: str):
     """Retrieve a user by their email address."""
     return db.query(User).filter(User.email == email).first()
 
-def create_user(db: Session, user: UserCreate):
-    """Create a new user with a hashed password."""
-    hashed_password = pwd_context.hash(user.password)
+def get_user_by_id(db: Session, user_id: int):
+    """Retrieve a user by their ID."""
+    return db.get(User, user_id)
+
+def create_user(db: Session, user: UserCreate, hashed_password: str = None):
+    """Create a new user with a hashed password (pass hashed_password if it was already hashed off-thread)."""
+    if hashed_password is None:
+        hashed_password = hash_password(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
@@ -25,18 +121,49 @@ def create_user(db: Session, user: UserCreate):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    _after_xp_change(db_user.id, db_user.username, db_user.xp, 0)
     return db_user
 
-def update_xp(db: Session, user: User, xp_amount: int):
-    """Increase the XP of a user by the given amount."""
-    user.xp += xp_amount
+def update_password_hash(db: Session, user: User, hashed_password: str):
+    """Replace a user's password hash, e.g. after the bcrypt cost factor changed."""
+    user.hashed_password = hashed_password
     db.commit()
-    db.refresh(user)
+    _after_profile_change(user.id)
     return user
 
-def get_top_users(db: Session, limit: int = 10):
-    """Retrieve the top users by XP."""
-    return db.query(User).order_by(User.xp.desc()).limit(limit).all()
+def update_xp(db: Session, user_id: int, xp_amount: int):
+    """
+    Increase the XP of a user by the given amount in one UPDATE, so concurrent
+    changes add up. Returns the user's username and new xp, or None if there is no such user.
+    """
+    updated = db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(xp=User.xp + xp_amount)
+        .returning(User.username, User.xp)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if updated is None:
+        db.rollback()
+        return None
+    db.commit()
+    _after_xp_change(user_id, updated.username, updated.xp, xp_amount)
+    return updated
+
+def _after_user_key(after):
+    """Keyset filter for users ordered by XP descending, then id: rows strictly after (xp, id)."""
+    xp, user_id = after
+    return or_(User.xp < xp, and_(User.xp == xp, User.id > user_id))
+
+def get_top_users(db: Session, limit: int = 10, after=None):
+    """
+    Retrieve the top users by XP straight from the database (the routes read from backend.leaderboard).
+    Pass the (xp, id) of the last user on the previous page as `after` to continue from it.
+    """
+    query = db.query(User)
+    if after is not None:
+        query = query.filter(_after_user_key(after))
+    return query.order_by(User.xp.desc(), User.id).limit(limit).all()
 
 # Challenge-related CRUD operations
 def generate_flag(length: int = 16):
@@ -45,17 +172,8 @@ def generate_flag(length: int = 16):
 
 def create_challenge(db: Session, challenge: ChallengeCreate, flag: str):
     """Create a new challenge with a flag."""
-    print("Creating challenge with data:")
-    print(f"  Name: {challenge.name}")
-    print(f"  Description: {challenge.description}")
-    print(f"  Content: {challenge.content}")  # Print the new content
-    print(f"  Image URL: {challenge.image_url}")  # Print the new image URL
-    print(f"  Difficulty: {challenge.difficulty}")
-    print(f"  Category: {challenge.category}")
-    print(f"  XP Reward: {challenge.xp_reward}")
-    print(f"  Flag: {flag}")
-    print(f"  Level ID: {challenge.level_id}")
-
+    _check_flag_rules(challenge.flag_rules)
+    _check_hints(challenge.hints)
     db_challenge = Challenge(
         name=challenge.name,
         description=challenge.description,
@@ -65,20 +183,36 @@ def create_challenge(db: Session, challenge: ChallengeCreate, flag: str):
         category=challenge.category,
         xp_reward=challenge.xp_reward,
         flag=flag,
-        level_id=challenge.level_id
+        flag_rules=challenge.flag_rules,
+        level_id=challenge.level_id,
+        hints=[Hint(tier=hint.tier, body=hint.body, cost=hint.cost) for hint in challenge.hints or []],
     )
     db.add(db_challenge)
     db.commit()
     db.refresh(db_challenge)
+    _after_challenge_saved(db_challenge)
     return db_challenge
 
+# Columns list endpoints need; content (large) and flag (secret) are left in the database
+CHALLENGE_SUMMARY_COLUMNS = (
+    Challenge.id, Challenge.name, Challenge.description, Challenge.difficulty,
+    Challenge.category, Challenge.xp_reward, Challenge.level_id,
+)
+
 def get_challenge_by_id(db: Session, challenge_id: int):
-    """Retrieve a challenge by its ID."""
+    """Retrieve a challenge by its ID (content stays deferred)."""
     return db.query(Challenge).filter(Challenge.id == challenge_id).first()
 
-def get_all_challenges(db: Session):
-    """Retrieve all challenges."""
-    return db.query(Challenge).all()
+def get_challenge_detail(db: Session, challenge_id: int):
+    """Retrieve a challenge by its ID with its content loaded in the same query."""
+    return db.query(Challenge).options(undefer(Challenge.content)).filter(Challenge.id == challenge_id).first()
+
+def get_all_challenges(db: Session, after_id: int = None, limit: int = None):
+    """Retrieve summary rows for all challenges in id order; after_id/limit select one keyset page."""
+    query = db.query(*CHALLENGE_SUMMARY_COLUMNS)
+    if after_id is not None:
+        query = query.filter(Challenge.id > after_id)
+    return query.order_by(Challenge.id).limit(limit).all()
 
 def has_user_completed_challenge(db: Session, user_id: int, challenge_id: int):
     """Check if a user has already completed a challenge."""
@@ -89,42 +223,111 @@ def has_user_completed_challenge_by_id(db: Session, user_id: int, challenge_id:
     return db.query(UserChallenge).filter_by(user_id=user_id, challenge_id=challenge_id, success=True).first() is not None
 
 def submit_flag(db: Session, user_id: int, challenge_id: int, submitted_flag: str):
-    """Check if the submitted flag is correct and update XP if so."""
-    challenge = get_challenge_by_id(db, challenge_id)
-    user = db.query(User).filter(User.id == user_id).first()
+    """
+    Check if the submitted flag is correct and update XP if so.
 
-    if not challenge or not user:
+    The flag check uses the in-memory flag index and the completion check the
+    user's progress bitset, so neither reads the challenge row. A correct
+    submission counts the solve (moving earlier solvers' XP if the challenge's
+    value decayed, see backend/scoring.py), awards XP, records the solve, bumps
+    the user's stats and logs the attempt in a single transaction. The unique (user_id, challenge_id) constraint on user_challenges
+    rolls back a concurrent duplicate solve, so XP can only be awarded once. A transaction the
+    database aborts as a deadlock is run again, up to SOLVE_ATTEMPTS times, before a 503.
+    Incorrect attempts are handed to the audit writer and written in batches.
+    """
+    entry = flag_index.lookup(db, challenge_id)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Challenge or user not found")
 
-    if has_user_completed_challenge(db, user_id, challenge_id):
+    if progress_index.is_completed(progress_index.completed_bits(db, user_id), challenge_id):
         raise HTTPException(status_code=400, detail="Challenge already completed")
 
-    if submitted_flag.strip() != challenge.flag.strip():
-        # Record incorrect submission
-        fs = FlagSubmission(user_id=user_id, challenge_id=challenge_id, flag=submitted_flag, correct=False)
-        db.add(fs)
-        db.commit()
-        db.refresh(fs)
+    if not flag_index.matches(entry, submitted_flag):
+        # Incorrect submissions are only audited, so they go to the write-behind queue instead of a commit
+        audit_writer.record(user_id, challenge_id, submitted_flag, correct=False)
         raise HTTPException(status_code=400, detail="Incorrect flag")
 
-    # Correct submission: update XP and mark challenge as completed
-    update_xp(db, user, challenge.xp_reward)
-    user_challenge = UserChallenge(user_id=user_id, challenge_id=challenge_id, success=True)
-    db.add(user_challenge)
-    # Record correct flag submission
-    fs = FlagSubmission(user_id=user_id, challenge_id=challenge_id, flag=submitted_flag, correct=True)
-    db.add(fs)
+    # Correct submission: count the solve (re-valuing the challenge for earlier solvers if it decayed),
+    # award XP, mark the challenge as completed and record the flag together
+    for attempt in range(1, SOLVE_ATTEMPTS + 1):
+        try:
+            value, delta, rescored, awarded = _record_solve(db, user_id, challenge_id, entry, submitted_flag)
+            break
+        except IntegrityError:
+            # Another request solved it first; the rollback also undoes the XP increment
+            db.rollback()
+            # The solve may have happened in another worker, so re-read this user's bitset next time
+            progress_index.forget(user_id)
+            raise HTTPException(status_code=400, detail="Challenge already completed")
+        except DBAPIError as exc:
+            # Aborted to break a deadlock with a concurrent solve: nothing was written, so run it again
+            db.rollback()
+            if not is_retryable(exc):
+                raise
+            if attempt == SOLVE_ATTEMPTS:
+                raise HTTPException(status_code=503, detail="Too many concurrent solves, please retry")
+
+    for row in rescored:
+        _after_xp_change(row.id, row.username, row.xp, delta)
+    _after_xp_change(user_id, awarded.username, awarded.xp, value)
+    _after_solve(user_id, challenge_id)
+    return {"msg": "Challenge completed!", "xp_earned": value}
+
+def _record_solve(db: Session, user_id: int, challenge_id: int, entry, submitted_flag: str):
+    """One attempt at a solve's transaction; returns (value, delta, rescored solvers, awarded user) once committed."""
+    dialect_name = db.get_bind().dialect.name
+    # Static XP is fixed at solve time, so only dynamic scoring counts the solve (and locks the challenge's row)
+    value, delta, rescored = entry.xp_reward, 0, []
+    if counts_solves():
+        scores = db.execute(solve_statement(dialect_name, challenge_id, entry.xp_reward)).first()
+        value, delta = after_solve(entry.xp_reward, scores.solves, scores.value)
+    if delta:
+        # Before this solver's user_challenges row is flushed, so only earlier solvers move
+        *updates, rescore = revalue_statements(challenge_id, value, delta, user_id)
+        for statement in updates:
+            db.execute(statement)
+        rescored = db.execute(rescore).all()
+    awarded = db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(xp=User.xp + value)
+        .returning(User.username, User.xp)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if awarded is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Challenge or user not found")
+    db.add(UserChallenge(user_id=user_id, challenge_id=challenge_id, success=True))
+    db.add(FlagSubmission(user_id=user_id, challenge_id=challenge_id, flag=submitted_flag, correct=True))
+    for statement in solve_statements(dialect_name, user_id, entry.category, value):
+        db.execute(statement)
     db.commit()
-    db.refresh(user)
-    return {"msg": "Challenge completed!", "xp_earned": challenge.xp_reward}
+    return value, delta, rescored, awarded
+
+def get_user_stats(db: Session, user_id: int):
+    """A user's aggregates and per-category solve counts, or None before their first solve, hint or wrong attempt."""
+    stats = db.get(UserStats, user_id)
+    if stats is None:
+        return None
+    categories = db.query(UserCategoryStats.category, UserCategoryStats.solves).filter(UserCategoryStats.user_id == user_id)
+    return stats, dict(categories.all())
+
+def get_challenge_scores(db: Session):
+    """Solve count and current value of every solved challenge."""
+    return db.execute(scores_query()).all()
 
 def get_user_challenges(db: Session, user_id: int):
     """Retrieve all challenges attempted by a user."""
     return db.query(UserChallenge).filter(UserChallenge.user_id == user_id).all()
 
-def get_all_levels(db: Session):
+def get_all_levels(db: Session, after=None, limit: int = None):
+    """Retrieve levels in progression order; pass the (order, id) of the previous page's last level as `after`."""
     try:
-        return db.query(Level).order_by(Level.order).all()
+        query = db.query(Level)
+        if after is not None:
+            order, level_id = after
+            query = query.filter(or_(Level.order > order, and_(Level.order == order, Level.id > level_id)))
+        return query.order_by(Level.order, Level.id).limit(limit).all()
     except Exception as e:
         print(f"Error fetching levels: {e}")
         raise
@@ -133,25 +336,93 @@ def get_level_by_id(db: Session, level_id: int):
     """Retrieve a level by its ID."""
     return db.query(Level).filter(Level.id == level_id).first()
 
-def get_challenges_by_level(db: Session, level_id: int):
-    return db.query(Challenge).filter(Challenge.level_id == level_id).all()
+def get_challenges_by_level(db: Session, level_id: int, after_id: int = None, limit: int = None):
+    """Retrieve summary rows for the challenges in a level in id order; after_id/limit select one keyset page."""
+    query = db.query(*CHALLENGE_SUMMARY_COLUMNS).filter(Challenge.level_id == level_id)
+    if after_id is not None:
+        query = query.filter(Challenge.id > after_id)
+    return query.order_by(Challenge.id).limit(limit).all()
+
+def _hint_tiers_query(user_id: int, challenge_id: int):
+    """Every hint tier of a challenge with the user's purchase id (None if not bought), in tier order."""
+    return (
+        select(Hint.id, Hint.tier, Hint.cost, Hint.body, HintPurchase.id.label("purchase_id"))
+        .outerjoin(HintPurchase, and_(HintPurchase.hint_id == Hint.id, HintPurchase.user_id == user_id))
+        .where(Hint.challenge_id == challenge_id)
+        .order_by(Hint.tier)
+    )
+
+def _choose_hint(tiers, tier=None):
+    """
+    The hint to show: the requested tier, or by default the first one not yet
+    bought (the last one once all are). Tiers have to be bought in order.
+    """
+    if tier is None:
+        return next((row for row in tiers if row.purchase_id is None), tiers[-1])
+    row = next((row for row in tiers if row.tier == tier), None)
+    if row is None:
+        raise HTTPException(status_code=404, detail="No such hint tier")
+    skipped = [earlier.tier for earlier in tiers if earlier.tier < row.tier and earlier.purchase_id is None]
+    if row.purchase_id is None and skipped:
+        raise HTTPException(status_code=400, detail=f"Buy hint tier {skipped[0]} first")
+    return row
+
+def _hint_result(row, remaining_xp: int, charged: bool):
+    return {"hint": row.body, "remaining_xp": remaining_xp, "tier": row.tier, "cost": row.cost, "charged": charged}
+
+def _hint_tiers_result(tiers):
+    return [{"tier": row.tier, "cost": row.cost, "purchased": row.purchase_id is not None,
+             "hint": row.body if row.purchase_id is not None else None} for row in tiers]
+
+def _check_hints(hints):
+    """Reject duplicate or non-positive hint tiers and negative costs before anything is written."""
+    tiers = [hint.tier for hint in hints or []]
+    if len(set(tiers)) != len(tiers) or any(tier < 1 for tier in tiers):
+        raise HTTPException(status_code=400, detail="Hint tiers must be distinct positive numbers")
+    if any(hint.cost < 0 for hint in hints or []):
+        raise HTTPException(status_code=400, detail="Hint costs cannot be negative")
 
-def request_hint(db: Session, user_id: int, challenge_id: int):
+def get_hint_tiers(db: Session, user_id: int, challenge_id: int):
+    """The challenge's hint tiers with what the user has bought (bodies of bought tiers only)."""
+    return _hint_tiers_result(db.execute(_hint_tiers_query(user_id, challenge_id)).all())
+
+def request_hint(db: Session, user_id: int, challenge_id: int, tier: int = None):
     """
-    Deduct a fixed amount of XP (e.g., 5 XP) and return a hint for the challenge.
-    For simplicity, assume each challenge has a static hint stored in a new column, 'hint', in the Challenge model.
+    Buy (or view again) a hint for a challenge; None if the challenge has no hints.
+
+    A hint already in the user's hint_purchases ledger is returned without
+    charging. Otherwise the XP is deducted with one conditional
+    UPDATE ... WHERE xp >= cost RETURNING, in the same transaction as the ledger
+    row, so concurrent requests can neither overdraw the user nor pay twice:
+    the unique (user_id, hint_id) constraint rolls back the second purchase.
     """
-    challenge = get_challenge_by_id(db, challenge_id)
-    if not challenge or not hasattr(challenge, 'hint') or not challenge.hint:
+    tiers = db.execute(_hint_tiers_query(user_id, challenge_id)).all()
+    if not tiers:
         return None
-    # Deduct XP (e.g., 5 XP) from user
-    user = db.query(User).filter(User.id == user_id).first()
-    if user.xp < 5:
+    row = _choose_hint(tiers, tier)
+    if row.purchase_id is not None:
+        return _hint_result(row, db.scalar(select(User.xp).where(User.id == user_id)), charged=False)
+
+    charged = db.execute(
+        update(User)
+        .where(User.id == user_id, User.xp >= row.cost)
+        .values(xp=User.xp - row.cost)
+        .returning(User.username, User.xp)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if charged is None:
+        db.rollback()
         raise HTTPException(status_code=400, detail="Not enough XP for a hint")
-    user.xp -= 5
-    db.commit()
-    # Return the hint in a schema format (create a HintOut schema accordingly)
-    return {"hint": challenge.hint, "remaining_xp": user.xp}
+    db.add(HintPurchase(user_id=user_id, hint_id=row.id, cost=row.cost))
+    db.execute(hint_statement(db.get_bind().dialect.name, user_id))
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request bought it first; rolling back refunds this one
+        db.rollback()
+        return _hint_result(row, db.scalar(select(User.xp).where(User.id == user_id)), charged=False)
+    _after_xp_change(user_id, charged.username, charged.xp, -row.cost)
+    return _hint_result(row, charged.xp, charged=True)
 
 def get_completed_challenge_ids_for_level(db: Session, user_id: int, level_id: int):
     """
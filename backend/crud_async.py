@@ -0,0 +1,290 @@
+# backend/crud_async.py
+"""
+Async variants of the functions in backend/crud.py, for use with an AsyncSession
+from backend.database.get_async_db. Each function mirrors its sync counterpart's
+behaviour and side effects (leaderboard updates, HTTP errors).
+"""
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+from backend.models import (
+    User, Challenge, UserChallenge, FlagSubmission, Level, UserStats, UserCategoryStats, Hint, HintPurchase
+)
+from backend.schemas import UserCreate, ChallengeCreate
+from backend.security import hash_password_async
+from backend.audit import audit_writer
+from backend.flags import flag_index
+from backend.progress import progress_index
+from backend.stats import hint_statement, solve_statements
+from backend.scoring import after_solve, counts_solves, revalue_statements, scores_query, solve_statement
+from backend.database import is_retryable
+from backend.config import SOLVE_ATTEMPTS
+from backend.crud import (
+    CHALLENGE_SUMMARY_COLUMNS, _after_user_key, generate_flag, _after_xp_change, _after_profile_change, _after_solve, _after_challenge_saved,
+    _check_flag_rules, _check_hints, _hint_tiers_query, _choose_hint, _hint_result, _hint_tiers_result
+)
+from fastapi import HTTPException
+
+# User-related CRUD operations
+async def get_user_by_email(db: AsyncSession, email: str):
+    """Retrieve a user by their email address."""
+    return (await db.execute(select(User).where(User.email == email))).scalars().first()
+
+async def get_user_by_id(db: AsyncSession, user_id: int):
+    """Retrieve a user by their ID."""
+    return await db.get(User, user_id)
+
+async def create_user(db: AsyncSession, user: UserCreate, hashed_password: str = None):
+    """Create a new user with a hashed password."""
+    if hashed_password is None:
+        hashed_password = await hash_password_async(user.password)
+    db_user = User(
+        username=user.username,
+        email=user.email,
+        hashed_password=hashed_password,
+        xp=0
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    _after_xp_change(db_user.id, db_user.username, db_user.xp, 0)
+    return db_user
+
+async def update_password_hash(db: AsyncSession, user: User, hashed_password: str):
+    """Replace a user's password hash, e.g. after the bcrypt cost factor changed."""
+    user.hashed_password = hashed_password
+    await db.commit()
+    _after_profile_change(user.id)
+    return user
+
+async def update_xp(db: AsyncSession, user_id: int, xp_amount: int):
+    """
+    Increase the XP of a user by the given amount in one UPDATE, so concurrent
+    changes add up. Returns the user's username and new xp, or None if there is no such user.
+    """
+    updated = (await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(xp=User.xp + xp_amount)
+        .returning(User.username, User.xp)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if updated is None:
+        await db.rollback()
+        return None
+    await db.commit()
+    _after_xp_change(user_id, updated.username, updated.xp, xp_amount)
+    return updated
+
+async def get_top_users(db: AsyncSession, limit: int = 10, after=None):
+    """Retrieve the top users by XP straight from the database (see crud.get_top_users for `after`)."""
+    query = select(User)
+    if after is not None:
+        query = query.where(_after_user_key(after))
+    return (await db.execute(query.order_by(User.xp.desc(), User.id).limit(limit))).scalars().all()
+
+# Challenge-related CRUD operations
+async def create_challenge(db: AsyncSession, challenge: ChallengeCreate, flag: str):
+    """Create a new challenge with a flag."""
+    _check_flag_rules(challenge.flag_rules)
+    _check_hints(challenge.hints)
+    db_challenge = Challenge(
+        name=challenge.name,
+        description=challenge.description,
+        content=challenge.content,
+        image_url=challenge.image_url,
+        difficulty=challenge.difficulty,
+        category=challenge.category,
+        xp_reward=challenge.xp_reward,
+        flag=flag,
+        flag_rules=challenge.flag_rules,
+        level_id=challenge.level_id,
+        hints=[Hint(tier=hint.tier, body=hint.body, cost=hint.cost) for hint in challenge.hints or []],
+    )
+    db.add(db_challenge)
+    await db.commit()
+    # No refresh: every column was set or defaulted in Python, and a refresh would expire the deferred content
+    _after_challenge_saved(db_challenge)
+    return db_challenge
+
+async def get_challenge_by_id(db: AsyncSession, challenge_id: int):
+    """Retrieve a challenge by its ID (content stays deferred)."""
+    return (await db.execute(select(Challenge).where(Challenge.id == challenge_id))).scalars().first()
+
+async def get_challenge_detail(db: AsyncSession, challenge_id: int):
+    """Retrieve a challenge by its ID with its content loaded in the same query."""
+    result = await db.execute(select(Challenge).options(undefer(Challenge.content)).where(Challenge.id == challenge_id))
+    return result.scalars().first()
+
+async def get_all_challenges(db: AsyncSession, after_id: int = None, limit: int = None):
+    """Retrieve summary rows for all challenges in id order; after_id/limit select one keyset page."""
+    query = select(*CHALLENGE_SUMMARY_COLUMNS)
+    if after_id is not None:
+        query = query.where(Challenge.id > after_id)
+    return (await db.execute(query.order_by(Challenge.id).limit(limit))).all()
+
+async def has_user_completed_challenge(db: AsyncSession, user_id: int, challenge_id: int):
+    """Check if a user has already completed a challenge."""
+    result = await db.execute(
+        select(UserChallenge.id)
+        .where(UserChallenge.user_id == user_id,
+               UserChallenge.challenge_id == challenge_id,
+               UserChallenge.success == True)
+        .limit(1)
+    )
+    return result.first() is not None
+
+async def has_user_completed_challenge_by_id(db: AsyncSession, user_id: int, challenge_id: int):
+    """Check if a user has successfully completed a specific challenge by its ID."""
+    return await has_user_completed_challenge(db, user_id, challenge_id)
+
+async def submit_flag(db: AsyncSession, user_id: int, challenge_id: int, submitted_flag: str):
+    """Check if the submitted flag is correct and update XP if so (see crud.submit_flag)."""
+    entry = await flag_index.lookup_async(db, challenge_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Challenge or user not found")
+
+    if progress_index.is_completed(await progress_index.completed_bits_async(db, user_id), challenge_id):
+        raise HTTPException(status_code=400, detail="Challenge already completed")
+
+    if not flag_index.matches(entry, submitted_flag):
+        # Incorrect submissions are only audited, so they go to the write-behind queue instead of a commit
+        await audit_writer.record_async(user_id, challenge_id, submitted_flag, correct=False)
+        raise HTTPException(status_code=400, detail="Incorrect flag")
+
+    # Correct submission: count the solve (re-valuing the challenge for earlier solvers if it decayed),
+    # award XP, mark the challenge as completed and record the flag together
+    for attempt in range(1, SOLVE_ATTEMPTS + 1):
+        try:
+            value, delta, rescored, awarded = await _record_solve(db, user_id, challenge_id, entry, submitted_flag)
+            break
+        except IntegrityError:
+            # Another request solved it first; the rollback also undoes the XP increment
+            await db.rollback()
+            # The solve may have happened in another worker, so re-read this user's bitset next time
+            progress_index.forget(user_id)
+            raise HTTPException(status_code=400, detail="Challenge already completed")
+        except DBAPIError as exc:
+            # Aborted to break a deadlock with a concurrent solve: nothing was written, so run it again
+            await db.rollback()
+            if not is_retryable(exc):
+                raise
+            if attempt == SOLVE_ATTEMPTS:
+                raise HTTPException(status_code=503, detail="Too many concurrent solves, please retry")
+
+    for row in rescored:
+        _after_xp_change(row.id, row.username, row.xp, delta)
+    _after_xp_change(user_id, awarded.username, awarded.xp, value)
+    _after_solve(user_id, challenge_id)
+    return {"msg": "Challenge completed!", "xp_earned": value}
+
+async def _record_solve(db: AsyncSession, user_id: int, challenge_id: int, entry, submitted_flag: str):
+    """One attempt at a solve's transaction (see crud._record_solve)."""
+    dialect_name = db.get_bind().dialect.name
+    value, delta, rescored = entry.xp_reward, 0, []
+    if counts_solves():
+        scores = (await db.execute(solve_statement(dialect_name, challenge_id, entry.xp_reward))).first()
+        value, delta = after_solve(entry.xp_reward, scores.solves, scores.value)
+    if delta:
+        *updates, rescore = revalue_statements(challenge_id, value, delta, user_id)
+        for statement in updates:
+            await db.execute(statement)
+        rescored = (await db.execute(rescore)).all()
+    awarded = (await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(xp=User.xp + value)
+        .returning(User.username, User.xp)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if awarded is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Challenge or user not found")
+    db.add(UserChallenge(user_id=user_id, challenge_id=challenge_id, success=True))
+    db.add(FlagSubmission(user_id=user_id, challenge_id=challenge_id, flag=submitted_flag, correct=True))
+    for statement in solve_statements(dialect_name, user_id, entry.category, value):
+        await db.execute(statement)
+    await db.commit()
+    return value, delta, rescored, awarded
+
+async def get_user_stats(db: AsyncSession, user_id: int):
+    """A user's aggregates and per-category solve counts (see crud.get_user_stats)."""
+    stats = await db.get(UserStats, user_id)
+    if stats is None:
+        return None
+    categories = await db.execute(select(UserCategoryStats.category, UserCategoryStats.solves)
+                                  .where(UserCategoryStats.user_id == user_id))
+    return stats, dict(categories.all())
+
+async def get_challenge_scores(db: AsyncSession):
+    """Solve count and current value of every solved challenge."""
+    return (await db.execute(scores_query())).all()
+
+async def get_user_challenges(db: AsyncSession, user_id: int):
+    """Retrieve all challenges attempted by a user."""
+    return (await db.execute(select(UserChallenge).where(UserChallenge.user_id == user_id))).scalars().all()
+
+async def get_all_levels(db: AsyncSession, after=None, limit: int = None):
+    """Retrieve levels in progression order (see crud.get_all_levels for `after`)."""
+    query = select(Level)
+    if after is not None:
+        order, level_id = after
+        query = query.where(or_(Level.order > order, and_(Level.order == order, Level.id > level_id)))
+    return (await db.execute(query.order_by(Level.order, Level.id).limit(limit))).scalars().all()
+
+async def get_level_by_id(db: AsyncSession, level_id: int):
+    """Retrieve a level by its ID."""
+    return (await db.execute(select(Level).where(Level.id == level_id))).scalars().first()
+
+async def get_challenges_by_level(db: AsyncSession, level_id: int, after_id: int = None, limit: int = None):
+    """Retrieve summary rows for the challenges in a level in id order; after_id/limit select one keyset page."""
+    query = select(*CHALLENGE_SUMMARY_COLUMNS).where(Challenge.level_id == level_id)
+    if after_id is not None:
+        query = query.where(Challenge.id > after_id)
+    return (await db.execute(query.order_by(Challenge.id).limit(limit))).all()
+
+async def get_hint_tiers(db: AsyncSession, user_id: int, challenge_id: int):
+    """The challenge's hint tiers with what the user has bought (see crud.get_hint_tiers)."""
+    return _hint_tiers_result((await db.execute(_hint_tiers_query(user_id, challenge_id))).all())
+
+async def request_hint(db: AsyncSession, user_id: int, challenge_id: int, tier: int = None):
+    """Buy (or view again) a hint for a challenge (see crud.request_hint)."""
+    tiers = (await db.execute(_hint_tiers_query(user_id, challenge_id))).all()
+    if not tiers:
+        return None
+    row = _choose_hint(tiers, tier)
+    if row.purchase_id is not None:
+        return _hint_result(row, await db.scalar(select(User.xp).where(User.id == user_id)), charged=False)
+
+    charged = (await db.execute(
+        update(User)
+        .where(User.id == user_id, User.xp >= row.cost)
+        .values(xp=User.xp - row.cost)
+        .returning(User.username, User.xp)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if charged is None:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Not enough XP for a hint")
+    db.add(HintPurchase(user_id=user_id, hint_id=row.id, cost=row.cost))
+    await db.execute(hint_statement(db.get_bind().dialect.name, user_id))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent request bought it first; rolling back refunds this one
+        await db.rollback()
+        return _hint_result(row, await db.scalar(select(User.xp).where(User.id == user_id)), charged=False)
+    _after_xp_change(user_id, charged.username, charged.xp, -row.cost)
+    return _hint_result(row, charged.xp, charged=True)
+
+async def get_completed_challenge_ids_for_level(db: AsyncSession, user_id: int, level_id: int):
+    """Retrieve the IDs of challenges completed by a user in a specific level."""
+    result = await db.execute(
+        select(UserChallenge.challenge_id)
+        .join(Challenge)
+        .where(UserChallenge.user_id == user_id,
+               Challenge.level_id == level_id,
+               UserChallenge.success == True)
+    )
+    return [row.challenge_id for row in result]
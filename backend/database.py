@@ -1,12 +1,51 @@
-from sqlalchemy import create_engine
+import itertools
+import threading
+import time
+from pathlib import Path
+from fastapi import Request
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
-from backend.config import DATABASE_URL
+from backend.config import (
+    DATABASE_URL, ASYNC_DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING, ENABLE_INSTRUMENTATION, DB_STARTUP_SCHEMA,
+    DATABASE_READ_URLS, ASYNC_DATABASE_READ_URLS, READ_YOUR_WRITES_SECONDS
+)
 from backend.base import Base  # Import Base from your new base.py
-from alembic import command
-from alembic.config import Config
+from backend.instrumentation import instrument_engine
+
+# Async drivers used when ASYNC_DATABASE_URL is not set explicitly
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def pool_options(url: str):
+    """Engine keyword arguments for the configured connection pool."""
+    if make_url(url).get_backend_name() == "sqlite":
+        # SQLite picks its own pool class, which doesn't accept size/overflow settings
+        return {"pool_pre_ping": DB_POOL_PRE_PING}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+def async_database_url(url: str = None):
+    """ASYNC_DATABASE_URL, or DATABASE_URL (or `url`) rewritten to use the matching async driver."""
+    if url is None:
+        if ASYNC_DATABASE_URL:
+            return ASYNC_DATABASE_URL
+        url = DATABASE_URL
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"No async driver configured for {url.get_backend_name()}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=driver).render_as_string(hide_password=False)
 
 # Create the database engine using SQLAlchemy
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
+if ENABLE_INSTRUMENTATION:
+    instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Function to get the database session
@@ -17,10 +56,192 @@ def get_db():
     finally:
         db.close()
 
-# Create all tables (for development; use migrations in production)
-Base.metadata.create_all(bind=engine)
+# The async engines are built on first use so the async driver is only needed by processes that use it
+_async_engine = None
+_async_sessionmaker = None
+_async_read_engines = []
+_async_read_sessionmakers = []
+
+def _create_async_engine(url: str):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    async_engine = create_async_engine(url, **pool_options(url))
+    if ENABLE_INSTRUMENTATION:
+        instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+def _async_sessionmaker_for(async_engine):
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    # expire_on_commit=False: attributes stay readable after commit without an implicit (sync) reload
+    return async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def get_async_engine():
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        _async_engine = _create_async_engine(async_database_url())
+        _async_sessionmaker = _async_sessionmaker_for(_async_engine)
+        read_urls = ASYNC_DATABASE_READ_URLS or [async_database_url(url) for url in DATABASE_READ_URLS]
+        _async_read_engines[:] = [_create_async_engine(url) for url in read_urls]
+        _async_read_sessionmakers[:] = [_async_sessionmaker_for(read_engine) for read_engine in _async_read_engines]
+    return _async_engine
+
+def AsyncSessionLocal():
+    """Create a new AsyncSession bound to the async engine."""
+    get_async_engine()
+    return _async_sessionmaker()
+
+# Function to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def dispose_async_engine():
+    """Close all pooled async connections, the replicas' included (call on shutdown)."""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        for async_engine in [_async_engine, *_async_read_engines]:
+            await async_engine.dispose()
+        _async_engine = None
+        _async_sessionmaker = None
+        _async_read_engines.clear()
+        _async_read_sessionmakers.clear()
+
+# SQLSTATEs of a transaction Postgres aborted to break a deadlock or a serialization conflict
+RETRYABLE_SQLSTATES = {"40P01", "40001"}
+
+def is_retryable(exc) -> bool:
+    """Whether a DBAPIError only lost a race with a concurrent transaction, so running it again may succeed."""
+    orig = getattr(exc, "orig", None)
+    return (getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)) in RETRYABLE_SQLSTATES
+
+# Read routing: handlers that only read opt in with get_read_db / get_async_read_db and are
+# spread over the replicas. A user who has just written (and everyone, just after a shared
+# catalogue change) reads from the primary until the replicas have caught up.
+
+class RecentWrites:
+    """Users (and shared data) written within the last `window` seconds."""
+
+    def __init__(self, window: float = READ_YOUR_WRITES_SECONDS):
+        self.window = window
+        self._users = {}  # user_id -> monotonic time their pin expires
+        self._shared_until = 0.0
+        self._prune_at = 1024
+        self._lock = threading.Lock()
+
+    def user_wrote(self, user_id: int):
+        """Pin a user's reads to the primary; called by the post-commit hooks, in every worker."""
+        until = time.monotonic() + self.window
+        with self._lock:
+            self._users[user_id] = until
+            if len(self._users) > self._prune_at:
+                now = time.monotonic()
+                self._users = {key: expires for key, expires in self._users.items() if expires > now}
+                self._prune_at = max(1024, 2 * len(self._users))
+
+    def shared_wrote(self):
+        """Pin every read to the primary, e.g. after a catalogue change that the caches will reload."""
+        self._shared_until = time.monotonic() + self.window
+
+    def pinned(self, user_id: int = None) -> bool:
+        now = time.monotonic()
+        if now < self._shared_until:
+            return True
+        return user_id is not None and self._users.get(user_id, 0.0) > now
+
+    def any_users(self) -> bool:
+        return bool(self._users)
+
+recent_writes = RecentWrites()
+
+read_engines = [create_engine(url, **pool_options(url)) for url in DATABASE_READ_URLS]
+if ENABLE_INSTRUMENTATION:
+    for read_engine in read_engines:
+        instrument_engine(read_engine)
+_read_sessionmakers = [sessionmaker(autocommit=False, autoflush=False, bind=read_engine) for read_engine in read_engines]
+_read_counter = itertools.count()
+
+def _request_user_id(request: Request):
+    """The user id of the request's bearer token, only decoded when replicas are in use and some user is pinned."""
+    if not (_read_sessionmakers or _async_read_sessionmakers) or not recent_writes.any_users():
+        return None
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    from backend.security import token_user_id
+    return token_user_id(token)
+
+def _pick(makers, user_id):
+    """A replica's sessionmaker (round robin), or None when the read must go to the primary."""
+    if not makers or recent_writes.pinned(user_id):
+        return None
+    return makers[next(_read_counter) % len(makers)]
+
+def ReadSessionLocal(user_id: int = None):
+    """A session for reads: on a replica unless none is configured or `user_id` is pinned to the primary."""
+    maker = _pick(_read_sessionmakers, user_id)
+    return maker() if maker is not None else SessionLocal()
+
+def AsyncReadSessionLocal(user_id: int = None):
+    """The async counterpart of ReadSessionLocal."""
+    get_async_engine()
+    maker = _pick(_async_read_sessionmakers, user_id)
+    return maker() if maker is not None else _async_sessionmaker()
+
+# Dependencies for read-only handlers (never write through these sessions)
+def get_read_db(request: Request):
+    db = ReadSessionLocal(_request_user_id(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(request: Request):
+    async with AsyncReadSessionLocal(_request_user_id(request)) as db:
+        yield db
+
+# Importing this module never touches the database: schema setup is an explicit step
+# (init_db / run_migrations), run once per deploy or by prepare_schema() at startup.
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+# Arbitrary key for the Postgres advisory lock that serialises migrations between workers
+MIGRATION_LOCK_KEY = 0x636f6d7073
+
+# Create all missing tables without migrations (development, tests and the seed scripts)
+def init_db():
+    import backend.models  # noqa: F401  registers every table on Base.metadata
+    Base.metadata.create_all(bind=engine)
 
 # Function to run migrations with Alembic
 def run_migrations():
-    alembic_cfg = Config("alembic.ini")  # The path to your alembic.ini file
-    command.upgrade(alembic_cfg, "head")  # This applies the latest migrations
+    """
+    Upgrade DATABASE_URL to the latest revision. On Postgres the upgrade holds
+    an advisory lock, so when several workers start at once one migrates and
+    the rest wait, then find the schema already at head.
+    """
+    # Alembic is only needed by the process that migrates, so it is imported here
+    from alembic import command
+    from alembic.config import Config
+
+    alembic_cfg = Config(str(ALEMBIC_INI))
+    alembic_cfg.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    alembic_cfg.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
+    with engine.connect() as connection:
+        locked = connection.dialect.name == "postgresql"
+        if locked:
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            connection.commit()
+        try:
+            command.upgrade(alembic_cfg, "head")  # This applies the latest migrations
+        finally:
+            if locked:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+                connection.commit()
+
+def prepare_schema(action: str = DB_STARTUP_SCHEMA):
+    """The startup schema step selected by DB_STARTUP_SCHEMA: "none", "migrate" or "create_all"."""
+    if action == "migrate":
+        run_migrations()
+    elif action == "create_all":
+        init_db()
+    elif action != "none":
+        raise RuntimeError(f"Unknown DB_STARTUP_SCHEMA {action!r}; use none, migrate or create_all")
@@ -0,0 +1,47 @@
+# backend/dependencies.py
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database import get_db, get_async_db
+from backend.crud import get_user_by_id
+from backend import crud_async
+from backend.principals import principal_cache
+from backend.security import token_user_id
+
+# OAuth2 scheme for token extraction
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+
+def credentials_exception():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+# Helper: Get the Current User's ID from the Token (no database access)
+async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
+    user_id = token_user_id(token)
+    if user_id is None:
+        raise credentials_exception()
+    return user_id
+
+# Helper: Get Current User, served from the principal cache when possible (sync routers)
+def get_current_user(user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        user = get_user_by_id(db, user_id)
+        if user is None:
+            raise credentials_exception()
+        principal = principal_cache.put(user)
+    return principal
+
+# Helper: Get Current User, served from the principal cache when possible (async handlers)
+async def get_current_user_async(user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_async_db)):
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        user = await crud_async.get_user_by_id(db, user_id)
+        if user is None:
+            raise credentials_exception()
+        principal = principal_cache.put(user)
+    return principal
@@ -0,0 +1,131 @@
+# backend/events.py
+import asyncio
+import threading
+from backend.config import SCOREBOARD_TICK_SECONDS, SCOREBOARD_TOP_N, SSE_SUBSCRIBER_BUFFER
+from backend.leaderboard import leaderboard
+from backend.serialization import dumps
+
+
+def sse_message(event: str, data, event_id=None) -> str:
+    """Format one server-sent event."""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+
+class Subscriber:
+    """One connected event stream: a bounded queue of preformatted messages."""
+
+    __slots__ = ("queue", "dropped")
+
+    def __init__(self, buffer: int):
+        self.queue = asyncio.Queue(maxsize=buffer)
+        self.dropped = False
+
+
+class ScoreboardHub:
+    """
+    In-process pub/sub for live standings.
+
+    The CRUD layer reports XP changes and solves from any thread, including
+    those made by other workers as they arrive on the event bus; they are only
+    noted under a lock. A ticker on the event loop wakes every `tick` seconds,
+    turns everything noted since the last tick into at most one "scoreboard"
+    diff (the changed users' rows, plus the top N if it moved) and one "solves"
+    batch, serialises each once and hands the same string to every subscriber.
+    Bursts of solves therefore cost one message per tick, however many there
+    were. A subscriber that falls `buffer` messages behind is dropped; its
+    client reconnects and starts again from a snapshot.
+    """
+
+    def __init__(self, tick: float = SCOREBOARD_TICK_SECONDS, top_n: int = SCOREBOARD_TOP_N,
+                 buffer: int = SSE_SUBSCRIBER_BUFFER):
+        self.tick = tick
+        self.top_n = top_n
+        self.buffer = buffer
+        self._lock = threading.Lock()
+        self._changed = set()   # user ids whose XP changed since the last tick
+        self._solves = []       # (user_id, challenge_id) since the last tick
+        self._subscribers = set()
+        self._ticker = None
+        self._last_top = None
+        self.seq = 0
+        self.messages_sent = 0
+
+    # Publishers (any thread) -------------------------------------------------
+
+    def xp_changed(self, user_id: int):
+        if self._subscribers:
+            with self._lock:
+                self._changed.add(user_id)
+
+    def solved(self, user_id: int, challenge_id: int):
+        if self._subscribers:
+            with self._lock:
+                self._solves.append((user_id, challenge_id))
+
+    # Subscribers (event loop) --------------------------------------------------
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(self.buffer)
+        self._subscribers.add(subscriber)
+        if self._ticker is None or self._ticker.done():
+            self._ticker = asyncio.get_running_loop().create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def snapshot(self) -> str:
+        """The current top N, sent to a subscriber when it connects."""
+        return sse_message("snapshot", {"top": leaderboard.top(self.top_n)}, self.seq)
+
+    async def _run(self):
+        while self._subscribers:
+            await asyncio.sleep(self.tick)
+            self.flush()
+        self._last_top = None
+
+    def flush(self):
+        """Broadcast what changed since the last call (the ticker calls this every tick)."""
+        with self._lock:
+            changed, self._changed = self._changed, set()
+            solves, self._solves = self._solves, []
+        messages = []
+        if changed:
+            self.seq += 1
+            diff = {"changed": [row for row in map(leaderboard.rank, sorted(changed)) if row is not None]}
+            top = leaderboard.top(self.top_n)
+            if top != self._last_top:
+                diff["top"] = self._last_top = top
+            messages.append(sse_message("scoreboard", diff, self.seq))
+        if solves:
+            self.seq += 1
+            messages.append(sse_message(
+                "solves", [{"user_id": user_id, "challenge_id": challenge_id} for user_id, challenge_id in solves],
+                self.seq,
+            ))
+        for message in messages:
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.queue.put_nowait(message)
+                    self.messages_sent += 1
+                except asyncio.QueueFull:
+                    subscriber.dropped = True
+                    self._subscribers.discard(subscriber)
+
+    def close(self):
+        """End every open stream (call on shutdown)."""
+        for subscriber in list(self._subscribers):
+            subscriber.dropped = True
+            try:
+                subscriber.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+        self._subscribers.clear()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+# Shared hub fed by the CRUD layer and read by /events/scoreboard
+scoreboard_hub = ScoreboardHub()
@@ -0,0 +1,131 @@
+# backend/flags.py
+import hashlib
+import hmac
+import os
+import re
+import threading
+from sqlalchemy import select
+from backend.models import Challenge
+
+# Per-challenge normalisation rules, stored comma-separated in Challenge.flag_rules.
+# Surrounding whitespace is always ignored, as it always has been.
+FLAG_RULES = ("case_insensitive", "ignore_whitespace", "wrapper_optional")
+
+# FLAG{...}, CTF{...}, etc.: the part inside the braces is the answer
+_WRAPPER = re.compile(r"[A-Za-z0-9_]*\{(.*)\}", re.DOTALL)
+
+
+def parse_rules(value):
+    """Split a flag_rules column value into a frozenset, rejecting unknown rules."""
+    rules = frozenset(rule.strip() for rule in (value or "").split(",") if rule.strip())
+    unknown = rules.difference(FLAG_RULES)
+    if unknown:
+        raise ValueError(f"Unknown flag rules: {', '.join(sorted(unknown))}")
+    return rules
+
+
+def normalise_flag(flag: str, rules) -> str:
+    """Apply a challenge's normalisation rules to a stored or submitted flag."""
+    value = flag.strip()
+    if "ignore_whitespace" in rules:
+        value = "".join(value.split())
+    if "wrapper_optional" in rules:
+        match = _WRAPPER.fullmatch(value)
+        if match:
+            value = match.group(1)
+    if "case_insensitive" in rules:
+        value = value.casefold()
+    return value
+
+
+class FlagEntry:
+    """What submit_flag needs to know about a challenge, without its row."""
+
+    __slots__ = ("digest", "xp_reward", "level_id", "category", "rules")
+
+    def __init__(self, digest: bytes, xp_reward: int, level_id: int, category: str, rules):
+        self.digest = digest
+        self.xp_reward = xp_reward
+        self.level_id = level_id
+        self.category = category
+        self.rules = rules
+
+
+class FlagIndex:
+    """
+    challenge_id -> keyed digest of the normalised flag, plus xp_reward, level_id and category.
+
+    Loaded once per worker at startup and updated by create_challenge, so
+    checking a submission is a dict lookup and an hmac.compare_digest, with
+    no row fetched. The digests are keyed with a per-process random secret,
+    so the plaintext flags are not kept in the index. A challenge the index
+    doesn't know (e.g. created by another worker) is read on demand.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key = os.urandom(32)
+        self._entries = {}
+
+    def _digest(self, normalised: str) -> bytes:
+        return hmac.new(self._key, normalised.encode(), hashlib.sha256).digest()
+
+    def _entry(self, flag: str, xp_reward: int, level_id: int, category: str, flag_rules) -> FlagEntry:
+        rules = parse_rules(flag_rules)
+        return FlagEntry(self._digest(normalise_flag(flag, rules)), xp_reward, level_id, category, rules)
+
+    @staticmethod
+    def _query():
+        return select(Challenge.id, Challenge.flag, Challenge.xp_reward, Challenge.level_id, Challenge.category,
+                      Challenge.flag_rules)
+
+    def _store_rows(self, rows, replace: bool):
+        entries = {row.id: self._entry(row.flag, row.xp_reward, row.level_id, row.category, row.flag_rules) for row in rows}
+        with self._lock:
+            if replace:
+                self._entries = entries
+            else:
+                self._entries.update(entries)
+        return entries
+
+    def load(self, db):
+        """(Re)build the index from the challenges table."""
+        self._store_rows(db.execute(self._query()), replace=True)
+
+    async def load_async(self, db):
+        self._store_rows(await db.execute(self._query()), replace=True)
+
+    def put(self, challenge):
+        """Add or refresh one challenge (call after it is committed)."""
+        entry = self._entry(challenge.flag, challenge.xp_reward, challenge.level_id, challenge.category,
+                            challenge.flag_rules)
+        with self._lock:
+            self._entries[challenge.id] = entry
+
+    def forget(self, challenge_id: int):
+        """Drop one entry so its row is read again on next lookup (e.g. changed by another worker)."""
+        with self._lock:
+            self._entries.pop(challenge_id, None)
+
+    def lookup(self, db, challenge_id: int):
+        """The challenge's entry, reading the row if this worker hasn't seen it; None if it doesn't exist."""
+        entry = self._entries.get(challenge_id)
+        if entry is None:
+            entry = self._store_rows(db.execute(self._query().where(Challenge.id == challenge_id)),
+                                     replace=False).get(challenge_id)
+        return entry
+
+    async def lookup_async(self, db, challenge_id: int):
+        entry = self._entries.get(challenge_id)
+        if entry is None:
+            rows = await db.execute(self._query().where(Challenge.id == challenge_id))
+            entry = self._store_rows(rows, replace=False).get(challenge_id)
+        return entry
+
+    def matches(self, entry: FlagEntry, submitted_flag: str) -> bool:
+        """Constant-time check of a submission against the entry's digest."""
+        return hmac.compare_digest(self._digest(normalise_flag(submitted_flag, entry.rules)), entry.digest)
+
+
+# Shared index used by crud.submit_flag and crud_async.submit_flag
+flag_index = FlagIndex()
@@ -0,0 +1,232 @@
+# backend/instrumentation.py
+import contextvars
+import json
+import logging
+import threading
+import time
+from sqlalchemy import event
+from backend.config import QUERY_BUDGET_STRICT, SLOW_QUERY_MS
+
+logger = logging.getLogger("backend.instrumentation")
+
+# Stats for the request currently being handled; None outside a request
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+# Upper bounds (seconds) of the request duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class RequestStats:
+    """SQL activity recorded while handling one request."""
+
+    __slots__ = ("queries", "sql_seconds", "slowest_seconds", "slowest_statement")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+
+    def record(self, statement: str, seconds: float):
+        self.queries += 1
+        self.sql_seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+
+def current_stats():
+    """Stats of the request in progress, or None when not inside an instrumented request."""
+    return _request_stats.get()
+
+
+# ----------------- Engine hooks -----------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record(statement, seconds)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms): %s", seconds * 1000, " ".join(statement.split()))
+
+def instrument_engine(engine):
+    """Time every statement `engine` executes (pass `async_engine.sync_engine` for async engines)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ----------------- Query budgets -----------------
+
+def query_budget(max_queries: int):
+    """
+    Declare how many SQL statements a route may issue per request.
+
+    Requests over budget are logged and counted in /metrics; with
+    QUERY_BUDGET_STRICT set they fail with a 500 instead, so a test run
+    catches an N+1 the moment it is introduced.
+    """
+    def decorate(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorate
+
+
+# ----------------- Metrics -----------------
+
+class Metrics:
+    """Per-route counters rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}  # (method, route) -> per-route totals
+        self._statuses = {}  # (method, route, status) -> request count
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats, over_budget: bool):
+        with self._lock:
+            totals = self._routes.get((method, route))
+            if totals is None:
+                totals = self._routes[(method, route)] = {
+                    "buckets": [0] * len(DURATION_BUCKETS), "count": 0, "seconds": 0.0,
+                    "queries": 0, "sql_seconds": 0.0, "slowest": 0.0, "over_budget": 0,
+                }
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    totals["buckets"][i] += 1
+            totals["count"] += 1
+            totals["seconds"] += seconds
+            totals["queries"] += stats.queries
+            totals["sql_seconds"] += stats.sql_seconds
+            totals["slowest"] = max(totals["slowest"], stats.slowest_seconds)
+            totals["over_budget"] += over_budget
+            key = (method, route, status)
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+
+    def render(self) -> str:
+        with self._lock:
+            routes = {key: dict(value, buckets=list(value["buckets"])) for key, value in self._routes.items()}
+            statuses = dict(self._statuses)
+
+        def labels(method, route, **extra):
+            pairs = {"method": method, "route": route, **extra}
+            return "{" + ",".join(f'{name}={json.dumps(str(value))}' for name, value in pairs.items()) + "}"
+
+        lines = [
+            "# HELP http_requests_total Requests handled, by route and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(statuses.items()):
+            lines.append(f"http_requests_total{labels(method, route, status=status)} {count}")
+
+        lines += [
+            "# HELP http_request_duration_seconds Time from request start to response start.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), totals in sorted(routes.items()):
+            for bound, count in zip(DURATION_BUCKETS, totals["buckets"]):
+                lines.append(f"http_request_duration_seconds_bucket{labels(method, route, le=bound)} {count}")
+            lines.append(f"http_request_duration_seconds_bucket{labels(method, route, le='+Inf')} {totals['count']}")
+            lines.append(f"http_request_duration_seconds_sum{labels(method, route)} {totals['seconds']:.6f}")
+            lines.append(f"http_request_duration_seconds_count{labels(method, route)} {totals['count']}")
+
+        for name, kind, key, description in (
+            ("db_queries_total", "counter", "queries", "SQL statements executed."),
+            ("db_query_duration_seconds_total", "counter", "sql_seconds", "Time spent executing SQL statements."),
+            ("db_slowest_query_seconds", "gauge", "slowest", "Slowest single SQL statement seen."),
+            ("db_query_budget_exceeded_total", "counter", "over_budget", "Requests that exceeded their query budget."),
+        ):
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            for (method, route), totals in sorted(routes.items()):
+                value = totals[key]
+                lines.append(f"{name}{labels(method, route)} {value:.6f}" if isinstance(value, float)
+                             else f"{name}{labels(method, route)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared metrics registry served at /metrics
+metrics = Metrics()
+
+
+# ----------------- Middleware -----------------
+
+class InstrumentationMiddleware:
+    """
+    ASGI middleware that collects per-request SQL stats.
+
+    Adds a Server-Timing header (db, db-slowest, app and total durations, with
+    the query count in the db description), feeds the /metrics registry and
+    enforces query budgets declared with `query_budget`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        outcome = {"status": 500, "started": False, "suppress": False, "over_budget": False}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                outcome["started"] = True
+                route, budget = _route_of(scope)
+                over_budget = budget is not None and stats.queries > budget
+                outcome["over_budget"] = over_budget
+                if over_budget:
+                    logger.warning(
+                        "%s %s ran %d queries (budget %d); slowest: %s",
+                        scope["method"], route, stats.queries, budget, stats.slowest_statement,
+                    )
+                if over_budget and QUERY_BUDGET_STRICT:
+                    outcome["suppress"] = True
+                    body = json.dumps({"detail": f"Query budget exceeded: {scope['method']} {route} ran "
+                                                 f"{stats.queries} queries (budget {budget})"}).encode()
+                    message = {"type": "http.response.start", "status": 500, "headers": [
+                        (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                    ]}
+                    await send(_with_server_timing(message, stats, started))
+                    await send({"type": "http.response.body", "body": body})
+                    outcome["status"] = 500
+                    return
+                outcome["status"] = message["status"]
+                message = _with_server_timing(message, stats, started)
+            elif outcome["suppress"]:
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            route, _ = _route_of(scope)
+            metrics.observe(scope["method"], route, outcome["status"], time.perf_counter() - started,
+                            stats, outcome["over_budget"])
+
+
+def _route_of(scope):
+    """Route template (not the raw path, to keep metric labels bounded) and its query budget."""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched", None
+    return route.path, getattr(route.endpoint, "query_budget", None)
+
+
+def _with_server_timing(message, stats: RequestStats, started: float):
+    total_ms = (time.perf_counter() - started) * 1000
+    sql_ms = stats.sql_seconds * 1000
+    timing = (
+        f'db;dur={sql_ms:.2f};desc="{stats.queries} queries", '
+        f"db-slowest;dur={stats.slowest_seconds * 1000:.2f}, "
+        f"app;dur={max(total_ms - sql_ms, 0):.2f}, "
+        f"total;dur={total_ms:.2f}"
+    )
+    headers = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+    return dict(message, headers=headers)
@@ -0,0 +1,129 @@
+# backend/leaderboard.py
+import threading
+from bisect import bisect_left, bisect_right, insort
+from sqlalchemy.orm import Session
+from backend.models import User, UserStats
+
+
+class Leaderboard:
+    """
+    In-process ranking of users by XP.
+
+    Users are kept in a sorted list of (-xp, user_id) keys, so ties are broken
+    by registration order (lower id first). The CRUD layer calls `update` and
+    `record_solve` after every commit that changes XP, so reads never touch
+    the database once the board has been loaded.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = []      # Sorted list of (-xp, user_id)
+        self._entries = {}   # user_id -> {"username": str, "xp": int, "challenges_completed": int}
+        self.loaded = False
+
+    def load(self, db: Session):
+        """Rebuild the board from the users and user_stats tables."""
+        users = db.query(User.id, User.username, User.xp).all()
+        solves = dict(db.query(UserStats.user_id, UserStats.solves).all())
+        entries = {
+            user_id: {"username": username, "xp": xp or 0, "challenges_completed": solves.get(user_id, 0)}
+            for user_id, username, xp in users
+        }
+        with self._lock:
+            self._entries = entries
+            self._keys = sorted((-entry["xp"], user_id) for user_id, entry in entries.items())
+            self.loaded = True
+
+    def ensure_loaded(self, db: Session):
+        """Load the board on first use if startup did not already do it."""
+        if not self.loaded:
+            self.load(db)
+
+    def update(self, user_id: int, username: str, xp: int):
+        """Insert a user or move them to the position for their new XP."""
+        xp = xp or 0
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self._entries[user_id] = {"username": username, "xp": xp, "challenges_completed": 0}
+                insort(self._keys, (-xp, user_id))
+                return
+            entry["username"] = username
+            if entry["xp"] != xp:
+                del self._keys[bisect_left(self._keys, (-entry["xp"], user_id))]
+                entry["xp"] = xp
+                insort(self._keys, (-xp, user_id))
+
+    def add_xp(self, user_id: int, username: str, delta: int) -> int:
+        """Apply an XP change made elsewhere (e.g. another worker) and return the user's new XP."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            xp = (entry["xp"] if entry is not None else 0) + delta
+            self.update(user_id, username, xp)
+            return xp
+
+    def record_solve(self, user_id: int):
+        """Bump the completed-challenge count shown next to a user."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                entry["challenges_completed"] += 1
+
+    def remove(self, user_id: int):
+        """Drop a user from the board."""
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+            if entry is not None:
+                del self._keys[bisect_left(self._keys, (-entry["xp"], user_id))]
+
+    def _row(self, position: int):
+        _, user_id = self._keys[position]
+        entry = self._entries[user_id]
+        return {
+            "rank": position + 1,
+            "user_id": user_id,
+            "username": entry["username"],
+            "xp": entry["xp"],
+            "challenges_completed": entry["challenges_completed"],
+        }
+
+    def top(self, limit: int = 10):
+        """Return the first `limit` rows of the board."""
+        with self._lock:
+            return [self._row(i) for i in range(min(limit, len(self._keys)))]
+
+    def page(self, limit: int, after=None):
+        """
+        Return up to `limit` rows following the (xp, user_id) key `after`, or from
+        the top when it is None. Keyed rather than offset-based, so a page never
+        repeats or skips a user when ranks shift between requests.
+        """
+        with self._lock:
+            start = 0 if after is None else bisect_right(self._keys, (-after[0], after[1]))
+            return [self._row(i) for i in range(start, min(start + limit, len(self._keys)))]
+
+    def rank(self, user_id: int):
+        """Return the board row for a user, or None if they are not ranked."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            return self._row(bisect_left(self._keys, (-entry["xp"], user_id)))
+
+    def around(self, user_id: int, radius: int = 5):
+        """Return the user's row with up to `radius` neighbours on each side."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return []
+            position = bisect_left(self._keys, (-entry["xp"], user_id))
+            start = max(0, position - radius)
+            end = min(len(self._keys), position + radius + 1)
+            return [self._row(i) for i in range(start, end)]
+
+    def __len__(self):
+        return len(self._keys)
+
+
+# Shared board used by the CRUD layer and the leaderboard routes
+leaderboard = Leaderboard()
@@ -1,30 +1,92 @@
-from fastapi import FastAPI, HTTPException, Depends, status, APIRouter
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, status, APIRouter, Request, Response
+from fastapi.datastructures import Default
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.security import OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
 import jwt
 from sqlalchemy.orm import Session
-from backend.database import get_db
-from typing import List
-
-from backend.crud import (
-    create_user, get_user_by_email, update_xp, get_top_users,
-    get_challenge_by_id, create_challenge, submit_flag, get_all_challenges,
-    get_all_levels, get_challenges_by_level, request_hint,
-    get_completed_challenge_ids_for_level,  # Import the new function
-    has_user_completed_challenge_by_id  # Import the function to check completion
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database import get_db, get_async_db, get_async_read_db, SessionLocal, dispose_async_engine, prepare_schema
+from typing import List, Optional
+
+# The handlers below are async, so they use the async session and crud_async to keep DB I/O off the event loop
+from backend.crud_async import (
+    create_user, get_user_by_email, update_xp, update_password_hash,
+    get_challenge_detail, create_challenge, submit_flag, get_all_challenges,
+    get_all_levels, get_challenges_by_level, request_hint, get_hint_tiers, get_user_stats,
+    get_challenge_scores
 )
 from backend.models import Challenge, Level
 from backend.schemas import (
-    UserOut, UserCreate, ChallengeOut, ChallengeCreate, FlagSubmissionCreate,
-    LevelOut, HintOut
+    UserOut, UserCreate, LoginOut, ChallengeOut, ChallengeSummaryOut, ChallengeCreate, FlagSubmissionCreate,
+    LevelOut, HintOut, HintTierOut, UserStatsOut, ChallengeScoreOut
 )
-from backend.config import SECRET_KEY, ALGORITHM
-from backend.routes.auth import verify_password  # Ensure verify_password is available
+from backend.config import SECRET_KEY, ALGORITHM, ENABLE_INSTRUMENTATION
+from backend.leaderboard import leaderboard
+from backend.catalogue import catalogue_cache, catalogue_response
+from backend.progress import progress_index
+from backend.flags import flag_index
+from backend.events import scoreboard_hub
+from backend.bus import event_bus
+from backend.pagination import decode_cursor, fetch_limit, page_size, paginate
+from backend.serialization import FastJSONResponse, serializer
+from backend.dependencies import get_current_user_id, get_current_user_async
+from backend.principals import principal_cache
+from backend.security import hash_password_async, verify_and_update_password_async, shutdown_password_executor
+from backend.instrumentation import InstrumentationMiddleware, metrics, query_budget
+from backend.audit import audit_writer
+from backend.ratelimit import flag_rate_limiter, limit_flag_submissions
 # Import your levels router
-from backend.routes import levels
+from backend.routes import levels, admin, events
+
+# Load the in-memory leaderboard and flag index once per worker so reads never hit the database.
+# Events from other workers are held while the snapshot is read and handled once it is in place,
+# otherwise one applied between the SELECT and the swap would be overwritten by the older rows.
+# Loads run one at a time (re-entrant: a held event may trigger a resync while it is handled).
+_load_lock = threading.RLock()
+
+def load_in_memory_indexes():
+    with _load_lock:
+        event_bus.hold()
+        db = SessionLocal()
+        try:
+            leaderboard.load(db)
+            flag_index.load(db)
+        finally:
+            db.close()
+            event_bus.release()
+
+# Called by the event bus when this worker may have missed another worker's changes
+def resync_in_memory_state():
+    load_in_memory_indexes()
+    catalogue_cache.invalidate()
+    progress_index.reset()
+    principal_cache.clear()
+
+# Startup and shutdown. Nothing touches the database at import time; the optional
+# schema step (DB_STARTUP_SCHEMA) and the index loads run here, off the event loop.
+# The event bus starts listening before the indexes load so no change falls in between;
+# what arrives during the load is held until it is done (see load_in_memory_indexes).
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(prepare_schema)
+    event_bus.on_resync(resync_in_memory_state)
+    event_bus.start()
+    await asyncio.to_thread(load_in_memory_indexes)
+    yield
+    scoreboard_hub.close()
+    await asyncio.to_thread(event_bus.close)
+    # Drain queued audit rows before the engine they are written with goes away
+    await asyncio.to_thread(audit_writer.shutdown)
+    shutdown_password_executor()
+    await dispose_async_engine()
 
-app = FastAPI()
+# FastJSONResponse (orjson) for handlers that return plain data. Wrapped in Default so routes
+# with a response_model keep FastAPI's own path: validated and dumped to JSON bytes by pydantic-core.
+app = FastAPI(lifespan=lifespan, default_response_class=Default(FastJSONResponse))
 
 # CORS Middleware to allow frontend access
 origins = [
@@ -40,10 +102,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Next-Cursor"],
 )
 
-# OAuth2 scheme for token extraction
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+# Opt-in per-request SQL stats: Server-Timing headers, /metrics and query budgets
+if ENABLE_INSTRUMENTATION:
+    app.add_middleware(InstrumentationMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        return Response(content=metrics.render() + flag_rate_limiter.render_metrics() + event_bus.render_metrics(),
+                        media_type="text/plain; version=0.0.4")
 
 # Helper: Create Access Token
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(hours=1)):
@@ -52,76 +121,115 @@ def create_access_token(data: dict, expires_delta: timedelta = timedelta(hours=1
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-# Helper: Get Current User from Token
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Invalid credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except jwt.PyJWTError:
-        raise credentials_exception
-    user = get_user_by_email(db, email=email)
-    if user is None:
-        raise credentials_exception
-    return user
-
 # ----------------- Authentication Routes -----------------
+# bcrypt runs on the password executor, so hashing never blocks the event loop
 @app.post("/auth/register")
-async def register(user: UserCreate, db: Session = Depends(get_db)):
-    if get_user_by_email(db, user.email):
+@query_budget(3)
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    if await get_user_by_email(db, user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
-    created_user = create_user(db, user)
-    access_token = create_access_token(data={"sub": created_user.email})
+    hashed_password = await hash_password_async(user.password)
+    created_user = await create_user(db, user, hashed_password)
+    access_token = create_access_token(data={"sub": created_user.email, "uid": created_user.id})
     return {"msg": "User created successfully", "access_token": access_token}
 
-@app.post("/auth/login", response_model=UserOut)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = get_user_by_email(db, form_data.username)
+@app.post("/auth/login", response_model=LoginOut)
+@query_budget(2)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await get_user_by_email(db, form_data.username)
     if not user:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
-    if not verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = await verify_and_update_password_async(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
-    access_token = create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer", "user": user}
+    if new_hash:
+        # The stored hash used an old bcrypt cost; upgrade it transparently
+        await update_password_hash(db, user, new_hash)
+    access_token = create_access_token(data={"sub": user.email, "uid": user.id})
+    # Warm the principal cache; the returned copy has no lazy relationships left to serialise
+    return {"access_token": access_token, "token_type": "bearer", "user": principal_cache.put(user)}
 
 # ----------------- User Routes -----------------
 @app.get("/users/profile", response_model=UserOut)
-async def get_user_profile(current_user: UserOut = Depends(get_current_user)):
+@query_budget(1)
+async def get_user_profile(current_user: UserOut = Depends(get_current_user_async)):
     return current_user
 
+# Aggregates maintained by submit_flag/request_hint: a primary-key lookup instead of counting rows
+@app.get("/users/stats", response_model=UserStatsOut)
+@query_budget(2)
+async def get_my_stats(user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_async_read_db)):
+    found = await get_user_stats(db, user_id)
+    if found is None:
+        return UserStatsOut()
+    stats, categories = found
+    return UserStatsOut(solves=stats.solves, hints_used=stats.hints_used, wrong_attempts=stats.wrong_attempts,
+                        points=stats.points, last_solve_at=stats.last_solve_at, categories=categories)
+
 @app.post("/users/update_xp")
-async def add_xp(amount: int, current_user: UserOut = Depends(get_current_user), db: Session = Depends(get_db)):
-    user = get_user_by_email(db, current_user.email)
-    if not user:
+@query_budget(1)
+async def add_xp(amount: int, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_async_db)):
+    updated_user = await update_xp(db, user_id, amount)
+    if not updated_user:
         raise HTTPException(status_code=404, detail="User not found")
-    updated_user = update_xp(db, user, amount)
     return {"msg": "XP updated successfully", "new_xp": updated_user.xp}
 
 @app.get("/users/leaderboard")
-async def get_leaderboard(db: Session = Depends(get_db)):
-    top_users = get_top_users(db)
-    return [{"username": user.username, "xp": user.xp} for user in top_users]
+@query_budget(0)
+async def get_leaderboard(response: Response, limit: int = 10, cursor: Optional[str] = None):
+    # Keyed on the last row's (xp, user_id), so paging stays consistent while ranks move
+    size = min(max(limit, 1), 100)
+    page = paginate(leaderboard.page(size + 1, after=decode_cursor(cursor, 2)), size,
+                    lambda row: (row["xp"], row["user_id"]))
+    response.headers.update(page.headers())
+    return page.items
+
+@app.get("/users/leaderboard/me")
+@query_budget(0)
+async def get_my_rank(user_id: int = Depends(get_current_user_id)):
+    row = leaderboard.rank(user_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="User not ranked")
+    return row
+
+@app.get("/users/leaderboard/around")
+@query_budget(0)
+async def get_users_around_me(radius: int = 5, user_id: int = Depends(get_current_user_id)):
+    return leaderboard.around(user_id, min(max(radius, 0), 50))
 
 # ----------------- User Completed Challenges Route -----------------
 user_completed_router = APIRouter()
 
 @user_completed_router.get("/users/completed_challenges")
+@query_budget(2)
 async def get_user_completed_challenges_for_level(
     level_id: int,
-    current_user: UserOut = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get the IDs of challenges completed by the current user in a specific level.
     """
-    completed_ids = get_completed_challenge_ids_for_level(db, current_user.id, level_id)
-    return {"completed_challenge_ids": completed_ids}
+    bits = await progress_index.completed_bits_async(db, user_id)
+    masks = await progress_index.level_masks_async(db)
+    return {"completed_challenge_ids": progress_index.completed_in_level(bits, masks, level_id)}
+
+@user_completed_router.get("/users/progress")
+@query_budget(2)
+async def get_user_progress(
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get every challenge the current user has completed, overall and grouped by level,
+    so a page can render all completion badges from a single call.
+    """
+    bits = await progress_index.completed_bits_async(db, user_id)
+    masks = await progress_index.level_masks_async(db)
+    return {
+        "completed_challenge_ids": progress_index.to_ids(bits),
+        "levels": progress_index.completed_by_level(bits, masks),
+    }
 
 app.include_router(user_completed_router)
 
@@ -129,14 +237,15 @@ app.include_router(user_completed_router)
 challenge_status_router = APIRouter()
 
 @challenge_status_router.get("/challenges/{challenge_id}/status")
+@query_budget(1)
 async def get_challenge_completion_status(
     challenge_id: int,
-    current_user: UserOut = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Check if the current user has completed a specific challenge."""
-    completed = has_user_completed_challenge_by_id(db, current_user.id, challenge_id)
-    return {"completed": completed}
+    bits = await progress_index.completed_bits_async(db, user_id)
+    return {"completed": progress_index.is_completed(bits, challenge_id)}
 
 app.include_router(challenge_status_router)
 
@@ -144,6 +253,12 @@ app.include_router(challenge_status_router)
 # Include the levels router here
 app.include_router(levels.router)
 
+# Admin NDJSON exports (enabled by ADMIN_API_KEY)
+app.include_router(admin.router)
+
+# Live scoreboard push channel (server-sent events)
+app.include_router(events.router)
+
 # These routes are now defined in backend/routes/levels.py, so you can remove them from here if you want
 # @app.get("/levels", response_model=List[LevelOut])
 # async def get_levels(db: Session = Depends(get_db)):
@@ -157,41 +272,71 @@ app.include_router(levels.router)
 
 # Create a New Challenge (Admin endpoint)
 @app.post("/challenges/create", response_model=ChallengeOut)
-async def create_new_challenge(challenge: ChallengeCreate, db: Session = Depends(get_db)):
+@query_budget(3)
+async def create_new_challenge(challenge: ChallengeCreate, db: AsyncSession = Depends(get_async_db)):
     # Here, the flag is provided in the payload. In production, consider generating it securely server-side.
-    db_challenge = create_challenge(db, challenge, challenge.flag)
+    db_challenge = await create_challenge(db, challenge, challenge.flag)
     return db_challenge
 
-# Get all Challenges (across all levels)
-@app.get("/challenges", response_model=List[ChallengeOut])
-async def get_challenges(db: Session = Depends(get_db)):
-    challenges = get_all_challenges(db)
-    return challenges
+# Compiled once at import; cached catalogue payloads are encoded with these
+CHALLENGE_SUMMARIES = serializer(ChallengeSummaryOut)
+CHALLENGE_DETAIL = serializer(ChallengeOut)
+
+# Get all Challenges (across all levels) as summaries, all at once (cached) or one keyset page at a time
+@app.get("/challenges", response_model=List[ChallengeSummaryOut])
+@query_budget(1)
+async def get_challenges(request: Request, cursor: Optional[str] = None, limit: Optional[int] = None,
+                         db: AsyncSession = Depends(get_async_read_db)):
+    after, size = decode_cursor(cursor, 1), page_size(limit, cursor)
+    async def load():
+        rows = await get_all_challenges(db, after_id=after and after[0], limit=fetch_limit(size))
+        return paginate(rows, size, lambda row: (row.id,))
+    # Only the unpaged list is cached; pages are keyed by client input (see CatalogueCache)
+    key = ("challenges",) if size is None else None
+    entry = await catalogue_cache.get_or_load_async(key, load, CHALLENGE_SUMMARIES)
+    return catalogue_response(request, entry)
 
-# Get a Specific Challenge
+# Current challenge values: they change with every solve under dynamic scoring, so they are not cached
+@app.get("/challenges/scores", response_model=List[ChallengeScoreOut])
+@query_budget(1)
+async def get_scores(db: AsyncSession = Depends(get_async_read_db)):
+    return await get_challenge_scores(db)
+
+# Get a Specific Challenge with its content, served from the catalogue cache
 @app.get("/challenges/{challenge_id}", response_model=ChallengeOut)
-async def get_challenge(challenge_id: int, db: Session = Depends(get_db)):
-    challenge = get_challenge_by_id(db, challenge_id)
-    if not challenge:
+@query_budget(1)
+async def get_challenge(challenge_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def load():
+        return await get_challenge_detail(db, challenge_id)
+    entry = await catalogue_cache.get_or_load_async(("challenge", challenge_id), load, CHALLENGE_DETAIL)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Challenge not found")
-    return challenge
+    return catalogue_response(request, entry)
 
-# Flag Submission Route
+# Flag Submission Route (rate limited before any database work); a solve that lowers a
+# dynamic challenge's value takes four more statements to lock and move the earlier solvers
 @app.post("/challenges/{challenge_id}/submit_flag")
-async def submit_flag_endpoint(challenge_id: int, flag_submission: FlagSubmissionCreate, current_user: UserOut = Depends(get_current_user), db: Session = Depends(get_db)):
-    result = submit_flag(db, current_user.id, challenge_id, flag_submission.flag)
+@query_budget(11)
+async def submit_flag_endpoint(challenge_id: int, flag_submission: FlagSubmissionCreate, user_id: int = Depends(get_current_user_id), _: None = Depends(limit_flag_submissions), db: AsyncSession = Depends(get_async_db)):
+    result = await submit_flag(db, user_id, challenge_id, flag_submission.flag)
     if result is None:
         raise HTTPException(status_code=404, detail="Challenge or user not found")
     return result
 
-# Hint Request Route
+# Hint Routes: tiers are bought in order, once; bought hints can be viewed again for free
+@app.get("/challenges/{challenge_id}/hints", response_model=List[HintTierOut])
+@query_budget(1)
+async def list_challenge_hints(challenge_id: int, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_async_read_db)):
+    return await get_hint_tiers(db, user_id, challenge_id)
+
 @app.post("/challenges/{challenge_id}/hint", response_model=HintOut)
-async def request_challenge_hint(challenge_id: int, current_user: UserOut = Depends(get_current_user), db: Session = Depends(get_db)):
+@query_budget(4)
+async def request_challenge_hint(challenge_id: int, tier: Optional[int] = None, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_async_db)):
     """
-    Request a hint for a challenge.
-    This endpoint should deduct a small amount of XP (e.g., 5 XP) and return a hint.
+    Buy a hint for a challenge: the given tier, or the next one not yet bought.
+    A hint that was already bought is returned again without charging.
     """
-    hint = request_hint(db, current_user.id, challenge_id)
+    hint = await request_hint(db, user_id, challenge_id, tier)
     if hint is None:
         raise HTTPException(status_code=404, detail="Hint not available or challenge not found")
     return hint
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text, UniqueConstraint, Index
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from backend.base import Base  # Import Base from your new base.py
 
@@ -37,25 +37,34 @@ class Challenge(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, nullable=False)
     description = Column(Text, nullable=False)
-    content = Column(Text, nullable=True)  # New field for main challenge content
+    content = deferred(Column(Text, nullable=True))  # Main challenge body; only loaded when asked for (see crud.get_challenge_detail)
     image_url = Column(String, nullable=True)  # New field for image URL
     difficulty = Column(String, nullable=False)  # Easy, Medium, Hard
     category = Column(String, nullable=False)      # E.g., SQL Injection, Cryptography, OSINT
     xp_reward = Column(Integer, nullable=False, default=10)
     flag = Column(String, nullable=False)  # The correct flag for the challenge
+    flag_rules = Column(String, nullable=True)  # Comma-separated normalisation rules, see backend/flags.py
     created_at = Column(DateTime, default=datetime.utcnow)
-    level_id = Column(Integer, ForeignKey("levels.id"), nullable=False)  # Link challenge to a level
+    level_id = Column(Integer, ForeignKey("levels.id"), nullable=False, index=True)  # Link challenge to a level
 
     # Relationships
     level = relationship("Level", back_populates="challenges")
     user_challenges = relationship("UserChallenge", back_populates="challenge")
     flag_submissions = relationship("FlagSubmission", back_populates="challenge")
+    hints = relationship("Hint", back_populates="challenge", order_by="Hint.tier")
 
     def __repr__(self):
         return f"<Challenge(id={self.id}, name='{self.name}', difficulty='{self.difficulty}', xp_reward={self.xp_reward})>"
 
 class UserChallenge(Base):
     __tablename__ = "user_challenges"
+    __table_args__ = (
+        # A user can complete a challenge only once; submit_flag relies on this to stay idempotent.
+        # Its index also serves the completion checks and per-user progress lookups
+        UniqueConstraint("user_id", "challenge_id", name="uq_user_challenges_user_id_challenge_id"),
+        # Solve counts per challenge (e.g. joins from challenges)
+        Index("ix_user_challenges_challenge_id", "challenge_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -70,17 +79,98 @@ class UserChallenge(Base):
         return f"<UserChallenge(user_id={self.user_id}, challenge_id={self.challenge_id}, success={self.success})>"
 
 class FlagSubmission(Base):
+    """
+    Every flag attempt. On Postgres the table is range-partitioned by month on
+    submitted_at (see the partitioning migration), and closed months are moved
+    to compressed files by backend/archive.py.
+    """
     __tablename__ = "flag_submissions"
+    __table_args__ = (
+        Index("ix_flag_submissions_user_id_challenge_id", "user_id", "challenge_id"),
+        Index("ix_flag_submissions_challenge_id", "challenge_id"),
+        Index("ix_flag_submissions_submitted_at", "submitted_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     challenge_id = Column(Integer, ForeignKey("challenges.id"), nullable=False)
     flag = Column(String, nullable=False)  # The submitted flag
     correct = Column(Boolean, default=False)  # Whether the submission is correct
-    submitted_at = Column(DateTime, default=datetime.utcnow)
+    submitted_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # The partition key
 
     user = relationship("User", back_populates="flag_submissions")
     challenge = relationship("Challenge", back_populates="flag_submissions")
 
     def __repr__(self):
-        return f"<FlagSubmission(user_id={self.user_id}, challenge_id={self.challenge_id}, flag='{self.flag}', correct={self.correct})>"
\ No newline at end of file
+        return f"<FlagSubmission(user_id={self.user_id}, challenge_id={self.challenge_id}, flag='{self.flag}', correct={self.correct})>"
+
+class Hint(Base):
+    """One tier of hints for a challenge; tiers are bought in order (see crud.request_hint)."""
+    __tablename__ = "hints"
+    __table_args__ = (
+        UniqueConstraint("challenge_id", "tier", name="uq_hints_challenge_id_tier"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    challenge_id = Column(Integer, ForeignKey("challenges.id"), nullable=False)
+    tier = Column(Integer, nullable=False)  # 1 is the gentlest nudge
+    body = Column(Text, nullable=False)
+    cost = Column(Integer, nullable=False, default=5)  # XP deducted on purchase
+
+    challenge = relationship("Challenge", back_populates="hints")
+
+    def __repr__(self):
+        return f"<Hint(challenge_id={self.challenge_id}, tier={self.tier}, cost={self.cost})>"
+
+class HintPurchase(Base):
+    """Ledger of bought hints: a hint is paid for once and can be viewed again for free."""
+    __tablename__ = "hint_purchases"
+    __table_args__ = (
+        # Also what makes a concurrent second purchase of the same hint roll back
+        UniqueConstraint("user_id", "hint_id", name="uq_hint_purchases_user_id_hint_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    hint_id = Column(Integer, ForeignKey("hints.id"), nullable=False)
+    cost = Column(Integer, nullable=False)  # What was paid, in case the hint's price changes later
+    purchased_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<HintPurchase(user_id={self.user_id}, hint_id={self.hint_id}, cost={self.cost})>"
+
+class UserStats(Base):
+    """Per-user aggregates kept up to date by submit_flag, request_hint and the audit writer (see backend/stats.py)."""
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    solves = Column(Integer, nullable=False, default=0, server_default="0")
+    hints_used = Column(Integer, nullable=False, default=0, server_default="0")
+    wrong_attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    last_solve_at = Column(DateTime, nullable=True)
+    points = Column(Integer, nullable=False, default=0, server_default="0")  # Current value of the solved challenges (see backend/scoring.py)
+
+    def __repr__(self):
+        return f"<UserStats(user_id={self.user_id}, solves={self.solves}, wrong_attempts={self.wrong_attempts})>"
+
+class UserCategoryStats(Base):
+    """Solves per challenge category for each user."""
+    __tablename__ = "user_category_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    category = Column(String, primary_key=True)
+    solves = Column(Integer, nullable=False, default=0, server_default="0")
+
+class ChallengeScore(Base):
+    """A challenge's solve count and the value every solver currently holds (see backend/scoring.py)."""
+    __tablename__ = "challenge_scores"
+
+    challenge_id = Column(Integer, ForeignKey("challenges.id"), primary_key=True)
+    solves = Column(Integer, nullable=False, default=0, server_default="0")
+    value = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<ChallengeScore(challenge_id={self.challenge_id}, solves={self.solves}, value={self.value})>"
+
+# Leaderboard order: xp descending, ties broken by id
+Index("ix_users_xp_desc_id", User.xp.desc(), User.id)
@@ -0,0 +1,63 @@
+# backend/pagination.py
+import base64
+import json
+from fastapi import HTTPException
+from backend.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+
+class Page:
+    """One page of a keyset-paginated listing and the cursor for the next one (None on the last page)."""
+
+    __slots__ = ("items", "next_cursor")
+
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def headers(self):
+        return {"X-Next-Cursor": self.next_cursor} if self.next_cursor else {}
+
+
+def page_size(limit, cursor=None):
+    """
+    Clamp a requested page size. With neither ?limit nor ?cursor the listing is
+    not paged (None), as it was before pagination, so clients that never follow
+    X-Next-Cursor still get every row; a cursor without a limit uses the default.
+    """
+    if limit is None:
+        return None if cursor is None else DEFAULT_PAGE_SIZE
+    return min(max(limit, 1), MAX_PAGE_SIZE)
+
+
+def fetch_limit(size):
+    """The LIMIT to query with for a page of `size` rows (one extra row shows another page exists)."""
+    return None if size is None else size + 1
+
+
+def encode_cursor(*key) -> str:
+    """Opaque cursor for the sort key of the last row on a page."""
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, arity: int):
+    """The sort key a cursor was made from, or None for the first page; 400 if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(key, list) or len(key) != arity or not all(isinstance(value, int) for value in key):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(key)
+
+
+def paginate(rows, limit: int, key):
+    """
+    Build a Page from rows fetched with LIMIT fetch_limit(limit): the extra row
+    only signals that another page exists. `key(row)` gives the row's sort key.
+    With limit None every row is on the one page.
+    """
+    items = list(rows[:limit])
+    next_cursor = encode_cursor(*key(items[-1])) if limit is not None and len(rows) > limit else None
+    return Page(items, next_cursor)
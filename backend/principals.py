@@ -0,0 +1,78 @@
+# backend/principals.py
+import threading
+import time
+from collections import OrderedDict
+from backend.config import PRINCIPAL_CACHE_TTL_SECONDS, PRINCIPAL_CACHE_MAX_SIZE
+from backend.schemas import UserOut
+
+
+class PrincipalCache:
+    """
+    Short-lived, size-bounded cache of authenticated users keyed by user id.
+
+    Entries expire after `ttl` seconds and the least recently used entry is
+    evicted once `max_size` is reached. The CRUD layer invalidates a user's
+    entry whenever their XP or profile changes, so the TTL only bounds how
+    long a change made by another worker can go unnoticed.
+    """
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL_SECONDS, max_size: int = PRINCIPAL_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # user_id -> (expires_at, UserOut)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int):
+        """Return a copy of the cached principal, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            # Handlers may mutate what they get back (e.g. completed_challenges), so never hand out the cached object
+            return entry[1].model_copy()
+
+    def put(self, user):
+        """Cache a principal built from a User row and return it."""
+        principal = to_principal(user)
+        if self.max_size <= 0:
+            return principal
+        with self._lock:
+            self._entries[principal.id] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return principal.model_copy()
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def to_principal(user):
+    """Build a UserOut from a User row's columns, without touching its relationships."""
+    return UserOut(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        xp=user.xp or 0,
+        created_at=user.created_at,
+        last_login=user.last_login,
+    )
+
+
+# Shared cache used by the auth dependencies and invalidated by the CRUD layer
+principal_cache = PrincipalCache()
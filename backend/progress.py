@@ -0,0 +1,183 @@
+# backend/progress.py
+import threading
+from collections import OrderedDict
+from sqlalchemy import select
+from backend.config import PROGRESS_CACHE_MAX_USERS
+from backend.models import Challenge, UserChallenge
+
+
+class ProgressIndex:
+    """
+    Per-user completion bitsets over challenge ids.
+
+    A user's bitset is read from user_challenges the first time it is needed
+    and then kept current by the CRUD layer (`mark_solved` after each committed
+    solve), so status checks and per-level completion lists are a dict lookup
+    and a bitwise AND. Per-level masks come from the challenges table and are
+    rebuilt whenever the catalogue changes.
+
+    Bits are not challenge ids: each challenge id gets the next free position
+    the first time it is seen, so a bitset grows with the size of the catalogue
+    rather than with its largest id. Positions are never reused while the
+    worker runs, so bitsets and masks built at different times stay comparable.
+    The bitsets of the `max_users` most recently used users are kept.
+    """
+
+    def __init__(self, max_users: int = PROGRESS_CACHE_MAX_USERS):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._positions = {}     # challenge_id -> bit position
+        self._ids = []           # bit position -> challenge_id
+        self._bits = OrderedDict()  # user_id -> bitset of completed challenges, least recently used first
+        self._loaded = set()     # users whose bitset has been read from the database
+        self._level_masks = None  # level_id -> bitset of challenges in that level
+        self._levels_version = 0
+
+    # Bit positions ---------------------------------------------------------
+
+    def _position(self, challenge_id: int) -> int:
+        position = self._positions.get(challenge_id)
+        if position is None:
+            with self._lock:
+                position = self._positions.get(challenge_id)
+                if position is None:
+                    position = self._positions[challenge_id] = len(self._ids)
+                    self._ids.append(challenge_id)
+        return position
+
+    def _to_bits(self, challenge_ids) -> int:
+        bits = 0
+        for challenge_id in challenge_ids:
+            bits |= 1 << self._position(challenge_id)
+        return bits
+
+    def to_ids(self, bits: int):
+        """Decode a bitset into a sorted list of challenge ids."""
+        ids = []
+        while bits:
+            lowest = bits & -bits
+            ids.append(self._ids[lowest.bit_length() - 1])
+            bits ^= lowest
+        return sorted(ids)
+
+    # Per-user completion -------------------------------------------------
+
+    def _cached(self, user_id: int):
+        with self._lock:
+            if user_id not in self._loaded:
+                return None
+            self._bits.move_to_end(user_id)
+            return self._bits[user_id]
+
+    def _put(self, user_id: int, bits: int):
+        # Called with the lock held
+        self._bits[user_id] = bits
+        self._bits.move_to_end(user_id)
+        while len(self._bits) > self.max_users:
+            evicted, _ = self._bits.popitem(last=False)
+            self._loaded.discard(evicted)
+
+    def _store(self, user_id: int, loaded_bits: int):
+        with self._lock:
+            # OR in solves marked while the query was running so none are lost
+            bits = loaded_bits | self._bits.get(user_id, 0)
+            self._loaded.add(user_id)
+            self._put(user_id, bits)
+            return bits
+
+    @staticmethod
+    def _completion_query(user_id: int):
+        return select(UserChallenge.challenge_id).where(
+            UserChallenge.user_id == user_id, UserChallenge.success == True
+        )
+
+    def completed_bits(self, db, user_id: int) -> int:
+        """Bitset of challenges the user has completed (sync session)."""
+        bits = self._cached(user_id)
+        if bits is None:
+            rows = db.execute(self._completion_query(user_id))
+            bits = self._store(user_id, self._to_bits(row.challenge_id for row in rows))
+        return bits
+
+    async def completed_bits_async(self, db, user_id: int) -> int:
+        """Bitset of challenges the user has completed (async session)."""
+        bits = self._cached(user_id)
+        if bits is None:
+            rows = await db.execute(self._completion_query(user_id))
+            bits = self._store(user_id, self._to_bits(row.challenge_id for row in rows))
+        return bits
+
+    def mark_solved(self, user_id: int, challenge_id: int):
+        """Record a committed solve."""
+        bit = 1 << self._position(challenge_id)
+        with self._lock:
+            self._put(user_id, self._bits.get(user_id, 0) | bit)
+
+    def forget(self, user_id: int):
+        """Drop a user's bitset so it is re-read on next use."""
+        with self._lock:
+            self._bits.pop(user_id, None)
+            self._loaded.discard(user_id)
+
+    def reset(self):
+        """Drop every bitset and the level masks so all are re-read on next use."""
+        with self._lock:
+            self._bits = OrderedDict()
+            self._loaded = set()
+            self._levels_version += 1
+            self._level_masks = None
+
+    # Level masks -----------------------------------------------------------
+
+    def _build_masks(self, rows):
+        masks = {}
+        for row in rows:
+            masks[row.level_id] = masks.get(row.level_id, 0) | (1 << self._position(row.id))
+        return masks
+
+    def _store_masks(self, masks, version: int):
+        with self._lock:
+            # Masks built from a query that raced with a catalogue change are used once, not kept
+            if version == self._levels_version:
+                self._level_masks = masks
+        return masks
+
+    def level_masks(self, db):
+        """Map of level_id -> bitset of its challenges (sync session)."""
+        masks = self._level_masks
+        if masks is None:
+            version = self._levels_version
+            rows = db.execute(select(Challenge.id, Challenge.level_id))
+            masks = self._store_masks(self._build_masks(rows), version)
+        return masks
+
+    async def level_masks_async(self, db):
+        """Map of level_id -> bitset of its challenges (async session)."""
+        masks = self._level_masks
+        if masks is None:
+            version = self._levels_version
+            rows = await db.execute(select(Challenge.id, Challenge.level_id))
+            masks = self._store_masks(self._build_masks(rows), version)
+        return masks
+
+    def reset_levels(self):
+        """Rebuild the level masks on next use (call after the catalogue changes)."""
+        with self._lock:
+            self._levels_version += 1
+            self._level_masks = None
+
+    # Read helpers ----------------------------------------------------------
+
+    def is_completed(self, bits: int, challenge_id: int) -> bool:
+        position = self._positions.get(challenge_id)
+        return position is not None and bool(bits >> position & 1)
+
+    def completed_in_level(self, bits: int, masks, level_id: int):
+        return self.to_ids(bits & masks.get(level_id, 0))
+
+    def completed_by_level(self, bits: int, masks):
+        return {level_id: self.to_ids(bits & mask) for level_id, mask in masks.items()}
+
+
+# Shared index used by the completion routes and kept current by the CRUD layer
+progress_index = ProgressIndex()
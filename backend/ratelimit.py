@@ -0,0 +1,224 @@
+# backend/ratelimit.py
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from fastapi import Depends, HTTPException, Request
+from backend.config import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND, RATE_LIMIT_SQLITE_PATH,
+    RATE_LIMIT_FLAG_PER_USER, RATE_LIMIT_FLAG_PER_USER_CHALLENGE, RATE_LIMIT_FLAG_PER_IP, RATE_LIMIT_TRUSTED_PROXY_HOPS
+)
+from backend.dependencies import get_current_user_id
+
+
+def parse_rule(value: str):
+    """Parse "<burst>/<seconds>" into (capacity, refill tokens per second)."""
+    burst, seconds = value.split("/")
+    return int(burst), int(burst) / float(seconds)
+
+
+def _take_from(buckets, now: float):
+    """
+    Shared token-bucket step. `buckets` holds (capacity, rate, tokens, updated)
+    with the stored state (or None for a new bucket). Returns the new token
+    levels if every bucket had a token, else the indices of the empty buckets
+    and how long until they refill.
+    """
+    levels, empty, wait = [], [], 0.0
+    for i, (capacity, rate, tokens, updated) in enumerate(buckets):
+        level = capacity if tokens is None else min(capacity, tokens + (now - updated) * rate)
+        if level < 1:
+            empty.append(i)
+            wait = max(wait, (1 - level) / rate)
+        levels.append(level - 1)
+    return (None, empty, wait) if empty else (levels, [], 0.0)
+
+
+class MemoryBackend:
+    """Token buckets held in this process; each worker limits on its own."""
+
+    blocking = False
+
+    def __init__(self, max_keys: int = 100000):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (tokens, updated), least recently updated first
+        self.max_keys = max_keys
+
+    def take(self, requests):
+        """
+        Take one token from each bucket in `requests` ((key, capacity, rate) tuples),
+        all or nothing. Returns (indices of empty buckets, seconds until they refill).
+        """
+        now = time.monotonic()
+        with self._lock:
+            buckets = [(capacity, rate, *self._buckets.get(key, (None, None))) for key, capacity, rate in requests]
+            levels, empty, wait = _take_from(buckets, now)
+            if levels is not None:
+                for level, (key, _, _) in zip(levels, requests):
+                    self._buckets[key] = (level, now)
+                    self._buckets.move_to_end(key)
+                self._evict()
+        return empty, wait
+
+    def _evict(self):
+        # Oldest first, O(1) each. Buckets idle for an hour have refilled under every configured rule, so
+        # forgetting them changes nothing; past that, the least recently used key just starts a fresh bucket
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+
+class SQLiteBackend:
+    """
+    Token buckets in a SQLite file shared by every worker on the host.
+
+    This is the local stand-in for a networked store such as Redis: any object
+    with the same `take` method and `blocking` flag can replace it. Each `take`
+    runs in one IMMEDIATE transaction, so concurrent workers never both spend
+    the last token.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        connection = self._connect()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def take(self, requests):
+        now = time.time()  # Wall clock, because the state is shared between processes
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            buckets = []
+            for key, capacity, rate in requests:
+                row = connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                buckets.append((capacity, rate, *(row or (None, None))))
+            levels, empty, wait = _take_from(buckets, now)
+            if levels is not None:
+                connection.executemany(
+                    "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                    [(key, level, now) for level, (key, _, _) in zip(levels, requests)],
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return empty, wait
+
+
+class RateLimiter:
+    """
+    Named token-bucket rules checked together against a pluggable backend.
+
+    `rules` maps a rule name to (capacity, refill rate per second). A caller
+    passes the key it uses for each rule and is admitted only if every bucket
+    has a token, in which case one is taken from each. Allowed and rejected
+    counts (per rule) are kept so limits can be tuned from real traffic.
+    """
+
+    def __init__(self, backend, rules):
+        self.backend = backend
+        self.rules = rules
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = {name: 0 for name in rules}
+
+    def _requests(self, keys):
+        return [(f"{name}:{key}", *self.rules[name]) for name, key in keys.items()]
+
+    def check(self, keys):
+        """Take a token for each rule name -> key; raise 429 with Retry-After if any bucket is empty."""
+        self._settle(keys, *self.backend.take(self._requests(keys)))
+
+    async def check_async(self, keys):
+        """`check` for the event loop; backends that do I/O run on a worker thread."""
+        if self.backend.blocking:
+            result = await asyncio.to_thread(self.backend.take, self._requests(keys))
+        else:
+            result = self.backend.take(self._requests(keys))
+        self._settle(keys, *result)
+
+    def _settle(self, keys, empty, wait):
+        names = list(keys)
+        with self._lock:
+            if not empty:
+                self.allowed += 1
+                return
+            for i in empty:
+                self.rejected[names[i]] += 1
+        raise HTTPException(status_code=429, detail="Too many flag submissions, slow down",
+                            headers={"Retry-After": str(max(1, round(wait + 0.5)))})
+
+    def stats(self):
+        with self._lock:
+            return {"allowed": self.allowed, "rejected": dict(self.rejected)}
+
+    def render_metrics(self) -> str:
+        """Counters in the Prometheus text format, appended to /metrics."""
+        stats = self.stats()
+        lines = [
+            "# HELP rate_limit_allowed_total Flag submissions admitted by the rate limiter.",
+            "# TYPE rate_limit_allowed_total counter",
+            f"rate_limit_allowed_total {stats['allowed']}",
+            "# HELP rate_limit_rejected_total Flag submissions rejected, by the rule whose bucket was empty.",
+            "# TYPE rate_limit_rejected_total counter",
+        ]
+        lines += [f'rate_limit_rejected_total{{rule="{name}"}} {count}' for name, count in stats["rejected"].items()]
+        return "\n".join(lines) + "\n"
+
+
+def _make_backend():
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteBackend(RATE_LIMIT_SQLITE_PATH)
+    if RATE_LIMIT_BACKEND == "memory":
+        return MemoryBackend()
+    raise ValueError("RATE_LIMIT_BACKEND must be 'memory' or 'sqlite'")
+
+
+# Shared limiter for flag submissions
+flag_rate_limiter = RateLimiter(_make_backend(), {
+    "user": parse_rule(RATE_LIMIT_FLAG_PER_USER),
+    "user_challenge": parse_rule(RATE_LIMIT_FLAG_PER_USER_CHALLENGE),
+    **({"ip": parse_rule(RATE_LIMIT_FLAG_PER_IP)} if RATE_LIMIT_FLAG_PER_IP else {}),
+})
+
+
+def client_address(request: Request, trusted_hops: int = RATE_LIMIT_TRUSTED_PROXY_HOPS) -> str:
+    """
+    The caller's address: the connection's peer, or with `trusted_hops` proxies in
+    front, the address the outermost of them saw. Entries further left in
+    X-Forwarded-For come from the client and are never trusted.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if trusted_hops <= 0:
+        return peer
+    forwarded = [hop.strip() for hop in ",".join(request.headers.getlist("x-forwarded-for")).split(",") if hop.strip()]
+    if not forwarded:
+        return peer
+    return forwarded[-min(trusted_hops, len(forwarded))]
+
+
+async def limit_flag_submissions(challenge_id: int, request: Request, user_id: int = Depends(get_current_user_id)):
+    """
+    Dependency for the submit_flag routes: rejects over-limit callers with 429
+    from the token alone, before a database session is used.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    keys = {"user": user_id, "user_challenge": f"{user_id}:{challenge_id}"}
+    if "ip" in flag_rate_limiter.rules:
+        keys["ip"] = client_address(request)
+    await flag_rate_limiter.check_async(keys)
@@ -0,0 +1,59 @@
+# backend/routes/admin.py
+import hmac
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from typing import Optional
+from backend.config import ADMIN_API_KEY
+from backend.database import AsyncSessionLocal
+from backend.models import Challenge, FlagSubmission, User, UserChallenge
+from backend.serialization import dumps
+
+router = APIRouter(prefix="/admin")
+
+# Rows fetched from the server-side cursor per round trip
+EXPORT_BATCH_SIZE = 1000
+
+# Columns included in each export; password hashes are never exported
+EXPORTS = {
+    "users": (User.id, User.username, User.email, User.xp, User.created_at, User.last_login),
+    "challenges": (Challenge.id, Challenge.name, Challenge.description, Challenge.content, Challenge.image_url,
+                   Challenge.difficulty, Challenge.category, Challenge.xp_reward, Challenge.flag,
+                   Challenge.flag_rules, Challenge.level_id, Challenge.created_at),
+    "completions": (UserChallenge.id, UserChallenge.user_id, UserChallenge.challenge_id, UserChallenge.success,
+                    UserChallenge.completed_at),
+    "submissions": (FlagSubmission.id, FlagSubmission.user_id, FlagSubmission.challenge_id, FlagSubmission.flag,
+                    FlagSubmission.correct, FlagSubmission.submitted_at),
+}
+
+
+def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """Admin routes need the X-Admin-Key header to match ADMIN_API_KEY; without a key configured they don't exist."""
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_key or not hmac.compare_digest(x_admin_key.encode(), ADMIN_API_KEY.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin key")
+
+
+async def _ndjson_rows(columns):
+    """Yield one JSON line per row, streamed from a server-side cursor in id order."""
+    # The session lives in the generator: it has to outlast the request handler while the body streams
+    async with AsyncSessionLocal() as db:
+        query = select(*columns).order_by(columns[0]).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        result = await db.stream(query)
+        keys = [column.key for column in columns]
+        async for rows in result.partitions():
+            yield b"".join(dumps(dict(zip(keys, row))) + b"\n" for row in rows)
+
+
+@router.get("/export/{table}", dependencies=[Depends(require_admin)])
+async def export_table(table: str):
+    """Stream a table as NDJSON without building the whole result in memory."""
+    columns = EXPORTS.get(table)
+    if columns is None:
+        raise HTTPException(status_code=404, detail=f"Unknown export; choose one of {', '.join(EXPORTS)}")
+    return StreamingResponse(
+        _ndjson_rows(columns),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{table}.ndjson"'},
+    )
@@ -0,0 +1,40 @@
+# backend/routes/events.py
+import asyncio
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from backend.config import SSE_HEARTBEAT_SECONDS
+from backend.events import scoreboard_hub
+
+router = APIRouter()
+
+
+async def _scoreboard_stream():
+    subscriber = scoreboard_hub.subscribe()
+    try:
+        # Subscribe before taking the snapshot so no diff can fall between the two
+        yield scoreboard_hub.snapshot()
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle connection
+                message = ": keepalive\n\n"
+            if message is None or subscriber.dropped:
+                break
+            yield message
+    finally:
+        scoreboard_hub.unsubscribe(subscriber)
+
+
+@router.get("/events/scoreboard")
+async def scoreboard_events():
+    """
+    Server-sent events replacing leaderboard and status polling: a "snapshot"
+    of the top N on connect, then coalesced "scoreboard" diffs and "solves"
+    batches at most once per SCOREBOARD_TICK_SECONDS.
+    """
+    return StreamingResponse(
+        _scoreboard_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
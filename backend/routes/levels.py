@@ -1,29 +1,58 @@
 # backend/routes/levels.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
-from typing import List
-from backend.database import get_db
-from backend.schemas import LevelOut, ChallengeOut  # Make sure you create LevelOut in schemas.py
+from typing import List, Optional
+from backend.database import get_read_db
+from backend.schemas import LevelOut, ChallengeSummaryOut  # Make sure you create LevelOut in schemas.py
 from backend.crud import get_all_levels, get_challenges_by_level, get_level_by_id  # You need to import this!
+from backend.catalogue import catalogue_cache, catalogue_response
+from backend.instrumentation import query_budget
+from backend.pagination import decode_cursor, fetch_limit, page_size, paginate
+from backend.serialization import serializer
 
 router = APIRouter()
 
+# Built at import so the first request doesn't pay for compiling them
+LEVELS = serializer(LevelOut)
+CHALLENGE_SUMMARIES = serializer(ChallengeSummaryOut)
+
+# Level routes are served from the catalogue cache; create_challenge invalidates it. Cache misses read from a replica.
+# Lists come whole by default, or keyset-paginated: pass ?limit and the X-Next-Cursor header of the previous
+# page as ?cursor. Only the whole lists are cached, since page keys come from the client (see CatalogueCache)
+
 @router.get("/levels", response_model=List[LevelOut])
-def get_levels(db: Session = Depends(get_db)):
-    levels = get_all_levels(db)
-    return levels
+@query_budget(1)
+def get_levels(request: Request, cursor: Optional[str] = None, limit: Optional[int] = None, db: Session = Depends(get_read_db)):
+    after, size = decode_cursor(cursor, 2), page_size(limit, cursor)
+    def load():
+        levels = get_all_levels(db, after=after, limit=fetch_limit(size))
+        return paginate(levels, size, lambda level: (level.order, level.id))
+    entry = catalogue_cache.get_or_load(("levels",) if size is None else None, load, LEVELS)
+    return catalogue_response(request, entry)
 
 # This is the new route you need!
 @router.get("/levels/{level_id}", response_model=LevelOut)
-def get_level(level_id: int, db: Session = Depends(get_db)):
-    level = get_level_by_id(db, level_id)
-    if not level:
+@query_budget(1)
+def get_level(level_id: int, request: Request, db: Session = Depends(get_read_db)):
+    def load():
+        return get_level_by_id(db, level_id)
+    entry = catalogue_cache.get_or_load(("level", level_id), load, LEVELS)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Level not found")
-    return level
+    return catalogue_response(request, entry)
 
-@router.get("/levels/{level_id}/challenges", response_model=List[ChallengeOut])
-def get_level_challenges(level_id: int, db: Session = Depends(get_db)):
-    challenges = get_challenges_by_level(db, level_id)
-    if not challenges:
+@router.get("/levels/{level_id}/challenges", response_model=List[ChallengeSummaryOut])
+@query_budget(1)
+def get_level_challenges(level_id: int, request: Request, cursor: Optional[str] = None, limit: Optional[int] = None,
+                         db: Session = Depends(get_read_db)):
+    after, size = decode_cursor(cursor, 1), page_size(limit, cursor)
+    def load():
+        rows = get_challenges_by_level(db, level_id, after_id=after and after[0], limit=fetch_limit(size))
+        if not rows and after is None:
+            return None
+        return paginate(rows, size, lambda row: (row.id,))
+    key = ("level_challenges", level_id) if size is None else None
+    entry = catalogue_cache.get_or_load(key, load, CHALLENGE_SUMMARIES)
+    if entry is None:
         raise HTTPException(status_code=404, detail="No challenges found for this level")
-    return challenges
\ No newline at end of file
+    return catalogue_response(request, entry)
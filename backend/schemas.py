@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 # User schemas
@@ -19,6 +19,12 @@ class UserOut(BaseModel):
 
     class Config:
         orm_mode = True
+        from_attributes = True
+
+class LoginOut(BaseModel):
+    access_token: str
+    token_type: str
+    user: UserOut
 
 # Challenge schemas
 class ChallengeBase(BaseModel):
@@ -30,9 +36,16 @@ class ChallengeBase(BaseModel):
     category: str
     xp_reward: int
 
+class HintCreate(BaseModel):
+    tier: int
+    body: str
+    cost: int = 5
+
 class ChallengeCreate(ChallengeBase):
     flag: str
+    flag_rules: Optional[str] = None  # e.g. "case_insensitive,wrapper_optional"
     level_id: int
+    hints: Optional[List[HintCreate]] = None
 
 class ChallengeOut(ChallengeBase):
     id: int
@@ -41,6 +54,40 @@ class ChallengeOut(ChallengeBase):
 
     class Config:
         orm_mode = True
+        from_attributes = True
+
+# What list endpoints return: no content body and no flag
+class ChallengeSummaryOut(BaseModel):
+    id: int
+    name: str
+    description: str
+    difficulty: str
+    category: str
+    xp_reward: int
+    level_id: int
+
+    class Config:
+        orm_mode = True
+        from_attributes = True
+
+# Per-user aggregates from user_stats
+class UserStatsOut(BaseModel):
+    solves: int = 0
+    hints_used: int = 0
+    wrong_attempts: int = 0
+    points: int = 0
+    last_solve_at: Optional[datetime] = None
+    categories: Dict[str, int] = {}
+
+# Current value of a solved challenge (unsolved challenges are worth their xp_reward)
+class ChallengeScoreOut(BaseModel):
+    challenge_id: int
+    solves: int
+    value: int
+
+    class Config:
+        orm_mode = True
+        from_attributes = True
 
 # UserChallenge schema
 class UserChallengeOut(BaseModel):
@@ -51,6 +98,7 @@ class UserChallengeOut(BaseModel):
 
     class Config:
         orm_mode = True
+        from_attributes = True
 
 # FlagSubmission schemas
 class FlagSubmissionCreate(BaseModel):
@@ -65,6 +113,7 @@ class FlagSubmissionOut(BaseModel):
 
     class Config:
         orm_mode = True
+        from_attributes = True
 
 # Optionally, a combined User output including submissions
 class UserWithChallengesOut(BaseModel):
@@ -77,6 +126,7 @@ class UserWithChallengesOut(BaseModel):
 
     class Config:
         orm_mode = True
+        from_attributes = True
 
 # Level and Hint schemas
 class LevelOut(BaseModel):
@@ -87,10 +137,22 @@ class LevelOut(BaseModel):
 
     class Config:
         orm_mode = True
+        from_attributes = True
 
 class HintOut(BaseModel):
     hint: str
     remaining_xp: int
+    tier: int
+    cost: int
+    charged: bool  # False when the hint had already been bought
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+        from_attributes = True
+
+# One entry per hint tier of a challenge; the body is only included once bought
+class HintTierOut(BaseModel):
+    tier: int
+    cost: int
+    purchased: bool
+    hint: Optional[str] = None
\ No newline at end of file
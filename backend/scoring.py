@@ -0,0 +1,182 @@
+# backend/scoring.py
+"""
+Challenge values and the XP they award.
+
+With SCORING_MODE "static" a solve is worth the challenge's xp_reward. With
+"dynamic" the value decays as the challenge is solved (the CTFd curve): the
+first solver gets xp_reward, and the value falls quadratically to
+SCORING_MINIMUM_RATIO of it after SCORING_DECAY_SOLVES solves. Every solver
+holds the current value, so a solve that lowers it lowers the XP of everyone
+who solved the challenge before.
+
+Static values never depend on other solves, so static mode writes nothing
+here: a solve touches only the solver's rows, and solve counts are read from
+user_challenges when asked for.
+
+Nothing is recomputed from scratch on a dynamic solve. challenge_scores keeps
+each challenge's solve count and current value, and user_challenges is each
+user's solve set. A solve bumps the count (the row lock orders concurrent
+solves of one challenge) and, only if the value changed, locks the solvers'
+users rows in id order and moves every earlier solver's XP and
+user_stats.points by the difference in one set-based UPDATE each. Solves of
+different challenges with overlapping solvers therefore queue instead of
+deadlocking; a transaction the database still aborts is retried by
+crud.submit_flag.
+
+The full recompute derives the same numbers from user_challenges and the
+current settings and corrects any drift. Run it before switching to dynamic
+mode, since static mode leaves challenge_scores behind. `check` runs it and
+rolls back:
+
+    python -m backend.scoring check
+    python -m backend.scoring recompute
+"""
+import argparse
+import math
+import sys
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from backend.config import SCORING_DECAY_SOLVES, SCORING_MINIMUM_RATIO, SCORING_MODE
+from backend.models import Challenge, ChallengeScore, User, UserChallenge, UserStats
+from backend.stats import _upsert
+
+challenge_scores = ChallengeScore.__table__
+
+
+def challenge_value(initial: int, solves: int, mode: str = SCORING_MODE) -> int:
+    """What a challenge worth `initial` XP is worth to each of its `solves` solvers."""
+    if mode == "static":
+        return initial
+    if mode != "dynamic":
+        raise RuntimeError(f"Unknown SCORING_MODE {mode!r}; use static or dynamic")
+    minimum = math.ceil(initial * SCORING_MINIMUM_RATIO)
+    decayed = max(solves - 1, 0)  # The first solver gets the full value
+    value = initial + (minimum - initial) * decayed * decayed / (SCORING_DECAY_SOLVES ** 2)
+    return max(minimum, math.ceil(value))
+
+
+def counts_solves(mode: str = SCORING_MODE) -> bool:
+    """Whether a solve must go through challenge_scores (dynamic mode) or is worth xp_reward as it stands."""
+    return mode == "dynamic"
+
+
+def scores_query(mode: str = SCORING_MODE):
+    """(challenge_id, solves, value) of every solved challenge, in challenge id order."""
+    if counts_solves(mode):
+        return (select(ChallengeScore.challenge_id, ChallengeScore.solves, ChallengeScore.value)
+                .order_by(ChallengeScore.challenge_id))
+    return (
+        select(UserChallenge.challenge_id, func.count(UserChallenge.id).label("solves"),
+               Challenge.xp_reward.label("value"))
+        .join(Challenge, Challenge.id == UserChallenge.challenge_id)
+        .where(UserChallenge.success == True)
+        .group_by(UserChallenge.challenge_id, Challenge.xp_reward)
+        .order_by(UserChallenge.challenge_id)
+    )
+
+
+def solve_statement(dialect_name: str, challenge_id: int, initial: int):
+    """Statement counting one solve; returns the new solve count and the value held before it."""
+    statement = _upsert(dialect_name, challenge_scores).values(challenge_id=challenge_id, solves=1, value=initial)
+    return statement.on_conflict_do_update(
+        index_elements=[challenge_scores.c.challenge_id], set_={"solves": challenge_scores.c.solves + 1},
+    ).returning(challenge_scores.c.solves, challenge_scores.c.value)
+
+
+def after_solve(initial: int, solves: int, held: int):
+    """(value awarded to the new solver, change for every earlier solver) after solve_statement."""
+    value = challenge_value(initial, solves)
+    return value, value - held
+
+
+def revalue_statements(challenge_id: int, value: int, delta: int, user_id: int):
+    """
+    Statements moving a challenge to a new value: a lock on the users rows of the
+    earlier solvers and the new one (`user_id`) in id order, the challenge_scores
+    row, the solvers' points, and their XP (the last returns the solvers' id,
+    username and xp). Execute them before the new solver's user_challenges row is flushed.
+    """
+    solvers = select(UserChallenge.user_id).where(UserChallenge.challenge_id == challenge_id,
+                                                  UserChallenge.success == True)
+    return (
+        select(User.id).where(or_(User.id == user_id, User.id.in_(solvers))).order_by(User.id).with_for_update(),
+        update(ChallengeScore).where(ChallengeScore.challenge_id == challenge_id).values(value=value)
+        .execution_options(synchronize_session=False),
+        update(UserStats).where(UserStats.user_id.in_(solvers)).values(points=UserStats.points + delta)
+        .execution_options(synchronize_session=False),
+        update(User).where(User.id.in_(solvers)).values(xp=User.xp + delta)
+        .returning(User.id, User.username, User.xp)
+        .execution_options(synchronize_session=False),
+    )
+
+
+def recompute(db, mode: str = SCORING_MODE):
+    """
+    Rebuild challenge_scores from user_challenges and move every user whose
+    points differ to the recomputed total, adjusting users.xp by the same amount.
+    Runs in the caller's transaction and returns (challenge drift, user drift) as
+    lists of (id, old, new) so a caller can check the incremental state.
+    """
+    counts = db.execute(
+        select(Challenge.id, Challenge.xp_reward, func.count(UserChallenge.id))
+        .outerjoin(UserChallenge, and_(UserChallenge.challenge_id == Challenge.id, UserChallenge.success == True))
+        .group_by(Challenge.id, Challenge.xp_reward)
+    ).all()
+    current = {row.challenge_id: (row.solves, row.value) for row in db.execute(select(ChallengeScore))
+               .scalars()}
+    rows = [{"challenge_id": challenge_id, "solves": solves, "value": challenge_value(initial, solves, mode)}
+            for challenge_id, initial, solves in counts if solves]
+    # Static solves don't maintain challenge_scores, so only dynamic mode can drift from it
+    challenge_drift = [(row["challenge_id"], current.get(row["challenge_id"]), (row["solves"], row["value"]))
+                       for row in rows if current.get(row["challenge_id"]) != (row["solves"], row["value"])
+                       ] if counts_solves(mode) else []
+    db.execute(delete(ChallengeScore))
+    if rows:
+        db.execute(insert(challenge_scores), rows)
+
+    expected = func.coalesce(
+        select(func.sum(ChallengeScore.value))
+        .join(UserChallenge, UserChallenge.challenge_id == ChallengeScore.challenge_id)
+        .where(UserChallenge.user_id == UserStats.user_id, UserChallenge.success == True)
+        .scalar_subquery(), 0)
+    user_drift = db.execute(
+        select(UserStats.user_id, UserStats.points, expected.label("expected")).where(UserStats.points != expected)
+    ).all()
+    for user_id, points, total in user_drift:
+        db.execute(update(UserStats).where(UserStats.user_id == user_id).values(points=total))
+        db.execute(update(User).where(User.id == user_id).values(xp=User.xp + (total - points)))
+    return challenge_drift, [tuple(row) for row in user_drift]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or rebuild challenge values and user points")
+    parser.add_argument("command", choices=["check", "recompute"])
+    args = parser.parse_args()
+
+    from backend.database import SessionLocal
+    db = SessionLocal()
+    try:
+        challenge_drift, user_drift = recompute(db)
+        for challenge_id, old, new in challenge_drift:
+            print(f"challenge {challenge_id}: (solves, value) {old} -> {new}")
+        for user_id, old, new in user_drift:
+            print(f"user {user_id}: points {old} -> {new}")
+        if args.command == "check":
+            db.rollback()
+            print("Incremental scores match" if not (challenge_drift or user_drift) else "Incremental scores drifted")
+            sys.exit(1 if challenge_drift or user_drift else 0)
+        db.commit()
+        names = dict(db.execute(select(User.id, User.username).where(User.id.in_([row[0] for row in user_drift]))).all())
+    finally:
+        db.close()
+
+    # Running workers hold XP in memory: send them the corrections
+    from backend.bus import event_bus
+    event_bus.start()
+    for user_id, old, new in user_drift:
+        event_bus.publish("xp", user_id=user_id, username=names[user_id], delta=new - old)
+    event_bus.close()
+    print(f"Corrected {len(challenge_drift)} challenges and {len(user_drift)} users")
+
+
+if __name__ == "__main__":
+    main()
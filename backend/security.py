@@ -0,0 +1,85 @@
+# backend/security.py
+import asyncio
+import threading
+import jwt
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from backend.config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, SECRET_KEY, ALGORITHM
+
+# Pinning min/max rounds to the configured cost makes any hash with a different cost "need update"
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated=["auto"],
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+# bcrypt releases the GIL, so a small thread pool lets hashing use every core
+_executor = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+
+def hash_password(password: str) -> str:
+    """Hash a password on the calling thread."""
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the calling thread."""
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    """Verify a password and return (valid, new_hash); new_hash is set when the stored hash uses an old cost."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def token_user_id(token: str):
+    """The user id in a valid access token, or None."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    # Tokens issued before the "uid" claim existed only carry the email; those users have to log in again
+    user_id = payload.get("uid")
+    return None if user_id is None else int(user_id)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+        return _executor
+
+
+async def _run_password_work(func, *args):
+    # Reject instead of queueing without bound when a login burst outpaces the pool
+    if not _pending.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="Too many authentication requests, please retry")
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+    finally:
+        _pending.release()
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the password executor without blocking the event loop."""
+    return await _run_password_work(hash_password, password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str):
+    """Async version of verify_and_update_password that runs on the password executor."""
+    return await _run_password_work(verify_and_update_password, plain_password, hashed_password)
+
+
+def shutdown_password_executor():
+    """Stop the password executor, waiting for in-flight hashes to finish."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
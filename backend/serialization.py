@@ -0,0 +1,77 @@
+# backend/serialization.py
+"""
+JSON encoding fast paths.
+
+- `dumps` encodes plain data to bytes with orjson when it is installed (the
+  standard library otherwise). FastJSONResponse uses it and is the app's
+  default response class, so handlers that return dicts or lists skip
+  json.dumps.
+- `Serializer` wraps a response schema with prebuilt pydantic adapters:
+  `encode_many(rows)` validates ORM objects or row tuples straight into JSON
+  bytes in pydantic-core, without building a model instance per row in Python
+  and running it through jsonable_encoder. The catalogue cache stores
+  what it returns, so cached list endpoints send bytes as they are.
+"""
+import json
+import threading
+from datetime import date, datetime
+from typing import List
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library does the same job, slower
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+def dumps(data) -> bytes:
+    """Compact JSON bytes for plain data (dicts, lists, str/int keys, datetimes)."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, separators=(",", ":"), default=_default).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps`."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class Serializer:
+    """Validation and JSON encoding for one response schema, compiled once."""
+
+    __slots__ = ("schema", "one", "many")
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.one = TypeAdapter(schema)
+        self.many = TypeAdapter(List[schema])
+
+    def encode(self, obj) -> bytes:
+        """JSON bytes for one object read through the schema (attributes or mapping keys)."""
+        return self.one.dump_json(self.one.validate_python(obj, from_attributes=True))
+
+    def encode_many(self, rows) -> bytes:
+        """JSON array bytes for a sequence of objects."""
+        return self.many.dump_json(self.many.validate_python(rows, from_attributes=True))
+
+
+_serializers = {}
+_lock = threading.Lock()
+
+
+def serializer(schema) -> Serializer:
+    """The shared Serializer for a schema, built on first use."""
+    found = _serializers.get(schema)
+    if found is None:
+        with _lock:
+            found = _serializers.setdefault(schema, Serializer(schema))
+    return found
@@ -0,0 +1,136 @@
+# backend/stats.py
+"""
+Per-user aggregates in user_stats / user_category_stats.
+
+The rows are maintained incrementally, inside the transaction that causes the
+change: submit_flag bumps the solve counts, a hint purchase bumps hints_used and
+the audit writer adds wrong attempts when it flushes a batch. Each change is a
+single INSERT ... ON CONFLICT DO UPDATE, so a user's first event creates the
+row and concurrent events never lose an increment.
+
+If the aggregates are ever out of step (e.g. after a manual data fix), rebuild
+them from user_challenges, hint_purchases and flag_submissions:
+
+    python -m backend.stats rebuild
+"""
+import argparse
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import bindparam, delete, exists, func, insert, literal_column, select, update
+from backend.archive import ArchiveReader
+from backend.models import (
+    Challenge, FlagSubmission, HintPurchase, User, UserCategoryStats, UserChallenge, UserStats
+)
+
+user_stats = UserStats.__table__
+user_category_stats = UserCategoryStats.__table__
+
+
+def _upsert(dialect_name: str, table):
+    """INSERT ... ON CONFLICT for the dialects the app runs on."""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise RuntimeError(f"user_stats upserts are not implemented for {dialect_name}")
+    return dialect_insert(table)
+
+
+def solve_statements(dialect_name: str, user_id: int, category: str, points: int = 0, solved_at: datetime = None):
+    """Statements recording one solve worth `points`: total, points, last solve time and the category count."""
+    stats = _upsert(dialect_name, user_stats).values(
+        user_id=user_id, solves=1, hints_used=0, wrong_attempts=0, points=points,
+        last_solve_at=solved_at or datetime.utcnow())
+    stats = stats.on_conflict_do_update(
+        index_elements=[user_stats.c.user_id],
+        set_={"solves": user_stats.c.solves + 1, "points": user_stats.c.points + stats.excluded.points,
+              "last_solve_at": stats.excluded.last_solve_at},
+    )
+    per_category = _upsert(dialect_name, user_category_stats).values(user_id=user_id, category=category, solves=1)
+    per_category = per_category.on_conflict_do_update(
+        index_elements=[user_category_stats.c.user_id, user_category_stats.c.category],
+        set_={"solves": user_category_stats.c.solves + 1},
+    )
+    return stats, per_category
+
+
+def hint_statement(dialect_name: str, user_id: int):
+    """Statement recording one hint bought."""
+    statement = _upsert(dialect_name, user_stats).values(user_id=user_id, solves=0, hints_used=1, wrong_attempts=0)
+    return statement.on_conflict_do_update(
+        index_elements=[user_stats.c.user_id], set_={"hints_used": user_stats.c.hints_used + 1})
+
+
+def wrong_attempts_statement(dialect_name: str):
+    """Statement adding `wrong_attempts` to a user's count; execute it with one parameter set per user."""
+    statement = _upsert(dialect_name, user_stats)
+    return statement.on_conflict_do_update(
+        index_elements=[user_stats.c.user_id],
+        set_={"wrong_attempts": user_stats.c.wrong_attempts + statement.excluded.wrong_attempts},
+    )
+
+
+def wrong_attempt_params(rows):
+    """Parameter sets for wrong_attempts_statement from a batch of flag_submissions rows."""
+    counts = Counter(row["user_id"] for row in rows if not row.get("correct"))
+    return [{"user_id": user_id, "solves": 0, "hints_used": 0, "wrong_attempts": count}
+            for user_id, count in counts.items()]
+
+
+def rebuild(db):
+    """
+    Recompute every user's aggregates from user_challenges, hint_purchases and
+    flag_submissions in a handful of set-based statements, in the caller's transaction.
+    Wrong attempts already moved to the flag_submissions archive are added back from it.
+    points depend on challenge values and are rebuilt by backend.scoring.recompute.
+    """
+    solved = UserChallenge.success == True
+    db.execute(delete(UserCategoryStats))
+    db.execute(insert(user_category_stats).from_select(
+        ["user_id", "category", "solves"],
+        select(UserChallenge.user_id, Challenge.category, func.count())
+        .join(Challenge, Challenge.id == UserChallenge.challenge_id)
+        .where(solved)
+        .group_by(UserChallenge.user_id, Challenge.category),
+    ))
+    db.execute(insert(user_stats).from_select(
+        ["user_id", "solves", "hints_used", "wrong_attempts"],
+        select(User.id, literal_column("0"), literal_column("0"), literal_column("0"))
+        .where(~exists().where(UserStats.user_id == User.id)),
+    ))
+    db.execute(update(user_stats).values(
+        solves=select(func.count()).where(UserChallenge.user_id == user_stats.c.user_id, solved).scalar_subquery(),
+        last_solve_at=select(func.max(UserChallenge.completed_at))
+        .where(UserChallenge.user_id == user_stats.c.user_id, solved).scalar_subquery(),
+        hints_used=select(func.count()).where(HintPurchase.user_id == user_stats.c.user_id).scalar_subquery(),
+        wrong_attempts=select(func.count())
+        .where(FlagSubmission.user_id == user_stats.c.user_id, FlagSubmission.correct == False).scalar_subquery(),
+    ))
+    archived = ArchiveReader().wrong_attempts_by_user()
+    if archived:
+        db.execute(
+            update(user_stats).where(user_stats.c.user_id == bindparam("archived_user_id"))
+            .values(wrong_attempts=user_stats.c.wrong_attempts + bindparam("archived_count")),
+            [{"archived_user_id": user_id, "archived_count": count} for user_id, count in archived.items()],
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the user_stats aggregates")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    from backend.database import SessionLocal
+    db = SessionLocal()
+    try:
+        rebuild(db)
+        db.commit()
+        users = db.scalar(select(func.count()).select_from(UserStats))
+        print(f"Rebuilt stats for {users} users")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/catalogue_payload.py
+"""
+Payload benchmark for the challenge list endpoints.
+
+Seeds DATABASE_URL (a throwaway SQLite file by default) with a catalogue of
+--challenges challenges, each with a realistic content body, and compares how
+/challenges used to build its payload (full Challenge entities serialised
+through ChallengeOut) with the summary projection it uses now
+(crud.get_all_challenges -> ChallengeSummaryOut). Reports, as JSON:
+
+- db_bytes: bytes of column data fetched from the database (what crosses the wire)
+- query_ms / serialise_ms: median time to run the query / build the JSON body
+- response_bytes: size of the JSON body
+
+    python -m benchmarks.catalogue_payload --challenges 5000
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench_catalogue_payload.db")
+
+from sqlalchemy.orm import undefer
+
+from backend import crud
+from backend.base import Base
+from backend.catalogue import encode
+from backend.database import SessionLocal, engine
+from backend.models import Challenge, Level
+from backend.schemas import ChallengeOut, ChallengeSummaryOut
+from backend.serialization import serializer
+
+
+def seed(challenges: int, content_bytes: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        levels = [Level(name=f"Payload Level {i}", description="Benchmark", order=i) for i in range(10)]
+        db.add_all(levels)
+        db.flush()
+        body = ("<p>" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * (content_bytes // 57 + 1))[:content_bytes]
+        db.add_all(
+            Challenge(name=f"Payload Challenge {i}", description=f"Short description of challenge {i}.",
+                      content=body, difficulty="Medium", category="Benchmark", xp_reward=10,
+                      flag=f"FLAG{{payload_{i}}}", level_id=levels[i % len(levels)].id)
+            for i in range(challenges)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def value_bytes(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, str)):
+        return len(value.encode() if isinstance(value, str) else value)
+    return len(str(value))
+
+
+def before(db):
+    """Previous behaviour: load whole entities, let ChallengeOut drop the fields."""
+    rows = db.query(Challenge).options(undefer(Challenge.content)).all()
+    fetched = sum(value_bytes(getattr(row, column.key)) for row in rows for column in Challenge.__table__.columns)
+    return rows, fetched, ChallengeOut
+
+
+def after(db):
+    """Current behaviour: project the summary columns only."""
+    rows = crud.get_all_challenges(db)
+    fetched = sum(value_bytes(value) for row in rows for value in row)
+    return rows, fetched, ChallengeSummaryOut
+
+
+def measure(variant, repeats: int):
+    query_ms, serialise_ms = [], []
+    for _ in range(repeats):
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            rows, fetched, schema = variant(db)
+            query_ms.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            # The same serialisation path the catalogue cache uses
+            body = encode(rows, serializer(schema))
+            serialise_ms.append((time.perf_counter() - started) * 1000)
+        finally:
+            db.close()
+    return {
+        "rows": len(rows),
+        "db_bytes": fetched,
+        "response_bytes": len(body),
+        "query_ms": round(statistics.median(query_ms), 3),
+        "serialise_ms": round(statistics.median(serialise_ms), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-entity and summary challenge list payloads")
+    parser.add_argument("--challenges", type=int, default=5000)
+    parser.add_argument("--content-bytes", type=int, default=4000, help="Size of each challenge's content body")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--allow-reset", action="store_true",
+                        help="Allow dropping and recreating tables on a non-SQLite DATABASE_URL")
+    args = parser.parse_args()
+    if engine.dialect.name != "sqlite" and not args.allow_reset:
+        parser.error("this benchmark drops all tables; pass --allow-reset to run it against " + engine.dialect.name)
+
+    seed(args.challenges, args.content_bytes)
+    results = {"before": measure(before, args.repeats), "after": measure(after, args.repeats)}
+    print(json.dumps({"database": engine.dialect.name, "challenges": args.challenges,
+                      "content_bytes": args.content_bytes, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+# benchmarks/load.py
+"""
+Load and latency benchmark for the API in backend/main.py.
+
+Seeds DATABASE_URL (a throwaway SQLite file by default) with seed_levels.py,
+seed_challenges.py and a configurable number of extra users, levels and
+challenges, then drives one or more request mixes against the app and prints
+a JSON report with throughput, p50/p95/p99 latency, error counts and SQL
+queries per request for each endpoint. Diff the JSON between commits.
+
+By default requests go through the ASGI app in-process; pass --base-url to
+drive a running server instead (e.g. `uvicorn backend.main:app --workers 4`
+started against the same DATABASE_URL). Query counts are only available
+in-process.
+
+    python -m benchmarks.load --users 500 --scenario mixed --requests 5000 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench_load.db")
+os.environ.setdefault("ENABLE_INSTRUMENTATION", "true")
+# Every in-process request comes from one address; set RATE_LIMIT_ENABLED=true to measure the limiter too
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+
+from backend.base import Base
+from backend.database import SessionLocal, engine
+from backend.models import Challenge, Level, User
+from backend.security import hash_password
+
+BENCH_PASSWORD = "benchmark-password"
+
+# Query count reported by backend/instrumentation.py in the Server-Timing header
+QUERY_COUNT = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+# ----------------- Seeding -----------------
+
+def seed_database(users: int, levels: int, challenges_per_level: int):
+    """Recreate the schema, run the project seed scripts, then add synthetic data."""
+    import seed_levels
+    import seed_challenges
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    seed_levels.seed_levels()
+    seed_challenges.seed_challenges()
+
+    db = SessionLocal()
+    try:
+        next_order = max((level.order for level in db.query(Level)), default=0) + 1
+        new_levels = [Level(name=f"Bench Level {i}", description="Benchmark level", order=next_order + i)
+                      for i in range(levels)]
+        db.add_all(new_levels)
+        db.flush()
+        db.add_all(
+            Challenge(name=f"Bench Challenge {level.id}-{i}", description="Benchmark challenge",
+                      content="<p>" + "benchmark " * 200 + "</p>", difficulty="Medium", category="Benchmark",
+                      xp_reward=10 + i, flag=f"FLAG{{bench_{level.id}_{i}}}", level_id=level.id)
+            for level in new_levels for i in range(challenges_per_level)
+        )
+        # Every benchmark user shares one hash so seeding doesn't spend minutes in bcrypt
+        hashed = hash_password(BENCH_PASSWORD)
+        db.add_all(User(username=f"bench{i}", email=f"bench{i}@example.com", hashed_password=hashed, xp=0)
+                   for i in range(users))
+        db.commit()
+        users = [(row.id, row.email) for row in db.query(User.id, User.email).filter(User.username.like("bench%"))]
+        challenges = [(row.id, row.level_id, row.flag) for row in db.query(Challenge.id, Challenge.level_id, Challenge.flag)]
+        level_ids = [row.id for row in db.query(Level.id)]
+    finally:
+        db.close()
+    return {"users": users, "challenges": challenges, "level_ids": level_ids}
+
+
+# ----------------- Request mixes -----------------
+# Each mix is a list of (weight, builder); a builder returns (label, method, path, request kwargs).
+
+def _auth(ctx, rng):
+    user_id = rng.choice(list(ctx["tokens"]))
+    return user_id, {"Authorization": "Bearer " + ctx["tokens"][user_id]}
+
+
+def login(ctx, rng):
+    _, email = rng.choice(ctx["users"])
+    return "POST /auth/login", "POST", "/auth/login", {"data": {"username": email, "password": BENCH_PASSWORD}}
+
+
+def leaderboard(ctx, rng):
+    return "GET /users/leaderboard", "GET", "/users/leaderboard", {}
+
+
+def my_rank(ctx, rng):
+    _, headers = _auth(ctx, rng)
+    return "GET /users/leaderboard/me", "GET", "/users/leaderboard/me", {"headers": headers}
+
+
+def submit_flag(ctx, rng):
+    _, headers = _auth(ctx, rng)
+    challenge_id, _, flag = rng.choice(ctx["challenges"])
+    submitted = flag if rng.random() < ctx["correct_ratio"] else "FLAG{wrong_guess}"
+    return ("POST /challenges/{id}/submit_flag", "POST", f"/challenges/{challenge_id}/submit_flag",
+            {"headers": headers, "json": {"flag": submitted}})
+
+
+def challenge_status(ctx, rng):
+    _, headers = _auth(ctx, rng)
+    challenge_id, _, _ = rng.choice(ctx["challenges"])
+    return "GET /challenges/{id}/status", "GET", f"/challenges/{challenge_id}/status", {"headers": headers}
+
+
+def levels(ctx, rng):
+    return "GET /levels", "GET", "/levels", {}
+
+
+def level_challenges(ctx, rng):
+    level_id = rng.choice(ctx["level_ids"])
+    return "GET /levels/{id}/challenges", "GET", f"/levels/{level_id}/challenges", {}
+
+
+def challenges(ctx, rng):
+    return "GET /challenges", "GET", "/challenges", {}
+
+
+def challenge_detail(ctx, rng):
+    challenge_id, _, _ = rng.choice(ctx["challenges"])
+    return "GET /challenges/{id}", "GET", f"/challenges/{challenge_id}", {}
+
+
+def progress(ctx, rng):
+    _, headers = _auth(ctx, rng)
+    return "GET /users/progress", "GET", "/users/progress", {"headers": headers}
+
+
+SCENARIOS = {
+    "login_burst": [(1, login)],
+    "leaderboard_polling": [(8, leaderboard), (2, my_rank)],
+    "flag_storm": [(9, submit_flag), (1, challenge_status)],
+    "catalogue_browsing": [(2, levels), (3, level_challenges), (1, challenges), (3, challenge_detail), (1, progress)],
+    "mixed": [(1, login), (4, leaderboard), (1, my_rank), (4, submit_flag), (2, challenge_status),
+              (1, levels), (2, level_challenges), (1, challenges), (2, challenge_detail), (1, progress)],
+}
+
+
+# ----------------- Driver -----------------
+
+async def drive(client, mix, ctx, total, concurrency, seed):
+    """Issue `total` requests from `mix` using `concurrency` workers; return per-label samples."""
+    weights = [weight for weight, _ in mix]
+    builders = [builder for _, builder in mix]
+    samples = {}
+    remaining = [total]
+
+    async def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            label, method, path, kwargs = rng.choices(builders, weights)[0](ctx, rng)
+            started = time.perf_counter()
+            queries = None
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = response.status_code
+                match = QUERY_COUNT.search(response.headers.get("server-timing", ""))
+                queries = int(match.group(1)) if match else None
+            except httpx.HTTPError:
+                status = 0
+            stats = samples.setdefault(label, {"latencies": [], "statuses": {}, "queries": []})
+            stats["latencies"].append((time.perf_counter() - started) * 1000)
+            if queries is not None:
+                stats["queries"].append(queries)
+            stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def summarise(samples, elapsed):
+    endpoints = {}
+    for label, stats in sorted(samples.items()):
+        latencies = stats["latencies"]
+        # 4xx are expected outcomes here (wrong flags, already solved); only 5xx and transport failures count as errors
+        errors = sum(count for status, count in stats["statuses"].items() if status == 0 or status >= 500)
+        endpoints[label] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "statuses": {str(status): count for status, count in sorted(stats["statuses"].items())},
+            "throughput_rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "mean_ms": round(statistics.mean(latencies), 3),
+            "queries_per_request": (round(statistics.mean(stats["queries"]), 2) if stats["queries"] else None),
+            "max_queries": max(stats["queries"], default=None),
+        }
+    total = sum(len(stats["latencies"]) for stats in samples.values())
+    return {"requests": total, "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(total / elapsed, 1), "endpoints": endpoints}
+
+
+async def run(args, data):
+    from backend.main import app, create_access_token
+
+    ctx = {
+        "users": [(user_id, email) for user_id, email in data["users"]],
+        "challenges": data["challenges"],
+        "level_ids": data["level_ids"],
+        "correct_ratio": args.correct_ratio,
+        # Pre-issued tokens so only the login mix pays for bcrypt
+        "tokens": {user_id: create_access_token(data={"sub": email, "uid": user_id})
+                   for user_id, email in data["users"]},
+    }
+    scenarios = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    report = {}
+
+    async def run_scenarios(client):
+        for name in scenarios:
+            samples, elapsed = await drive(client, SCENARIOS[name], ctx, args.requests, args.concurrency, args.seed)
+            report[name] = summarise(samples, elapsed)
+
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+            await run_scenarios(client)
+        return report
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            await run_scenarios(client)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the competition API")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS) + ["all"], default="all")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--levels", type=int, default=5)
+    parser.add_argument("--challenges-per-level", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--correct-ratio", type=float, default=0.1, help="Share of flag submissions that are correct")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--base-url", help="Drive a running server instead of the in-process app")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the data already in DATABASE_URL")
+    parser.add_argument("--allow-reset", action="store_true",
+                        help="Allow dropping and recreating tables on a non-SQLite DATABASE_URL")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    if not args.skip_seed and engine.dialect.name != "sqlite" and not args.allow_reset:
+        parser.error("seeding drops all tables; pass --allow-reset to run it against " + engine.dialect.name)
+
+    if args.skip_seed:
+        db = SessionLocal()
+        try:
+            data = {
+                "users": [(row.id, row.email) for row in db.query(User.id, User.email).filter(User.username.like("bench%"))],
+                "challenges": [(row.id, row.level_id, row.flag) for row in db.query(Challenge.id, Challenge.level_id, Challenge.flag)],
+                "level_ids": [row.id for row in db.query(Level.id)],
+            }
+        finally:
+            db.close()
+    else:
+        data = seed_database(args.users, args.levels, args.challenges_per_level)
+
+    report = {
+        "database": engine.dialect.name,
+        "target": args.base_url or "in-process",
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "allow_reset")},
+        "scenarios": asyncio.run(run(args, data)),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/serialization.py
+"""
+Micro-benchmark for response serialisation (no database or HTTP involved).
+
+For each --sizes item count it times, as the median of --repeats runs:
+
+- schema payloads (ChallengeSummaryOut, ChallengeOut) from row objects:
+  "from_orm": one model per row, jsonable_encoder, json.dumps (the old catalogue path)
+  "serializer": backend.serialization.Serializer.encode_many (the current path)
+- plain payloads (leaderboard-style dicts), as handlers without a response_model return:
+  "json": json.dumps (JSONResponse)
+  "dumps": backend.serialization.dumps (FastJSONResponse; orjson when installed)
+
+    python -m benchmarks.serialization --sizes 1000 10000
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi.encoders import jsonable_encoder
+
+from backend.schemas import ChallengeOut, ChallengeSummaryOut
+from backend.serialization import dumps, orjson, serializer
+
+
+def challenge_rows(count: int):
+    created = datetime(2026, 1, 1, 12, 0, 0, 123456)
+    return [
+        SimpleNamespace(id=i, name=f"Challenge {i}", description=f"Short description of challenge {i}.",
+                        content="<p>" + "lorem ipsum " * 40 + "</p>", image_url=None, difficulty="Medium",
+                        category="Benchmark", xp_reward=10 + i % 50, level_id=1 + i % 10, created_at=created)
+        for i in range(count)
+    ]
+
+
+def leaderboard_rows(count: int):
+    return [{"rank": i + 1, "user_id": i + 1, "username": f"user{i}", "xp": 10_000 - i, "challenges_completed": i % 40}
+            for i in range(count)]
+
+
+def median_ms(function, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        body = function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 3), len(body)
+
+
+def schema_results(schema, rows, repeats: int):
+    compiled = serializer(schema)
+    old_ms, old_bytes = median_ms(
+        lambda: json.dumps(jsonable_encoder([schema.from_orm(row) for row in rows]), separators=(",", ":")).encode(),
+        repeats)
+    new_ms, new_bytes = median_ms(lambda: compiled.encode_many(rows), repeats)
+    return {"from_orm_ms": old_ms, "serializer_ms": new_ms, "speedup": round(old_ms / new_ms, 1),
+            "bytes": new_bytes, "same_size": old_bytes == new_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare response serialisation paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeats", type=int, default=7)
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        rows = challenge_rows(size)
+        plain = leaderboard_rows(size)
+        json_ms, _ = median_ms(lambda: json.dumps(plain, separators=(",", ":")).encode(), args.repeats)
+        dumps_ms, _ = median_ms(lambda: dumps(plain), args.repeats)
+        results[size] = {
+            "ChallengeSummaryOut": schema_results(ChallengeSummaryOut, rows, args.repeats),
+            "ChallengeOut": schema_results(ChallengeOut, rows, args.repeats),
+            "plain": {"json_ms": json_ms, "dumps_ms": dumps_ms, "speedup": round(json_ms / dumps_ms, 1)},
+        }
+    print(json.dumps({"orjson": orjson is not None, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
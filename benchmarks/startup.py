@@ -0,0 +1,103 @@
+# benchmarks/startup.py
+"""
+Cold-start benchmark for the API in backend/main.py.
+
+Seeds DATABASE_URL (a throwaway SQLite file by default) once, then starts
+--runs fresh interpreters. Each one imports backend.main, runs the app's
+startup (lifespan), and times the first request. Reports medians, as JSON:
+
+- import_ms: time to import backend.main
+- import_connections: database connections opened by the import (should be 0)
+- startup_ms: time for the lifespan startup (schema step + in-memory indexes)
+- first_request_ms: time for the first GET /challenges after startup
+
+Set DB_STARTUP_SCHEMA=migrate or create_all to include the schema step.
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench_startup.db")
+
+# Runs in each child interpreter; prints one JSON line
+CHILD = """
+import asyncio, json, time
+started = time.perf_counter()
+import backend.main
+from backend.database import engine
+import_ms = (time.perf_counter() - started) * 1000
+import_connections = engine.pool.checkedin() + engine.pool.checkedout()
+
+import httpx
+
+async def run():
+    app = backend.main.app
+    started = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        startup_ms = (time.perf_counter() - started) * 1000
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            started = time.perf_counter()
+            response = await client.get("/challenges")
+            first_request_ms = (time.perf_counter() - started) * 1000
+            response.raise_for_status()
+    return startup_ms, first_request_ms
+
+startup_ms, first_request_ms = asyncio.run(run())
+print(json.dumps({"import_ms": import_ms, "import_connections": import_connections,
+                  "startup_ms": startup_ms, "first_request_ms": first_request_ms}))
+"""
+
+
+def seed(challenges: int):
+    from backend.base import Base
+    from backend.database import SessionLocal, engine, init_db
+    from backend.models import Challenge, Level
+
+    Base.metadata.drop_all(bind=engine)
+    init_db()
+    db = SessionLocal()
+    try:
+        level = Level(name="Startup Level", description="Benchmark", order=1)
+        db.add(level)
+        db.flush()
+        db.add_all(Challenge(name=f"Startup Challenge {i}", description="Benchmark challenge", difficulty="Easy",
+                             category="Benchmark", xp_reward=10, flag=f"FLAG{{startup_{i}}}", level_id=level.id)
+                   for i in range(challenges))
+        db.commit()
+    finally:
+        db.close()
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import, startup and first-request latency")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--challenges", type=int, default=200)
+    parser.add_argument("--allow-reset", action="store_true",
+                        help="Allow dropping and recreating tables on a non-SQLite DATABASE_URL")
+    args = parser.parse_args()
+    if not os.environ["DATABASE_URL"].startswith("sqlite") and not args.allow_reset:
+        parser.error("this benchmark drops all tables; pass --allow-reset to run it against a non-SQLite database")
+
+    seed(args.challenges)
+    samples = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, "-W", "ignore", "-c", CHILD], check=True,
+                                capture_output=True, text=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps({
+        "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+        "startup_schema": os.getenv("DB_STARTUP_SCHEMA", "none"),
+        "runs": args.runs,
+        "results": {key: round(statistics.median(sample[key] for sample in samples), 3) for key in samples[0]},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# benchmarks/submit_flag.py
+"""
+Latency benchmark for crud.submit_flag.
+
+Seeds users and challenges into DATABASE_URL (a throwaway SQLite file by default),
+then replays a mix of wrong and correct submissions through the current
+`submit_flag` and through the previous multi-commit implementation, reporting
+p50/p99 latency and SQL round trips per call as JSON.
+
+    python -m benchmarks.submit_flag --users 200 --challenges 20 --wrong-ratio 0.8
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import threading
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench_submit_flag.db")
+
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from backend import crud
+from backend.audit import audit_writer
+from backend.flags import flag_index
+from backend.progress import progress_index
+from backend.base import Base
+from backend.database import SessionLocal, engine
+from backend.models import Challenge, FlagSubmission, Level, User, UserChallenge
+
+
+def legacy_submit_flag(db, user_id, challenge_id, submitted_flag):
+    """The submit_flag implementation before the single-transaction rewrite, kept for comparison."""
+    challenge = db.query(Challenge).filter(Challenge.id == challenge_id).first()
+    user = db.query(User).filter(User.id == user_id).first()
+    if not challenge or not user:
+        raise HTTPException(status_code=404, detail="Challenge or user not found")
+    if db.query(UserChallenge).filter_by(user_id=user_id, challenge_id=challenge_id, success=True).first() is not None:
+        raise HTTPException(status_code=400, detail="Challenge already completed")
+    if submitted_flag.strip() != challenge.flag.strip():
+        fs = FlagSubmission(user_id=user_id, challenge_id=challenge_id, flag=submitted_flag, correct=False)
+        db.add(fs)
+        db.commit()
+        db.refresh(fs)
+        raise HTTPException(status_code=400, detail="Incorrect flag")
+    user.xp += challenge.xp_reward
+    db.commit()
+    db.refresh(user)
+    db.add(UserChallenge(user_id=user_id, challenge_id=challenge_id, success=True))
+    db.add(FlagSubmission(user_id=user_id, challenge_id=challenge_id, flag=submitted_flag, correct=True))
+    db.commit()
+    db.refresh(user)
+    return {"msg": "Challenge completed!", "xp_earned": challenge.xp_reward}
+
+
+IMPLEMENTATIONS = {
+    "current": crud.submit_flag,
+    "legacy": legacy_submit_flag,
+}
+
+
+def reset_database(users: int, challenges: int):
+    """Recreate the schema and seed benchmark users, one level and its challenges."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        level = Level(name="Benchmark Level", description="Benchmark", order=1)
+        db.add(level)
+        db.flush()
+        db.add_all(
+            User(username=f"bench{i}", email=f"bench{i}@example.com", hashed_password="x", xp=0)
+            for i in range(users)
+        )
+        db.add_all(
+            Challenge(name=f"Bench Challenge {i}", description="Benchmark challenge", content="x" * 2000,
+                      difficulty="Easy", category="Benchmark", xp_reward=10, flag=f"FLAG{{bench_{i}}}",
+                      level_id=level.id)
+            for i in range(challenges)
+        )
+        db.commit()
+        user_ids = [row.id for row in db.query(User.id)]
+        flags = {row.id: row.flag for row in db.query(Challenge.id, Challenge.flag)}
+        # The in-memory indexes must describe the fresh tables, as they would after a restart
+        flag_index.load(db)
+        for user_id in user_ids:
+            progress_index.forget(user_id)
+    finally:
+        db.close()
+    return user_ids, flags
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run(implementation, users, challenges, submissions, wrong_ratio, seed):
+    """Replay a deterministic submission workload and return latency/round-trip stats."""
+    user_ids, flags = reset_database(users, challenges)
+    challenge_ids = sorted(flags)
+    rng = random.Random(seed)
+    statements = {"count": 0}
+    caller = threading.get_ident()
+
+    def count_statement(*args):
+        # Only the caller's round trips; batched audit inserts run on the writer thread
+        if threading.get_ident() == caller:
+            statements["count"] += 1
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    latencies, round_trips = [], []
+    submit = IMPLEMENTATIONS[implementation]
+    db = SessionLocal()
+    try:
+        for _ in range(submissions):
+            user_id = rng.choice(user_ids)
+            challenge_id = rng.choice(challenge_ids)
+            flag = "FLAG{wrong}" if rng.random() < wrong_ratio else flags[challenge_id]
+            before = statements["count"]
+            started = time.perf_counter()
+            try:
+                submit(db, user_id, challenge_id, flag)
+            except HTTPException:
+                pass
+            latencies.append((time.perf_counter() - started) * 1000)
+            round_trips.append(statements["count"] - before)
+        flush_started = time.perf_counter()
+        audit_writer.flush()
+        audit_flush_ms = (time.perf_counter() - flush_started) * 1000
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    return {
+        "implementation": implementation,
+        "submissions": submissions,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "mean_statements": round(statistics.mean(round_trips), 2),
+        "audit_flush_ms": round(audit_flush_ms, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crud.submit_flag latency")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--challenges", type=int, default=20)
+    parser.add_argument("--submissions", type=int, default=2000)
+    parser.add_argument("--wrong-ratio", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", choices=sorted(IMPLEMENTATIONS), help="Benchmark a single implementation")
+    parser.add_argument("--allow-reset", action="store_true",
+                        help="Allow dropping and recreating tables on a non-SQLite DATABASE_URL")
+    args = parser.parse_args()
+
+    if engine.url.get_backend_name() != "sqlite" and not args.allow_reset:
+        parser.error("this benchmark drops all tables; pass --allow-reset to run it against " + engine.url.get_backend_name())
+
+    names = [args.only] if args.only else ["legacy", "current"]
+    results = [run(name, args.users, args.challenges, args.submissions, args.wrong_ratio, args.seed) for name in names]
+    print(json.dumps({"database": engine.url.render_as_string(hide_password=True), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+# import_catalogue.py
+"""
+Bulk import of levels and challenges from a manifest.
+
+    python import_catalogue.py catalogue.yaml            # apply
+    python import_catalogue.py catalogue.json --dry-run  # print the diff only
+
+YAML and JSON manifests list levels with their challenges nested under them:
+
+    levels:
+      - name: Digital Detective
+        description: ...
+        order: 1
+        challenges:
+          - name: The Hidden Message
+            description: ...
+            difficulty: Easy
+            category: Steganography
+            xp_reward: 100
+            flag: "FLAG{...}"
+            hints:
+              - {tier: 1, body: Look closer at the pixels, cost: 5}
+
+A top-level "challenges" list is also accepted, each entry naming its level
+with "level". CSV manifests have one challenge per row, the challenge fields
+as columns plus "level" and, for levels that do not exist yet, "level_order"
+and "level_description". CSV manifests cannot carry hints.
+
+Every challenge is validated with ChallengeCreate before anything is written.
+Levels and challenges are matched by name and a challenge's hints by tier: new
+ones are inserted, changed ones updated and identical ones left alone, so
+re-running a manifest is a no-op. Nothing is deleted, so hint tiers missing
+from the manifest are kept (they may have been bought). Levels may swap
+orders; the moved levels pass through temporary negative orders so the unique
+constraint holds after every statement. All writes happen in batched
+statements inside a single transaction.
+
+After the commit the import invalidates the catalogue caches and flag index
+entries of running servers over the event bus, as the admin endpoints do.
+"""
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select, update
+
+from backend.database import SessionLocal, init_db
+from backend.flags import parse_rules
+from backend.models import Challenge, Hint, Level
+from backend.schemas import ChallengeCreate
+
+LEVEL_FIELDS = ("name", "description", "order")
+CHALLENGE_FIELDS = ("name", "description", "content", "image_url", "difficulty", "category",
+                    "xp_reward", "flag", "flag_rules", "level_id")
+HINT_FIELDS = ("body", "cost")
+# Never printed in the diff
+SECRET_FIELDS = {"flag"}
+
+
+class ManifestError(Exception):
+    """The manifest cannot be imported; the message lists every problem found."""
+
+
+# ----------------- Reading manifests -----------------
+
+def read_manifest(path: Path):
+    """Return (levels, challenges) as plain dicts; challenges name their level with "level"."""
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        return read_csv(path)
+    if suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ManifestError("YAML manifests need PyYAML (pip install pyyaml)")
+        document = yaml.safe_load(path.read_text())
+    elif suffix == ".json":
+        document = json.loads(path.read_text())
+    else:
+        raise ManifestError(f"Unsupported manifest type {suffix!r}; use .yaml, .json or .csv")
+    if not isinstance(document, dict):
+        raise ManifestError("The manifest must be a mapping with 'levels' and/or 'challenges'")
+
+    levels, challenges = [], []
+    for level in document.get("levels") or []:
+        level = dict(level)
+        for challenge in level.pop("challenges", None) or []:
+            challenges.append({**challenge, "level": level.get("name")})
+        levels.append(level)
+    challenges.extend(document.get("challenges") or [])
+    return levels, challenges
+
+
+def read_csv(path: Path):
+    levels, challenges = {}, []
+    with path.open(newline="") as handle:
+        for row in csv.DictReader(handle):
+            row = {key: value for key, value in row.items() if value not in ("", None)}
+            order = row.pop("level_order", None)
+            description = row.pop("level_description", None)
+            if order is not None and row.get("level") not in levels:
+                levels[row.get("level")] = {"name": row.get("level"), "order": order, "description": description}
+            challenges.append(row)
+    return list(levels.values()), challenges
+
+
+# ----------------- Planning -----------------
+
+def validate_levels(levels, errors):
+    valid = {}
+    for position, level in enumerate(levels, 1):
+        try:
+            row = {"name": str(level["name"]), "description": level.get("description"), "order": int(level["order"])}
+        except (KeyError, TypeError, ValueError):
+            errors.append(f"level #{position}: needs a name and an integer order")
+            continue
+        if row["name"] in valid:
+            errors.append(f"level {row['name']!r}: listed twice")
+        elif any(other["order"] == row["order"] for other in valid.values()):
+            errors.append(f"level {row['name']!r}: order {row['order']} listed twice")
+        valid[row["name"]] = row
+    return valid
+
+
+def validate_challenges(challenges, errors):
+    """ChallengeCreate-validated rows keyed by name; level_id is resolved later from the "level" name."""
+    valid = {}
+    for position, challenge in enumerate(challenges, 1):
+        label = f"challenge {challenge.get('name')!r}" if challenge.get("name") else f"challenge #{position}"
+        fields = {key: value for key, value in challenge.items() if key != "level"}
+        try:
+            # The level is resolved by name once levels are upserted; 0 stands in for validation
+            row = ChallengeCreate(**{**fields, "level_id": 0}).model_dump()
+            parse_rules(row["flag_rules"])
+            check_hints(row["hints"])
+        except ValidationError as exc:
+            errors.extend(f"{label}: {'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors())
+            continue
+        except ValueError as exc:
+            errors.append(f"{label}: {exc}")
+            continue
+        if challenge.get("level") is None:
+            errors.append(f"{label}: no level given")
+            continue
+        if row["name"] in valid:
+            errors.append(f"{label}: listed twice")
+        row["level"] = str(challenge["level"])
+        valid[row["name"]] = row
+    return valid
+
+
+def check_hints(hints):
+    """The rules crud.create_challenge applies: distinct positive tiers, no negative costs."""
+    tiers = [hint["tier"] for hint in hints or []]
+    if len(set(tiers)) != len(tiers) or any(tier < 1 for tier in tiers):
+        raise ValueError("hint tiers must be distinct positive numbers")
+    if any(hint["cost"] < 0 for hint in hints or []):
+        raise ValueError("hint costs cannot be negative")
+
+
+def check_level_orders(levels, existing_levels, errors):
+    """Levels left out of the manifest keep their order; nothing may end up sharing one."""
+    final = {name: level["order"] for name, level in existing_levels.items()}
+    final.update((name, level["order"]) for name, level in levels.items())
+    for name, level in existing_levels.items():
+        if name not in levels and list(final.values()).count(level["order"]) > 1:
+            errors.append(f"level order {level['order']} is held by {name!r}, which is not in the manifest")
+
+
+def changed_fields(existing: dict, wanted: dict, fields):
+    return [field for field in fields if existing.get(field) != wanted.get(field)]
+
+
+def plan(db, levels, challenges):
+    """
+    Compare the manifest with the database. Returns a dict of level, challenge
+    and hint inserts and updates (updates carry the row id and the changed field
+    names). Raises ManifestError listing every invalid row.
+    """
+    errors = []
+    levels = validate_levels(levels, errors)
+    challenges = validate_challenges(challenges, errors)
+
+    existing_levels = {row.name: row._asdict() for row in db.execute(select(Level.id, Level.name, Level.description, Level.order))}
+    for challenge in challenges.values():
+        if challenge["level"] not in levels and challenge["level"] not in existing_levels:
+            errors.append(f"challenge {challenge['name']!r}: unknown level {challenge['level']!r}")
+    check_level_orders(levels, existing_levels, errors)
+    if errors:
+        raise ManifestError("\n".join(errors))
+
+    result = {"level_inserts": [], "level_updates": [], "challenge_inserts": [], "challenge_updates": [],
+              "hint_inserts": [], "hint_updates": [], "unchanged": 0}
+    for name, level in levels.items():
+        current = existing_levels.get(name)
+        if current is None:
+            result["level_inserts"].append(level)
+        elif changed := changed_fields(current, level, LEVEL_FIELDS):
+            result["level_updates"].append(({**level, "id": current["id"]}, changed))
+        else:
+            result["unchanged"] += 1
+
+    # One query for every existing challenge the manifest mentions (content included: it is compared)
+    names = list(challenges)
+    existing_challenges = {}
+    for start in range(0, len(names), 500):
+        rows = db.execute(select(Challenge.id, *(getattr(Challenge, field) for field in CHALLENGE_FIELDS))
+                          .where(Challenge.name.in_(names[start:start + 500])))
+        existing_challenges.update((row.name, row._asdict()) for row in rows)
+    level_ids = {name: level["id"] for name, level in existing_levels.items()}
+    for name, challenge in challenges.items():
+        current = existing_challenges.get(name)
+        # Challenges of levels being inserted cannot match an existing level id; compare the rest
+        wanted = {**challenge, "level_id": level_ids.get(challenge["level"])}
+        if current is None:
+            result["challenge_inserts"].append(wanted)
+        elif changed := changed_fields(current, wanted, CHALLENGE_FIELDS):
+            result["challenge_updates"].append(({**wanted, "id": current["id"]}, changed))
+        else:
+            result["unchanged"] += 1
+
+    # Hints are only compared for challenges that list them
+    hinted = [existing_challenges[name]["id"] for name, challenge in challenges.items()
+              if challenge["hints"] is not None and name in existing_challenges]
+    existing_hints = {}
+    for start in range(0, len(hinted), 500):
+        rows = db.execute(select(Hint.id, Hint.challenge_id, Hint.tier, *(getattr(Hint, field) for field in HINT_FIELDS))
+                          .where(Hint.challenge_id.in_(hinted[start:start + 500])))
+        existing_hints.update(((row.challenge_id, row.tier), row._asdict()) for row in rows)
+    for name, challenge in challenges.items():
+        challenge_id = existing_challenges.get(name, {}).get("id")
+        for hint in challenge["hints"] or []:
+            wanted = {**hint, "challenge": name}
+            current = existing_hints.get((challenge_id, hint["tier"]))
+            if current is None:
+                result["hint_inserts"].append(wanted)
+            elif changed := changed_fields(current, wanted, HINT_FIELDS):
+                result["hint_updates"].append(({**wanted, "id": current["id"]}, changed))
+    return result
+
+
+# ----------------- Applying -----------------
+
+def batches(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def apply(db, changes, batch_size: int):
+    """Write a plan in batched statements; the caller commits. Returns the ids of the challenges written."""
+    # Levels changing order first move below every current order, so a swap never collides mid-batch
+    moved = [row for row, fields in changes["level_updates"] if "order" in fields]
+    if moved:
+        lowest = min(db.scalar(select(func.min(Level.order))), 0)
+        for rows in batches([{"id": row["id"], "order": lowest - position} for position, row in enumerate(moved, 1)],
+                            batch_size):
+            db.execute(update(Level), rows)
+    for rows in batches([row for row, _ in changes["level_updates"]], batch_size):
+        db.execute(update(Level), rows)
+    # Inserted levels may take an order an updated level has just left
+    for rows in batches(changes["level_inserts"], batch_size):
+        db.execute(insert(Level), rows)
+
+    level_ids = dict(db.execute(select(Level.name, Level.id)).all())
+    def columns(row):
+        return {**{field: row[field] for field in CHALLENGE_FIELDS}, "level_id": level_ids[row["level"]]}
+    for rows in batches(changes["challenge_inserts"], batch_size):
+        db.execute(insert(Challenge), [columns(row) for row in rows])
+    for rows in batches([row for row, _ in changes["challenge_updates"]], batch_size):
+        db.execute(update(Challenge), [{**columns(row), "id": row["id"]} for row in rows])
+
+    names = sorted({row["name"] for row in changes["challenge_inserts"]}
+                   | {row["name"] for row, _ in changes["challenge_updates"]}
+                   | {row["challenge"] for row in changes["hint_inserts"]}
+                   | {row["challenge"] for row, _ in changes["hint_updates"]})
+    challenge_ids = {}
+    for start in range(0, len(names), 500):
+        challenge_ids.update(db.execute(select(Challenge.name, Challenge.id)
+                                        .where(Challenge.name.in_(names[start:start + 500]))).all())
+    for rows in batches(changes["hint_inserts"], batch_size):
+        db.execute(insert(Hint), [{"challenge_id": challenge_ids[row["challenge"]], "tier": row["tier"],
+                                   **{field: row[field] for field in HINT_FIELDS}} for row in rows])
+    for rows in batches([row for row, _ in changes["hint_updates"]], batch_size):
+        db.execute(update(Hint), [{"id": row["id"], **{field: row[field] for field in HINT_FIELDS}} for row in rows])
+    return list(challenge_ids.values())
+
+
+def print_diff(changes, verbose: bool):
+    if verbose:
+        for level in changes["level_inserts"]:
+            print(f"+ level {level['name']!r}")
+        for level, fields in changes["level_updates"]:
+            print(f"~ level {level['name']!r}: {', '.join(fields)}")
+        for challenge in changes["challenge_inserts"]:
+            print(f"+ challenge {challenge['name']!r} ({challenge['level']})")
+        for challenge, fields in changes["challenge_updates"]:
+            shown = [field if field not in SECRET_FIELDS else f"{field} (hidden)" for field in fields]
+            print(f"~ challenge {challenge['name']!r}: {', '.join(shown)}")
+        for hint in changes["hint_inserts"]:
+            print(f"+ hint {hint['challenge']!r} tier {hint['tier']}")
+        for hint, fields in changes["hint_updates"]:
+            print(f"~ hint {hint['challenge']!r} tier {hint['tier']}: {', '.join(fields)}")
+    print(f"levels: {len(changes['level_inserts'])} new, {len(changes['level_updates'])} changed; "
+          f"challenges: {len(changes['challenge_inserts'])} new, {len(changes['challenge_updates'])} changed; "
+          f"hints: {len(changes['hint_inserts'])} new, {len(changes['hint_updates'])} changed; "
+          f"{changes['unchanged']} unchanged")
+
+
+def import_catalogue(path: Path, dry_run: bool = False, batch_size: int = 1000, verbose: bool = True):
+    levels, challenges = read_manifest(path)
+    db = SessionLocal()
+    try:
+        changes = plan(db, levels, challenges)
+        print_diff(changes, verbose)
+        if dry_run:
+            print("dry run: nothing written")
+            return changes
+        challenge_ids = apply(db, changes, batch_size)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    levels_changed = bool(changes["level_inserts"] or changes["level_updates"])
+    if challenge_ids or levels_changed:
+        # Running workers cache the catalogue and flags in memory: tell them what changed
+        from backend.bus import event_bus
+        from backend.crud import _after_catalogue_import
+        event_bus.start()
+        _after_catalogue_import(challenge_ids, levels_changed)
+        event_bus.close()
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import levels and challenges from a YAML, JSON or CSV manifest")
+    parser.add_argument("manifest", type=Path)
+    parser.add_argument("--dry-run", action="store_true", help="Show what would change without writing")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per INSERT/UPDATE statement")
+    parser.add_argument("--quiet", action="store_true", help="Print only the summary line")
+    parser.add_argument("--create-tables", action="store_true", help="Create missing tables first (development)")
+    args = parser.parse_args()
+    if args.create_tables:
+        init_db()
+    try:
+        import_catalogue(args.manifest, args.dry_run, args.batch_size, verbose=not args.quiet)
+    except ManifestError as exc:
+        print(f"{args.manifest}: nothing imported\n{exc}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from backend.database import SessionLocal
+from backend.database import SessionLocal, init_db
 from backend.crud import create_challenge, generate_flag
 from backend.schemas import ChallengeCreate
 from backend.models import Level  # Make sure this import is present
@@ -42,4 +42,5 @@ def seed_challenges():
     db.close()
 
 if __name__ == "__main__":
+    init_db()  # Create any missing tables; a no-op on a migrated database
     seed_challenges()
\ No newline at end of file
@@ -1,5 +1,5 @@
 # backend/seed_levels.py
-from backend.database import SessionLocal
+from backend.database import SessionLocal, init_db
 from backend.models import Level, Challenge
 
 def seed_levels():
@@ -56,10 +56,10 @@ def seed_levels():
             if not existing_challenge:
                 challenge = Challenge(**challenge_data)
                 db.add(challenge)
-                db.commit()
                 print(f"  Seeded Challenge: {challenge.name} in Level {level1.name}")
             else:
                 print(f"  Challenge '{challenge_data['name']}' already exists.")
+        db.commit()  # One commit for the whole level
 
     else:
         print(f"Level '{level_data['name']}' already exists.")
@@ -67,4 +67,5 @@ def seed_levels():
     db.close()
 
 if __name__ == "__main__":
+    init_db()  # Create any missing tables; a no-op on a migrated database
     seed_levels()
\ No newline at end of file
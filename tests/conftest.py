@@ -0,0 +1,94 @@
+# tests/conftest.py
+"""
+Shared fixtures. Settings are read when backend modules are imported, so the
+environment is set here first: a throwaway SQLite database (or
+TEST_DATABASE_URL), dynamic scoring that decays within a few solves, fast
+bcrypt, and strict query budgets so a route that issues more statements than
+it declares fails with a 500.
+"""
+import os
+import tempfile
+
+_DIRECTORY = tempfile.mkdtemp(prefix="compsci-tests-")
+os.environ.update({
+    "DATABASE_URL": os.getenv("TEST_DATABASE_URL", f"sqlite:///{_DIRECTORY}/primary.db"),
+    "DB_STARTUP_SCHEMA": "none",
+    "SCORING_MODE": "dynamic",
+    "SCORING_DECAY_SOLVES": "3",
+    "BCRYPT_ROUNDS": "4",
+    "ENABLE_INSTRUMENTATION": "true",
+    "QUERY_BUDGET_STRICT": "true",
+    "EVENT_BUS_BACKEND": "none",
+    "RATE_LIMIT_BACKEND": "memory",
+})
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import crud
+from backend.audit import audit_writer
+from backend.base import Base
+from backend.database import SessionLocal, engine, recent_writes
+from backend.main import app, resync_in_memory_state
+from backend.models import Level
+from backend.ratelimit import MemoryBackend, flag_rate_limiter
+from backend.schemas import ChallengeCreate, HintCreate, UserCreate
+
+TEST_DIRECTORY = _DIRECTORY
+
+
+def reset_state():
+    """Empty every table and drop what the workers keep in memory."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    resync_in_memory_state()
+    recent_writes.__init__(recent_writes.window)
+    flag_rate_limiter.backend = MemoryBackend()
+
+
+@pytest.fixture
+def db():
+    """A session on a freshly emptied database, with the in-memory indexes loaded from it."""
+    reset_state()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        audit_writer.shutdown()
+
+
+@pytest.fixture
+def client():
+    """A TestClient (startup and shutdown included) on a freshly emptied database."""
+    reset_state()
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def make_level(db, name="Level 1", order=1):
+    level = Level(name=name, description="Test level", order=order)
+    db.add(level)
+    db.commit()
+    return level.id
+
+
+def make_challenge(db, level_id, name, xp_reward, hints=()):
+    """A challenge whose flag is FLAG{<name>}; `hints` are (tier, cost) pairs."""
+    challenge = ChallengeCreate(
+        name=name, description="Test challenge", content="Body", difficulty="Easy", category="Test",
+        xp_reward=xp_reward, flag=f"FLAG{{{name}}}", level_id=level_id,
+        hints=[HintCreate(tier=tier, body=f"Hint {tier}", cost=cost) for tier, cost in hints] or None,
+    )
+    return crud.create_challenge(db, challenge, challenge.flag).id
+
+
+def make_user(db, name):
+    return crud.create_user(db, UserCreate(username=name, email=f"{name}@example.com", password="pw"), "x").id
+
+
+def register(client, name):
+    """Register a user through the API and return their Authorization header."""
+    response = client.post("/auth/register", json={"username": name, "email": f"{name}@example.com", "password": "pw"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
@@ -0,0 +1,101 @@
+# tests/test_query_budgets.py
+"""
+Query budgets under QUERY_BUDGET_STRICT (set in conftest.py): every budgeted
+route is called on its most expensive path, and a request over its budget
+fails with a 500, so an N+1 fails the suite.
+"""
+import re
+
+from passlib.hash import bcrypt
+from sqlalchemy import update
+
+from backend.database import SessionLocal
+from backend.main import app
+from backend.models import User
+from tests.conftest import make_challenge, make_level, register
+
+
+def queries(response):
+    """The statement count the instrumentation middleware reports in Server-Timing."""
+    return int(re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response.headers["server-timing"]).group(1))
+
+
+def budgeted_routes(routes=None):
+    """(method, path) -> budget of every route declaring one, the included routers' too."""
+    budgets = {}
+    for route in app.routes if routes is None else routes:
+        included = getattr(route, "original_router", None)  # How recent FastAPI versions keep include_router's routes
+        if included is not None:
+            budgets.update(budgeted_routes(included.routes))
+        elif hasattr(getattr(route, "endpoint", None), "query_budget"):
+            budgets.update({(method, route.path): route.endpoint.query_budget for method in route.methods})
+    return budgets
+
+
+def test_every_budgeted_route_stays_within_budget(client):
+    with SessionLocal() as db:
+        level_id = make_level(db)
+        challenge_id = make_challenge(db, level_id, "budget", 100, hints=[(1, 5), (2, 10)])
+    called = {}
+
+    def call(method, route, expected=200, headers=None, **kwargs):
+        path = route.format(level_id=level_id, challenge_id=challenge_id)
+        response = client.request(method, path, headers=headers, **kwargs)
+        assert response.status_code == expected, f"{method} {path}: {response.text}"
+        called[(method, route)] = max(called.get((method, route), 0), queries(response))
+        return response
+
+    players = []
+    for i in range(3):
+        call("POST", "/auth/register", json={"username": f"budget{i}", "email": f"budget{i}@example.com",
+                                             "password": "pw"})
+        players.append(register(client, f"player{i}"))
+    first, second, last = players
+
+    # A hash made with another bcrypt cost is upgraded on login, the route's second statement
+    with SessionLocal() as db:
+        db.execute(update(User).where(User.email == "budget0@example.com")
+                   .values(hashed_password=bcrypt.using(rounds=5).hash("pw")))
+        db.commit()
+    call("POST", "/auth/login", data={"username": "budget0@example.com", "password": "pw"})
+    call("POST", "/auth/login", data={"username": "budget0@example.com", "password": "pw"})
+
+    call("POST", "/challenges/create", json={
+        "name": "created", "description": "New", "content": "Body", "difficulty": "Easy", "category": "Test",
+        "xp_reward": 10, "flag": "FLAG{created}", "level_id": level_id,
+        "hints": [{"tier": 1, "body": "Hint", "cost": 1}],
+    })
+    for route in ("/challenges", "/challenges/{challenge_id}", "/levels", "/levels/{level_id}",
+                  "/levels/{level_id}/challenges"):
+        call("GET", route)
+
+    # Every solve counts the challenge; the third decays it, re-valuing the first two solvers
+    for headers in players:
+        call("POST", "/challenges/{challenge_id}/submit_flag", headers=headers, json={"flag": "FLAG{budget}"})
+    call("POST", "/challenges/{challenge_id}/submit_flag", expected=400, headers=first, json={"flag": "FLAG{budget}"})
+    call("POST", "/challenges/{challenge_id}/hint", headers=last)
+    call("POST", "/challenges/{challenge_id}/hint", headers=last, params={"tier": 1})
+    call("GET", "/challenges/{challenge_id}/hints", headers=last)
+    call("GET", "/challenges/scores")
+
+    call("POST", "/users/update_xp", headers=second, params={"amount": 5})
+    for route in ("/users/profile", "/users/stats", "/users/leaderboard", "/users/leaderboard/me",
+                  "/users/leaderboard/around", "/users/progress", "/challenges/{challenge_id}/status"):
+        call("GET", route, headers=second)
+    call("GET", "/users/completed_challenges", headers=second, params={"level_id": level_id})
+
+    budgets = budgeted_routes()
+    assert set(called) == set(budgets)
+    # The costliest paths were the ones exercised: a solve that re-values earlier solvers,
+    # a paid hint and a login that upgrades the password hash each use their whole budget
+    for route in ("/challenges/{challenge_id}/submit_flag", "/challenges/{challenge_id}/hint", "/auth/login"):
+        assert called[("POST", route)] == budgets[("POST", route)], route
+
+
+def test_over_budget_request_fails(client, monkeypatch):
+    headers = register(client, "strict")
+    endpoint = next(route.endpoint for route in app.routes if getattr(route, "path", None) == "/users/stats")
+    monkeypatch.setattr(endpoint, "query_budget", 0)
+    response = client.get("/users/stats", headers=headers)
+    assert response.status_code == 500
+    assert response.json()["detail"].startswith("Query budget exceeded: GET /users/stats")
@@ -0,0 +1,162 @@
+# tests/test_query_plans.py
+"""
+Query-plan regression check for backend/crud.py.
+
+Calls every public function in crud.py against a small seeded database,
+captures the SELECT, UPDATE and DELETE statements each one issues, and
+EXPLAINs them. The test fails if a statement scans a table without an index,
+unless the function is expected to read the whole table (e.g.
+get_all_challenges), or if get_top_users needs a sort step instead of walking
+ix_users_xp_desc_id.
+
+Works on SQLite (EXPLAIN QUERY PLAN) and Postgres (EXPLAIN with enable_seqscan
+off, so a sequential scan in the plan means no usable index exists); point
+TEST_DATABASE_URL at a scratch Postgres database to check its plans.
+"""
+import inspect
+
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from backend import crud
+from backend.database import engine
+from backend.models import Challenge, Level, User, UserChallenge
+from backend.schemas import ChallengeCreate, HintCreate, UserCreate
+
+# Tables a function is allowed to read in full, because it returns the whole table
+FULL_SCAN_ALLOWED = {
+    "get_all_challenges": {"challenges"},
+    "get_all_levels": {"levels"},
+    "get_challenge_scores": {"challenge_scores"},
+}
+# Functions whose ORDER BY must be served by an index rather than a sort
+NO_SORT = {"get_top_users"}
+# Public functions in crud.py that never touch the database
+NO_QUERIES = {"generate_flag"}
+EXPLAINED = ("SELECT", "UPDATE", "DELETE")
+
+
+def seed(db):
+    level = Level(name="Plan Level", description="Plan", order=1)
+    db.add(level)
+    db.flush()
+    db.add_all(User(username=f"plan{i}", email=f"plan{i}@example.com", hashed_password="x", xp=i) for i in range(50))
+    db.add_all(
+        Challenge(name=f"Plan Challenge {i}", description="Plan", difficulty="Easy", category="Plan",
+                  xp_reward=10, flag=f"FLAG{{plan_{i}}}", level_id=level.id)
+        for i in range(20)
+    )
+    db.flush()
+    db.add(UserChallenge(user_id=1, challenge_id=1, success=True))
+    db.commit()
+    hinted = crud.create_challenge(db, ChallengeCreate(
+        name="Plan Hinted", description="Plan", difficulty="Easy", category="Plan", xp_reward=10,
+        flag="FLAG{hinted}", level_id=level.id, hints=[HintCreate(tier=1, body="Look closer", cost=2)]), "FLAG{hinted}")
+    return level.id, hinted.id
+
+
+def calls(level_id, hinted_id):
+    """(crud function name, callable) pairs covering every query-issuing function in crud.py."""
+    user = lambda db: crud.get_user_by_id(db, 2)
+    return [
+        ("get_user_by_email", lambda db: crud.get_user_by_email(db, "plan3@example.com")),
+        ("get_user_by_id", lambda db: crud.get_user_by_id(db, 3)),
+        ("create_user", lambda db: crud.create_user(db, UserCreate(username="plan_new", email="plan_new@example.com", password="x"), "x")),
+        ("update_password_hash", lambda db: crud.update_password_hash(db, user(db), "y")),
+        ("update_xp", lambda db: crud.update_xp(db, 2, 5)),
+        ("get_top_users", lambda db: crud.get_top_users(db, 10)),
+        ("get_top_users", lambda db: crud.get_top_users(db, 10, after=(40, 41))),
+        ("create_challenge", lambda db: crud.create_challenge(db, ChallengeCreate(
+            name="Plan New", description="Plan", difficulty="Easy", category="Plan", xp_reward=5,
+            flag="FLAG{new}", level_id=level_id), "FLAG{new}")),
+        ("get_challenge_by_id", lambda db: crud.get_challenge_by_id(db, 3)),
+        ("get_challenge_detail", lambda db: crud.get_challenge_detail(db, hinted_id)),
+        ("get_all_challenges", lambda db: crud.get_all_challenges(db)),
+        ("get_all_challenges", lambda db: crud.get_all_challenges(db, after_id=5, limit=5)),
+        ("has_user_completed_challenge", lambda db: crud.has_user_completed_challenge(db, 1, 1)),
+        ("has_user_completed_challenge_by_id", lambda db: crud.has_user_completed_challenge_by_id(db, 1, 2)),
+        ("submit_flag", lambda db: crud.submit_flag(db, 4, 2, "FLAG{wrong}")),
+        ("submit_flag", lambda db: crud.submit_flag(db, 4, 2, "FLAG{plan_1}")),
+        ("submit_flag", lambda db: crud.submit_flag(db, 5, 2, "FLAG{plan_1}")),
+        # The third solver decays the challenge, so this one also re-values the earlier solvers
+        ("submit_flag", lambda db: crud.submit_flag(db, 6, 2, "FLAG{plan_1}")),
+        ("get_user_stats", lambda db: crud.get_user_stats(db, 4)),
+        ("get_challenge_scores", lambda db: crud.get_challenge_scores(db)),
+        ("get_user_challenges", lambda db: crud.get_user_challenges(db, 1)),
+        ("get_all_levels", lambda db: crud.get_all_levels(db)),
+        ("get_level_by_id", lambda db: crud.get_level_by_id(db, level_id)),
+        ("get_challenges_by_level", lambda db: crud.get_challenges_by_level(db, level_id)),
+        ("get_challenges_by_level", lambda db: crud.get_challenges_by_level(db, level_id, after_id=5, limit=5)),
+        ("get_hint_tiers", lambda db: crud.get_hint_tiers(db, 10, hinted_id)),
+        ("request_hint", lambda db: crud.request_hint(db, 10, hinted_id)),
+        # Already bought, so this one reads the ledger and XP without charging
+        ("request_hint", lambda db: crud.request_hint(db, 10, hinted_id)),
+        ("get_completed_challenge_ids_for_level", lambda db: crud.get_completed_challenge_ids_for_level(db, 1, level_id)),
+    ]
+
+
+def explain(connection, statement, parameters):
+    """Return the plan lines for a captured statement."""
+    if engine.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+        return [row[-1] for row in rows]
+    connection.exec_driver_sql("SET enable_seqscan = off")
+    try:
+        return [row[0] for row in connection.exec_driver_sql("EXPLAIN " + statement, parameters)]
+    finally:
+        connection.exec_driver_sql("RESET enable_seqscan")
+
+
+def problems_in(name, plan):
+    """Plan lines that violate the expectations for `name`."""
+    allowed = FULL_SCAN_ALLOWED.get(name, set())
+    problems = []
+    for line in plan:
+        if engine.dialect.name == "sqlite":
+            words = line.split()
+            if words[:1] == ["SCAN"] and "USING" not in words and words[1] not in allowed:
+                problems.append(line)
+            if name in NO_SORT and "TEMP B-TREE" in line:
+                problems.append(line)
+        else:
+            if "Seq Scan on" in line and line.split("Seq Scan on")[1].split()[0] not in allowed:
+                problems.append(line.strip())
+            if name in NO_SORT and line.strip().startswith("Sort"):
+                problems.append(line.strip())
+    return problems
+
+
+def test_calls_cover_every_crud_function():
+    public = {name for name, function in inspect.getmembers(crud, inspect.isfunction)
+              if function.__module__ == crud.__name__ and not name.startswith("_")}
+    assert public - NO_QUERIES == {name for name, _ in calls(None, None)}
+
+
+def test_crud_queries_use_indexes(db):
+    level_id, hinted_id = seed(db)
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(EXPLAINED) and not executemany:
+            captured.append((statement, parameters))
+
+    failures, explained = [], set()
+    for name, call in calls(level_id, hinted_id):
+        captured.clear()
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            call(db)
+        except HTTPException:
+            pass
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+        with engine.connect() as connection:
+            for statement, parameters in captured:
+                explained.add(name)
+                problems = problems_in(name, explain(connection, statement, parameters))
+                if problems:
+                    failures.append(f"{name}: {' '.join(statement.split())}\n    " + "\n    ".join(problems))
+
+    assert not failures, "Unindexed scans:\n" + "\n".join(failures)
+    assert {"request_hint", "get_hint_tiers", "get_challenge_detail", "get_user_stats",
+            "get_challenge_scores"} <= explained
@@ -0,0 +1,129 @@
+# tests/test_read_replicas.py
+"""
+Read routing: the opted-in read routes use a replica, and a user's own write (or
+a catalogue change, for everyone) sends their reads back to the primary for
+READ_YOUR_WRITES_SECONDS. The replica is a second SQLite file holding different
+rows, so each response shows which database served it.
+"""
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from backend import database
+from backend.base import Base
+from backend.database import SessionLocal, recent_writes
+from backend.instrumentation import instrument_engine
+from backend.models import ChallengeScore, Level, User, UserStats
+from tests.conftest import TEST_DIRECTORY, make_level, register
+
+REPLICA_SOLVES = 42
+
+
+class Clock:
+    """Stands in for the time module in backend.database, so pins expire when the test says so."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(database, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def replica(client, monkeypatch):
+    """A replica that has diverged from the primary, routed to by both the sync and the async read sessions."""
+    path = f"{TEST_DIRECTORY}/replica.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    with Session(sync_engine) as db:
+        db.add(Level(id=1, name="Replica Level", description="Only on the replica", order=1))
+        for user_id in (1, 2):
+            db.add(User(id=user_id, username=f"replica{user_id}", email=f"replica{user_id}@example.com",
+                        hashed_password="x", xp=0))
+            db.add(UserStats(user_id=user_id, solves=REPLICA_SOLVES, last_solve_at=datetime.now(timezone.utc)))
+        db.add(ChallengeScore(challenge_id=99, solves=REPLICA_SOLVES, value=1))
+        db.commit()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    for engine in (sync_engine, async_engine.sync_engine):
+        instrument_engine(engine)
+    # Build the primary's async engine first, so it doesn't overwrite the replica lists below;
+    # the app's shutdown then disposes the replica engine on the loop that used it
+    database.get_async_engine()
+    monkeypatch.setattr(database, "_read_sessionmakers", [sessionmaker(bind=sync_engine)])
+    monkeypatch.setattr(database, "_async_read_engines", [async_engine])
+    monkeypatch.setattr(database, "_async_read_sessionmakers", [database._async_sessionmaker_for(async_engine)])
+    yield
+    sync_engine.dispose()
+
+
+def solves(client, headers):
+    response = client.get("/users/stats", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["solves"]
+
+
+def scores(client):
+    return [row["challenge_id"] for row in client.get("/challenges/scores").json()]
+
+
+def settle(clock):
+    """Let every pin from the writes so far expire."""
+    clock.advance(recent_writes.window + 1)
+
+
+def test_read_routes_use_the_replica(client, replica, clock):
+    headers = register(client, "reader")
+    settle(clock)
+    assert solves(client, headers) == REPLICA_SOLVES
+    assert scores(client) == [99]
+    assert [level["name"] for level in client.get("/levels").json()] == ["Replica Level"]
+
+
+def test_own_write_pins_the_writer_to_the_primary(client, replica, clock):
+    writer, other = register(client, "writer"), register(client, "other")
+    assert solves(client, writer) == 0  # Just registered, so still pinned
+    settle(clock)
+    assert solves(client, writer) == REPLICA_SOLVES
+
+    assert client.post("/users/update_xp", params={"amount": 5}, headers=writer).status_code == 200
+    assert solves(client, writer) == 0
+    assert solves(client, other) == REPLICA_SOLVES
+    clock.advance(recent_writes.window - 1)
+    assert solves(client, writer) == 0
+    clock.advance(2)
+    assert solves(client, writer) == REPLICA_SOLVES
+
+
+def test_catalogue_change_pins_everyone(client, replica, clock):
+    headers = register(client, "player")
+    with SessionLocal() as db:
+        level_id = make_level(db, name="Primary Level")
+    settle(clock)
+    assert solves(client, headers) == REPLICA_SOLVES
+
+    response = client.post("/challenges/create", json={
+        "name": "fresh", "description": "New", "content": "Body", "difficulty": "Easy", "category": "Test",
+        "xp_reward": 10, "flag": "FLAG{fresh}", "level_id": level_id,
+    })
+    assert response.status_code == 200, response.text
+    assert solves(client, headers) == 0
+    assert scores(client) == []
+    assert [level["name"] for level in client.get("/levels").json()] == ["Primary Level"]
+    settle(clock)
+    assert solves(client, headers) == REPLICA_SOLVES
+    assert scores(client) == [99]
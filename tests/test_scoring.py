@@ -0,0 +1,80 @@
+# tests/test_scoring.py
+"""Dynamic scoring: the incremental solve path must agree with a full recompute."""
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from backend import crud
+from backend.config import SCORING_DECAY_SOLVES
+from backend.leaderboard import leaderboard
+from backend.models import ChallengeScore, User, UserStats
+from backend.scoring import challenge_value, recompute
+from tests.conftest import make_challenge, make_level, make_user
+
+
+def test_solves_across_decay_steps_match_recompute(db):
+    level_id = make_level(db)
+    first = make_challenge(db, level_id, "decay_a", 100, hints=[(1, 10)])
+    second = make_challenge(db, level_id, "decay_b", 60)
+    users = [make_user(db, f"solver{i}") for i in range(SCORING_DECAY_SOLVES + 2)]
+
+    # Everyone solves the first challenge, past the point where its value bottoms out, so each
+    # solve re-values all the earlier solvers; the first few also solve the second one
+    for user_id in users:
+        crud.submit_flag(db, user_id, first, "FLAG{decay_a}")
+    for user_id in users[:2]:
+        crud.submit_flag(db, user_id, second, "FLAG{decay_b}")
+    bought = crud.request_hint(db, users[-1], first)
+    assert bought is not None
+
+    solved = {first: len(users), second: 2}
+    values = {challenge_id: challenge_value(reward, solved[challenge_id])
+              for challenge_id, reward in ((first, 100), (second, 60))}
+    assert values[first] < challenge_value(100, 1)
+    expected = {user_id: values[first] for user_id in users}
+    for user_id in users[:2]:
+        expected[user_id] += values[second]
+    expected[users[-1]] -= 10
+
+    db.expire_all()
+    xp = dict(db.execute(select(User.id, User.xp)).all())
+    assert xp == expected
+    for user_id, total in expected.items():
+        assert leaderboard.rank(user_id)["xp"] == total
+
+    assert recompute(db) == ([], [])
+    db.rollback()
+    scores = {row.challenge_id: (row.solves, row.value) for row in db.execute(select(ChallengeScore)).scalars()}
+    assert scores == {challenge_id: (solved[challenge_id], values[challenge_id]) for challenge_id in solved}
+    hints_used = db.scalar(select(UserStats.hints_used).where(UserStats.user_id == users[-1]))
+    assert hints_used == 1
+
+
+def test_recompute_repairs_drift(db):
+    level_id = make_level(db)
+    challenge_id = make_challenge(db, level_id, "drift", 100)
+    users = [make_user(db, f"drifter{i}") for i in range(3)]
+    for user_id in users:
+        crud.submit_flag(db, user_id, challenge_id, "FLAG{drift}")
+
+    db.query(UserStats).filter(UserStats.user_id == users[0]).update({"points": UserStats.points + 7})
+    db.query(ChallengeScore).update({"solves": 1})
+    challenge_drift, user_drift = recompute(db)
+    db.commit()
+
+    value = challenge_value(100, 3)
+    assert challenge_drift == [(challenge_id, (1, value), (3, value))]
+    assert user_drift == [(users[0], value + 7, value)]
+    assert db.scalar(select(User.xp).where(User.id == users[0])) == value - 7
+    assert recompute(db) == ([], [])
+
+
+def test_second_solve_is_rejected(db):
+    level_id = make_level(db)
+    challenge_id = make_challenge(db, level_id, "once", 100)
+    user_id = make_user(db, "once")
+    crud.submit_flag(db, user_id, challenge_id, "FLAG{once}")
+    with pytest.raises(HTTPException) as error:
+        crud.submit_flag(db, user_id, challenge_id, "FLAG{once}")
+    assert error.value.status_code == 400
+    assert recompute(db) == ([], [])